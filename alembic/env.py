@@ -0,0 +1,79 @@
+# epicservice/alembic/env.py
+
+from logging.config import fileConfig
+
+from sqlalchemy import engine_from_config, pool
+
+from alembic import context
+from database.models import Base
+from database.orm.products_fts import FTS_TABLE
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+# Моделі для autogenerate
+target_metadata = Base.metadata
+
+# Рядок підключення: alembic.ini або, якщо там порожньо, config.py (.env)
+if not config.get_main_option("sqlalchemy.url"):
+    from config import SYNC_DATABASE_URL
+
+    config.set_main_option("sqlalchemy.url", SYNC_DATABASE_URL)
+
+
+def _include_object_for(dialect_name: str):
+    """
+    Пропускає в autogenerate індекси, обмежені іншою БД (Index.ddl_if),
+    і таблиці FTS5, які бот створює сам (database/orm/products_fts.py).
+    """
+
+    def include_object(obj, name, type_, reflected, compare_to):
+        if type_ == "table" and reflected and name.startswith(FTS_TABLE):
+            return False
+        ddl_if = getattr(obj, "_ddl_if", None)
+        if type_ == "index" and ddl_if is not None and ddl_if.dialect:
+            return ddl_if.dialect == dialect_name
+        return True
+
+    return include_object
+
+
+def run_migrations_offline() -> None:
+    """Генерує SQL без підключення до БД (alembic upgrade --sql)."""
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url"),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """Застосовує міграції до БД."""
+    connectable = engine_from_config(
+        config.get_section(config.config_ini_section, {}),
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+    )
+
+    with connectable.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=_include_object_for(connection.dialect.name),
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
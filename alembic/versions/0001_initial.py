@@ -0,0 +1,111 @@
+"""Початкова схема БД
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+
+Для вже існуючої БД, створеної до появи міграцій:
+    alembic stamp 0001
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.BigInteger(), autoincrement=False, nullable=False),
+        sa.Column("username", sa.String(length=100), nullable=True),
+        sa.Column("first_name", sa.String(length=100), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "products",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("артикул", sa.String(length=20), nullable=False),
+        sa.Column("назва", sa.String(length=255), nullable=False),
+        sa.Column("відділ", sa.BigInteger(), nullable=False),
+        sa.Column("група", sa.String(length=100), nullable=False),
+        sa.Column("кількість", sa.String(length=50), nullable=False),
+        sa.Column("відкладено", sa.Integer(), nullable=False),
+        sa.Column("місяці_без_руху", sa.Integer(), nullable=True),
+        sa.Column("сума_залишку", sa.Float(), nullable=True),
+        sa.Column("ціна", sa.Float(), nullable=True),
+        sa.Column("активний", sa.Boolean(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_products_артикул", "products", ["артикул"], unique=True)
+    op.create_index("ix_products_активний", "products", ["активний"])
+
+    op.create_table(
+        "stock_history",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("articul", sa.String(length=20), nullable=False),
+        sa.Column("old_quantity", sa.String(length=50), nullable=False),
+        sa.Column("new_quantity", sa.String(length=50), nullable=False),
+        sa.Column("change_source", sa.String(length=50), nullable=False),
+        sa.Column("changed_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["product_id"], ["products.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_stock_history_product_id", "stock_history", ["product_id"])
+
+    op.create_table(
+        "saved_lists",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("user_id", sa.BigInteger(), nullable=False),
+        sa.Column("file_name", sa.String(length=100), nullable=False),
+        sa.Column("file_path", sa.String(length=255), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_saved_lists_user_id", "saved_lists", ["user_id"])
+
+    op.create_table(
+        "saved_list_items",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("list_id", sa.Integer(), nullable=False),
+        sa.Column("article_name", sa.String(length=255), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["list_id"], ["saved_lists.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+    op.create_table(
+        "temp_lists",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("user_id", sa.BigInteger(), nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["product_id"], ["products.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_temp_lists_user_id", "temp_lists", ["user_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_temp_lists_user_id", table_name="temp_lists")
+    op.drop_table("temp_lists")
+    op.drop_table("saved_list_items")
+    op.drop_index("ix_saved_lists_user_id", table_name="saved_lists")
+    op.drop_table("saved_lists")
+    op.drop_index("ix_stock_history_product_id", table_name="stock_history")
+    op.drop_table("stock_history")
+    op.drop_index("ix_products_активний", table_name="products")
+    op.drop_index("ix_products_артикул", table_name="products")
+    op.drop_table("products")
+    op.drop_table("users")
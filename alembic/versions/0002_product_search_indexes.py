@@ -0,0 +1,71 @@
+"""Індекси пошуку товарів для PostgreSQL (pg_trgm)
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+
+- GIN pg_trgm по назві та артикулу: ILIKE '%q%', оператор % і similarity();
+- частковий індекс по відділу для активних товарів.
+
+Усі індекси часткові (WHERE активний = true) і створюються CONCURRENTLY,
+щоб не блокувати таблицю на робочій БД. На SQLite міграція нічого не робить.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE = sa.text("активний = true")
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    with op.get_context().autocommit_block():
+        for column in ("назва", "артикул"):
+            op.create_index(
+                f"ix_products_{column}_trgm",
+                "products",
+                [column],
+                postgresql_using="gin",
+                postgresql_ops={column: "gin_trgm_ops"},
+                postgresql_where=ACTIVE,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+        op.create_index(
+            "ix_products_відділ_active",
+            "products",
+            ["відділ"],
+            postgresql_where=ACTIVE,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    with op.get_context().autocommit_block():
+        for name in (
+            "ix_products_відділ_active",
+            "ix_products_артикул_trgm",
+            "ix_products_назва_trgm",
+        ):
+            op.drop_index(
+                name,
+                table_name="products",
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
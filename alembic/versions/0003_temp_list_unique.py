@@ -0,0 +1,51 @@
+"""Унікальна позиція (user_id, product_id) у тимчасових списках
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+
+Перед створенням обмеження дублікати зливаються в найстаріший рядок
+(кількості сумуються), решта видаляється.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CONSTRAINT = "uq_temp_lists_user_product"
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        UPDATE temp_lists SET quantity = (
+            SELECT SUM(t.quantity) FROM temp_lists t
+            WHERE t.user_id = temp_lists.user_id AND t.product_id = temp_lists.product_id
+        )
+        WHERE id IN (
+            SELECT MIN(id) FROM temp_lists
+            GROUP BY user_id, product_id HAVING COUNT(*) > 1
+        )
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM temp_lists WHERE id NOT IN (
+            SELECT MIN(id) FROM temp_lists GROUP BY user_id, product_id
+        )
+        """
+    )
+    with op.batch_alter_table("temp_lists") as batch_op:
+        batch_op.create_unique_constraint(CONSTRAINT, ["user_id", "product_id"])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("temp_lists") as batch_op:
+        batch_op.drop_constraint(CONSTRAINT, type_="unique")
@@ -0,0 +1,50 @@
+"""Щоденні агрегати зібраного та активності користувачів
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+
+Таблиці заповнюються при старті бота (orm_ensure_rollups), якщо вони
+порожні, а збережені списки вже є; вручну — командою /rebuild_stats.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "collected_daily",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("department", sa.BigInteger(), nullable=False),
+        sa.Column("article", sa.String(length=255), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("orders", sa.Integer(), nullable=False),
+        sa.Column("users", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("day", "department", "article"),
+    )
+    op.create_index("ix_collected_daily_article", "collected_daily", ["article"])
+
+    op.create_table(
+        "user_daily_activity",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("user_id", sa.BigInteger(), nullable=False),
+        sa.Column("lists", sa.Integer(), nullable=False),
+        sa.Column("positions", sa.Integer(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("day", "user_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_daily_activity")
+    op.drop_index("ix_collected_daily_article", table_name="collected_daily")
+    op.drop_table("collected_daily")
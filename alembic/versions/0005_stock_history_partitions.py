@@ -0,0 +1,125 @@
+"""Індекси історії залишків і помісячне секціонування на PostgreSQL
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+
+- Індекси (product_id, changed_at) і (changed_at) замість (product_id).
+- PostgreSQL: stock_history перестворюється як PARTITION BY RANGE (changed_at)
+  з місячними секціями від найстарішого рядка до PARTITION_MONTHS_AHEAD
+  місяців наперед і DEFAULT-секцією; дані копіюються, послідовність id
+  зберігається. PK стає (id, changed_at) — ключ секціонування має входити
+  до первинного ключа. Нові секції далі створює бот
+  (orm_ensure_stock_history_partitions).
+"""
+from datetime import date, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PARTITION_MONTHS_AHEAD = 2
+
+COLUMNS = "id, product_id, articul, old_quantity, new_quantity, change_source, changed_at"
+
+
+def _next_month(day: date) -> date:
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def _create_indexes() -> None:
+    op.create_index(
+        "ix_stock_history_product_changed", "stock_history", ["product_id", "changed_at"]
+    )
+    op.create_index("ix_stock_history_changed_at", "stock_history", ["changed_at"])
+
+
+def _partition_postgres() -> None:
+    bind = op.get_bind()
+    oldest = bind.execute(sa.text("SELECT min(changed_at) FROM stock_history")).scalar()
+
+    op.execute("ALTER TABLE stock_history RENAME TO stock_history_old")
+    op.execute(
+        "ALTER TABLE stock_history_old "
+        "RENAME CONSTRAINT stock_history_pkey TO stock_history_old_pkey"
+    )
+    op.execute(
+        """
+        CREATE TABLE stock_history (
+            id INTEGER NOT NULL DEFAULT nextval('stock_history_id_seq'),
+            product_id INTEGER NOT NULL REFERENCES products (id),
+            articul VARCHAR(20) NOT NULL,
+            old_quantity VARCHAR(50) NOT NULL,
+            new_quantity VARCHAR(50) NOT NULL,
+            change_source VARCHAR(50) NOT NULL,
+            changed_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now(),
+            CONSTRAINT stock_history_pkey PRIMARY KEY (id, changed_at)
+        ) PARTITION BY RANGE (changed_at)
+        """
+    )
+    op.execute("CREATE TABLE stock_history_default PARTITION OF stock_history DEFAULT")
+
+    month = (oldest.date() if oldest else date.today()).replace(day=1)
+    last = date.today().replace(day=1)
+    for _ in range(PARTITION_MONTHS_AHEAD):
+        last = _next_month(last)
+    while month <= last:
+        following = _next_month(month)
+        op.execute(
+            f"CREATE TABLE stock_history_{month:%Y_%m} PARTITION OF stock_history "
+            f"FOR VALUES FROM ('{month}') TO ('{following}')"
+        )
+        month = following
+
+    op.execute(f"INSERT INTO stock_history ({COLUMNS}) SELECT {COLUMNS} FROM stock_history_old")
+    op.execute("ALTER SEQUENCE stock_history_id_seq OWNED BY stock_history.id")
+    op.execute("DROP TABLE stock_history_old")
+
+
+def _unpartition_postgres() -> None:
+    op.execute("ALTER TABLE stock_history RENAME TO stock_history_part")
+    op.execute(
+        "ALTER TABLE stock_history_part "
+        "RENAME CONSTRAINT stock_history_pkey TO stock_history_part_pkey"
+    )
+    op.execute(
+        """
+        CREATE TABLE stock_history (
+            id INTEGER NOT NULL DEFAULT nextval('stock_history_id_seq'),
+            product_id INTEGER NOT NULL REFERENCES products (id),
+            articul VARCHAR(20) NOT NULL,
+            old_quantity VARCHAR(50) NOT NULL,
+            new_quantity VARCHAR(50) NOT NULL,
+            change_source VARCHAR(50) NOT NULL,
+            changed_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            CONSTRAINT stock_history_pkey PRIMARY KEY (id)
+        )
+        """
+    )
+    op.execute(f"INSERT INTO stock_history ({COLUMNS}) SELECT {COLUMNS} FROM stock_history_part")
+    op.execute("ALTER SEQUENCE stock_history_id_seq OWNED BY stock_history.id")
+    op.execute("DROP TABLE stock_history_part CASCADE")
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        _partition_postgres()
+    else:
+        op.drop_index("ix_stock_history_product_id", table_name="stock_history")
+    _create_indexes()
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        _unpartition_postgres()
+    else:
+        op.drop_index("ix_stock_history_changed_at", table_name="stock_history")
+        op.drop_index("ix_stock_history_product_changed", table_name="stock_history")
+    op.create_index("ix_stock_history_product_id", "stock_history", ["product_id"])
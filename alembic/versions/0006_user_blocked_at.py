@@ -0,0 +1,29 @@
+"""Позначка користувачів, які заблокували бота
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+
+Розсилка пропускає користувачів з users.blocked_at; позначка знімається,
+коли користувач знову надсилає /start.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, Sequence[str], None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("users", sa.Column("blocked_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("blocked_at")
@@ -0,0 +1,27 @@
+"""Індекс products.updated_at
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17
+
+Кожен воркер webhook раз на CATALOG_SYNC_INTERVAL секунд шукає товари,
+змінені іншими процесами (services/catalog_sync.py), за updated_at.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, Sequence[str], None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_products_updated_at", "products", ["updated_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_products_updated_at", table_name="products")
@@ -0,0 +1,121 @@
+# epicservice/benchmarks/bench_excel_reader.py
+
+"""
+Бенчмарк читання файлу імпорту: read_excel_smart (весь файл у DataFrame)
+vs потоковий process_excel_stream (openpyxl read_only, порціями).
+
+Запуск з кореня проєкту:
+    python -m benchmarks.bench_excel_reader [100000]
+
+Кожен режим виконується в окремому процесі, щоб пікова пам'ять (ru_maxrss)
+не змішувалась. "База" — пам'ять процесу після імпорту модулів, до читання.
+"""
+
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFAULT_ROWS = 100_000
+MODES = ("pandas", "stream")
+
+
+# ==============================================================================
+# 🧪 СИНТЕТИЧНИЙ ФАЙЛ
+# ==============================================================================
+
+
+def make_xlsx(rows: int) -> str:
+    """Створює (або бере з кешу) .xlsx з шапкою-сміттям та rows рядками даних."""
+    import openpyxl
+
+    path = os.path.join(tempfile.gettempdir(), f"epic_bench_import_{rows}.xlsx")
+    if os.path.exists(path):
+        return path
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Залишки")
+    ws.append(["Звіт по залишках"])
+    ws.append([])
+    ws.append(["Відділ", "Група", "Артикул", "Назва", "Кількість", "Сума", "Без руху"])
+    for i in range(rows):
+        qty = i % 500
+        ws.append(
+            [
+                (10, 20, 50, 90)[i % 4],
+                "Будівельна хімія",
+                str(10_000_000 + i),
+                f"Товар №{i} для бенчмарку імпорту",
+                qty,
+                round(qty * 12.35, 2),
+                i % 12,
+            ]
+        )
+    wb.save(path)
+    return path
+
+
+# ==============================================================================
+# ⏱ ВИМІРЮВАННЯ (ДОЧІРНІЙ ПРОЦЕС)
+# ==============================================================================
+
+
+def _max_rss_mb() -> float:
+    # Linux: кілобайти, macOS: байти
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+def run_mode(mode: str, path: str) -> None:
+    from utils.import_processor import (
+        process_excel_stream,
+        process_import_dataframe,
+        read_excel_smart,
+    )
+
+    base_rss = _max_rss_mb()
+    started = time.perf_counter()
+
+    if mode == "pandas":
+        df, _ = read_excel_smart(path)
+        processed, validation = process_import_dataframe(df)
+        valid_rows = len(processed)
+    else:
+        chunks, validation = process_excel_stream(path)
+        valid_rows = sum(len(chunk) for chunk in chunks)
+
+    elapsed = time.perf_counter() - started
+    print(f"{mode} {elapsed:.2f} {base_rss:.0f} {_max_rss_mb():.0f} {valid_rows}")
+
+
+# ==============================================================================
+# 🚀 ЗАПУСК
+# ==============================================================================
+
+
+def main(rows: int) -> None:
+    path = make_xlsx(rows)
+    print(f"Файл: {path} ({os.path.getsize(path) / 1024 / 1024:.1f} МБ, {rows} рядків)")
+    print(f"{'режим':>8} {'час, с':>8} {'база, МБ':>9} {'пік, МБ':>8} {'приріст, МБ':>12} {'валідних':>9}")
+
+    for mode in MODES:
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_excel_reader", "--run", mode, path],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.split()
+        name, elapsed, base, peak, valid = out[-5:]
+        print(
+            f"{name:>8} {float(elapsed):>8.2f} {base:>9} {peak:>8} "
+            f"{int(peak) - int(base):>12} {valid:>9}"
+        )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--run":
+        run_mode(sys.argv[2], sys.argv[3])
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS)
@@ -0,0 +1,121 @@
+# epicservice/benchmarks/bench_force_save.py
+
+"""
+Бенчмарк примусового збереження кошиків перед імпортом: по одному
+користувачу (process_and_save_list у циклі, як раніше) vs пакетно
+(save_all_active_lists однією транзакцією + рендеринг у пулі).
+
+Надсилання в Telegram не вимірюється — його обмежує BROADCAST_RATE.
+
+Запуск з кореня проєкту (потрібен BOT_TOKEN, як для бота):
+    python -m benchmarks.bench_force_save [users] [items]
+
+Бенчмарк створює власну SQLite-БД у тимчасовій теці (DB_TYPE/DB_NAME
+перевизначаються) і перед кожним режимом наповнює кошики заново.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+DEFAULT_USERS = 200
+DEFAULT_ITEMS = 20
+PRODUCTS = 5_000
+
+os.environ["DB_TYPE"] = "sqlite"
+os.environ["DB_NAME"] = os.path.join(tempfile.gettempdir(), "epic_bench_force_save.db")
+
+
+def fill_db(users: int, items: int) -> None:
+    from sqlalchemy import insert
+
+    from database.engine import sync_engine
+    from database.models import Base, Product, TempList, User
+
+    Base.metadata.drop_all(sync_engine)
+    Base.metadata.create_all(sync_engine)
+    with sync_engine.begin() as conn:
+        conn.execute(
+            insert(Product),
+            [
+                {
+                    "артикул": str(10_000_000 + i),
+                    "назва": f"Товар №{i} для бенчмарку збереження",
+                    "відділ": (10, 20, 50, 90)[i % 4],
+                    "група": "Будівельна хімія",
+                    "кількість": str(i % 50),
+                    "відкладено": i % 3,
+                    "ціна": 12.35,
+                    "сума_залишку": round((i % 50) * 12.35, 2),
+                    "місяці_без_руху": 0,
+                    "активний": True,
+                }
+                for i in range(PRODUCTS)
+            ],
+        )
+        conn.execute(
+            insert(User),
+            [{"id": u, "username": f"user{u}", "first_name": "U"} for u in range(1, users + 1)],
+        )
+        conn.execute(
+            insert(TempList),
+            [
+                {"user_id": u, "product_id": 1 + (u * 37 + k * 11) % PRODUCTS, "quantity": 1 + k % 5}
+                for u in range(1, users + 1)
+                for k in range(items)
+            ],
+        )
+
+
+def _remove(paths) -> None:
+    for path in paths:
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+async def sequential(users: int) -> None:
+    from utils.list_processor import process_and_save_list
+
+    for user_id in range(1, users + 1):
+        _remove(await process_and_save_list(user_id))
+
+
+async def batched(users: int) -> None:
+    from utils.list_processor import render_list_files, save_all_active_lists
+    from utils.render_pool import render_pool
+
+    started = time.perf_counter()
+    lists = await save_all_active_lists()
+    print(f"    БД: {time.perf_counter() - started:.2f} с")
+
+    slots = asyncio.Semaphore(render_pool.workers)
+
+    async def render(main, deficit):
+        async with slots:
+            _remove(await render_list_files(main, deficit))
+
+    await asyncio.gather(*(render(main, deficit) for main, deficit in lists.values()))
+
+
+async def main(users: int, items: int) -> None:
+    from utils.render_pool import render_pool
+
+    print(f"Користувачів: {users}, позицій у кошику: {items}")
+    for name, mode in (("по одному", sequential), ("пакетно", batched)):
+        fill_db(users, items)
+        started = time.perf_counter()
+        print(f"  {name}:")
+        await mode(users)
+        print(f"    разом: {time.perf_counter() - started:.2f} с")
+    render_pool.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_USERS,
+            int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_ITEMS,
+        )
+    )
@@ -0,0 +1,214 @@
+# epicservice/benchmarks/bench_import_processor.py
+
+"""
+Бенчмарк обробки файлу імпорту: построковий (iterrows) vs векторний шлях.
+
+Запуск з кореня проєкту:
+    python -m benchmarks.bench_import_processor [1000 10000 100000]
+
+Для кожного розміру генерується синтетичний файл (з окремими колонками
+та зі злитими "Артикул - Назва"), перевіряється, що обидва шляхи дають
+однаковий DataFrame і ті самі лічильники/помилки, і виводиться час.
+"""
+
+import sys
+import time
+from typing import Callable, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.import_processor import (
+    ImportValidation,
+    detect_columns,
+    extract_article_and_name,
+    process_import_dataframe,
+    validate_article,
+)
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+REPEATS = 3
+
+
+# ==============================================================================
+# 🧪 СИНТЕТИЧНІ ДАНІ
+# ==============================================================================
+
+
+def make_import_df(rows: int, merged_name: bool = False, seed: int = 42) -> pd.DataFrame:
+    """
+    Генерує файл, схожий на вивантаження постачальника:
+    числа з комою та пробілами, сміттєві рядки, некоректні кількості.
+    """
+    rng = np.random.default_rng(seed)
+    articles = rng.integers(10_000_000, 99_999_999, rows).astype(str)
+    names = np.array(["Фарба біла", "Клей для плитки", "Лампа LED 10W", "Дриль ударний"])[
+        rng.integers(0, 4, rows)
+    ]
+    qty = rng.integers(0, 500, rows).astype(float)
+    sums = np.round(qty * rng.uniform(1, 2000, rows), 2)
+
+    qty_col = pd.Series(qty, dtype=object)
+    sum_col = pd.Series([f"{v:,.2f}".replace(",", "\xa0").replace(".", ",") for v in sums], dtype=object)
+    # ~1% некоректних кількостей та ~2% сміттєвих рядків (підсумки)
+    qty_col[rng.random(rows) < 0.01] = "н/д"
+    junk = rng.random(rows) < 0.02
+    articles = np.where(junk, "Разом", articles)
+
+    df = pd.DataFrame(
+        {
+            "Відділ": rng.choice([10, 20, 50, 90], rows),
+            "Група": rng.choice(["Фарби", "Кріплення", "Будівельна хімія"], rows),
+            "Кількість": qty_col,
+            "Сума": sum_col,
+            "Без руху": rng.integers(0, 12, rows),
+        }
+    )
+    if merged_name:
+        df.insert(2, "Назва", pd.Series(articles, dtype=object) + " - " + names)
+    else:
+        df.insert(2, "Артикул", articles)
+        df.insert(3, "Назва", names)
+    return df
+
+
+# ==============================================================================
+# 🐢 ПОСТРОКОВА ВЕРСІЯ (ЕТАЛОН)
+# ==============================================================================
+
+
+def legacy_process_import_dataframe(df: pd.DataFrame, custom_map=None) -> Tuple[pd.DataFrame, ImportValidation]:
+    """Построкова версія process_import_dataframe (до векторизації)."""
+    col_map, _ = detect_columns(df)
+    if custom_map:
+        col_map.update(custom_map)
+
+    errors = []
+    warnings = []
+    rows = []
+    
+    # Перевірка мінімуму: повинна бути хоча б Кількість
+    if not col_map.get("quantity"):
+        return df, ImportValidation(
+            False, ["Не знайдено колонку 'Кількість'"], [], len(df), 0
+        )
+
+    for idx, row in df.iterrows():
+        rid = idx + 2
+        try:
+            art, name = "", ""
+            
+            # --- 1. АРТИКУЛ ТА НАЗВА ---
+            # Варіант А: Є окремі колонки
+            if col_map.get("article") and col_map.get("name"):
+                art = str(row[col_map["article"]]).strip()
+                name = str(row[col_map["name"]]).strip()
+            
+            # Варіант Б: Є тільки Назва (артикул всередині)
+            elif col_map.get("name") and not col_map.get("article"):
+                art, name = extract_article_and_name(row[col_map["name"]])
+                
+            # Варіант В: Є тільки Артикул
+            elif col_map.get("article"):
+                art = str(row[col_map["article"]]).strip()
+
+            # Валідація артикулу
+            valid, _ = validate_article(art)
+            if not valid:
+                # Пропускаємо рядки без валідного артикулу (підсумки, сміття)
+                continue 
+
+            # --- 2. КІЛЬКІСТЬ (Обов'язкове) ---
+            qty_raw = str(row[col_map["quantity"]]).replace(",", ".").replace(" ", "").replace("\xa0", "")
+            try:
+                qty = float(qty_raw)
+            except:
+                errors.append(f"Ряд {rid} (Арт {art}): помилка кількості '{qty_raw}'")
+                continue
+
+            # --- 3. ІНШІ ПОЛЯ (Необов'язкові -> None) ---
+            dept = None
+            if col_map.get("department"):
+                try: dept = int(float(str(row[col_map["department"]])))
+                except: pass
+            
+            grp = None
+            if col_map.get("group"):
+                grp = str(row[col_map["group"]]).strip()
+
+            sum_val = None
+            price = None
+            if col_map.get("sum"):
+                try:
+                    sum_val = float(str(row[col_map["sum"]]).replace(",", ".").replace(" ", "").replace("\xa0", ""))
+                    if qty > 0:
+                        price = round(sum_val / qty, 2)
+                except: pass
+            
+            mnth = None
+            if col_map.get("months_no_movement"):
+                try: mnth = int(float(str(row[col_map["months_no_movement"]])))
+                except: pass
+
+            rows.append({
+                "артикул": art,
+                "назва": name,
+                "відділ": dept,
+                "група": grp,
+                "кількість": qty,
+                "ціна": price,
+                "сума_залишку": sum_val,
+                "місяці_без_руху": mnth
+            })
+
+        except Exception as e:
+            errors.append(f"Ряд {rid}: {e}")
+
+    processed_df = pd.DataFrame(rows)
+    
+    return processed_df, ImportValidation(
+        is_valid=len(rows) > 0,
+        errors=errors,
+        warnings=warnings,
+        total_rows=len(df),
+        valid_rows=len(rows)
+    )
+
+
+# ==============================================================================
+# ⏱ ЗАПУСК
+# ==============================================================================
+
+
+def _best_time(func: Callable, df: pd.DataFrame) -> Tuple[float, Tuple[pd.DataFrame, ImportValidation]]:
+    best, result = float("inf"), None
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        result = func(df, None)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def _assert_same(legacy, vectorized) -> None:
+    old_df, old_val = legacy
+    new_df, new_val = vectorized
+    pd.testing.assert_frame_equal(old_df, new_df)
+    assert old_val == new_val, (old_val, new_val)
+
+
+def main(sizes) -> None:
+    print(f"{'рядків':>8} {'формат':>8} {'iterrows, с':>12} {'векторно, с':>12} {'прискорення':>12}")
+    for rows in sizes:
+        for merged in (False, True):
+            df = make_import_df(rows, merged_name=merged)
+            old_time, old_result = _best_time(legacy_process_import_dataframe, df)
+            new_time, new_result = _best_time(process_import_dataframe, df)
+            _assert_same(old_result, new_result)
+            print(
+                f"{rows:>8} {'злитий' if merged else 'окремий':>8} "
+                f"{old_time:>12.3f} {new_time:>12.3f} {old_time / new_time:>11.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,143 @@
+# epicservice/benchmarks/bench_search_index.py
+
+"""
+Бенчмарк пошуку товарів:
+- ILIKE '%q%' по таблиці (SQLite в пам'яті) vs процесний пошуковий індекс
+  (database/orm/search_index.py);
+- пошук з одруківками: повний перебір thefuzz vs search_fuzzy
+  (триграмний відбір кандидатів + thefuzz).
+
+Запуск з кореня проєкту (потрібні змінні оточення, як для бота):
+    python -m benchmarks.bench_search_index [100000]
+"""
+
+import random
+import sqlite3
+import statistics
+import sys
+import time
+from typing import Callable, List
+
+from thefuzz import fuzz
+
+from database.orm.search_index import ProductSearchIndex, SearchHit, _State, normalize
+
+DEFAULT_PRODUCTS = 100_000
+
+_KINDS = [
+    "Фарба", "Емаль", "Ґрунтовка", "Шпаклівка", "Клей", "Герметик", "Цемент",
+    "Плитка", "Ламінат", "Шуруп", "Дюбель", "Кран", "Змішувач", "Лампа",
+    "Кабель", "Розетка", "Вимикач", "Труба", "Фітинг", "Піна монтажна",
+]
+_ATTRS = [
+    "біла", "чорна", "акрилова", "інтер'єрна", "фасадна", "водостійка",
+    "морозостійкий", "універсальний", "оцинкований", "латунний", "LED",
+    "матова", "глянцева", "для ванної", "посилений", "швидкосохнучий",
+]
+_BRANDS = ["Sniezka", "Ceresit", "Kompozit", "Hansgrohe", "Grohe", "Schneider", "Tytan", "Knauf"]
+_SIZES = ["0,75 л", "2,5 л", "10 л", "25 кг", "5 кг", "60x60", "4x40", "3x1,5", "1/2\"", "E27 10W"]
+
+QUERIES = [
+    "фарба", "фарба біла", "ceresit", "клей плитка", "кран латунний",
+    "змішувач grohe", "шуруп 4x40", "10000", "10345", "led e27",
+    "піна", "кабель 3x1,5", "емаль глянцева", "дюбель", "knauf 25",
+]
+
+TYPO_QUERIES = [
+    "фарбаа", "фраба біла", "грунтовка", "ceresitt", "змішуввач грое",
+    "шуруп 4x4o", "кабел 3x1,5", "ламiнат", "герметк", "розетко schnieder",
+]
+
+
+# ==============================================================================
+# 🧪 СИНТЕТИЧНИЙ КАТАЛОГ
+# ==============================================================================
+
+
+def make_catalog(size: int, seed: int = 42) -> List[SearchHit]:
+    rnd = random.Random(seed)
+    return [
+        SearchHit(
+            id=i + 1,
+            артикул=str(10_000_000 + i * 7),
+            назва=" ".join(
+                [rnd.choice(_KINDS), rnd.choice(_ATTRS), rnd.choice(_BRANDS), rnd.choice(_SIZES)]
+            ),
+            відділ=rnd.choice((10, 20, 50, 90)),
+        )
+        for i in range(size)
+    ]
+
+
+# ==============================================================================
+# ⏱ ВИМІРЮВАННЯ
+# ==============================================================================
+
+
+def _percentiles(func: Callable[[str], object], queries: List[str], rounds: int = 5):
+    timings = []
+    for _ in range(rounds):
+        for query in queries:
+            started = time.perf_counter()
+            func(query)
+            timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def main(size: int) -> None:
+    catalog = make_catalog(size)
+
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE products (id INTEGER PRIMARY KEY, артикул TEXT, назва TEXT, активний BOOL)")
+    conn.executemany(
+        "INSERT INTO products VALUES (?, ?, ?, 1)",
+        [(hit.id, hit.артикул, hit.назва) for hit in catalog],
+    )
+
+    def ilike(query: str):
+        pattern = f"%{query}%"
+        return conn.execute(
+            "SELECT id, артикул, назва FROM products "
+            "WHERE активний = 1 AND (назва LIKE ? OR артикул LIKE ?) LIMIT 10",
+            (pattern, pattern),
+        ).fetchall()
+
+    started = time.perf_counter()
+    index = ProductSearchIndex()
+    index._state = _State.build(catalog)
+    index.ready = True
+    build_s = time.perf_counter() - started
+
+    print(f"Каталог: {size} товарів, побудова індексу {build_s:.2f} с, {index.stats()}")
+    print(f"{'метод':>8} {'p50, мс':>9} {'p95, мс':>9}")
+    for name, func in (("ilike", ilike), ("index", lambda q: index.search(q, limit=10))):
+        p50, p95 = _percentiles(func, QUERIES)
+        print(f"{name:>8} {p50:>9.3f} {p95:>9.3f}")
+
+    names = [normalize(hit.назва) for hit in catalog]
+
+    def brute_fuzzy(query: str):
+        phrase = normalize(query)
+        scores = [
+            fuzz.WRatio(phrase, name, force_ascii=False, full_process=False)
+            for name in names
+        ]
+        return sorted(range(len(scores)), key=scores.__getitem__, reverse=True)[:10]
+
+    print(f"\nОдруківки ({len(TYPO_QUERIES)} запитів):")
+    print(f"{'метод':>8} {'p50, мс':>9} {'p95, мс':>9}")
+    for name, func, rounds in (
+        ("перебір", brute_fuzzy, 1),
+        ("fuzzy", lambda q: index.search_fuzzy(q, limit=10), 5),
+    ):
+        p50, p95 = _percentiles(func, TYPO_QUERIES, rounds)
+        print(f"{name:>8} {p50:>9.3f} {p95:>9.3f}")
+
+    for query in TYPO_QUERIES[:4]:
+        found = [hit.назва for hit in index.search_fuzzy(query, limit=2)]
+        print(f"  {query!r} -> {found}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PRODUCTS)
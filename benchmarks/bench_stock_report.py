@@ -0,0 +1,161 @@
+# epicservice/benchmarks/bench_stock_report.py
+
+"""
+Бенчмарк звіту по залишках: старий шлях (ORM-об'єкти → список словників →
+DataFrame → to_excel) vs потоковий _write_stock_report_sync (курсор Core
+select() → utils/xlsx_writer).
+
+Запуск з кореня проєкту (потрібен BOT_TOKEN, як для бота):
+    python -m benchmarks.bench_stock_report [50000]
+
+Бенчмарк створює власну SQLite-БД у тимчасовій теці (DB_TYPE/DB_NAME
+перевизначаються). Кожен режим виконується в окремому процесі, щоб пікова
+пам'ять (ru_maxrss) не змішувалась.
+"""
+
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFAULT_ROWS = 50_000
+MODES = ("pandas", "stream")
+
+
+def _use_bench_db(rows: int) -> str:
+    path = os.path.join(tempfile.gettempdir(), f"epic_bench_report_{rows}.db")
+    os.environ["DB_TYPE"] = "sqlite"
+    os.environ["DB_NAME"] = path
+    return path
+
+
+# ==============================================================================
+# 🧪 СИНТЕТИЧНА БД
+# ==============================================================================
+
+
+def make_db(rows: int) -> str:
+    path = _use_bench_db(rows)
+    if os.path.exists(path):
+        return path
+
+    from sqlalchemy import insert
+
+    from database.engine import sync_engine
+    from database.models import Base, Product
+
+    Base.metadata.create_all(sync_engine)
+    with sync_engine.begin() as conn:
+        conn.execute(
+            insert(Product),
+            [
+                {
+                    "артикул": str(10_000_000 + i),
+                    "назва": f"Товар №{i} для бенчмарку звіту по залишках",
+                    "відділ": (10, 20, 50, 90)[i % 4],
+                    "група": "Будівельна хімія",
+                    "кількість": str(i % 500),
+                    "відкладено": i % 3,
+                    "ціна": 12.35,
+                    "сума_залишку": round((i % 500) * 12.35, 2),
+                    "місяці_без_руху": i % 12,
+                    "активний": True,
+                }
+                for i in range(rows)
+            ],
+        )
+    return path
+
+
+# ==============================================================================
+# ⏱ ВИМІРЮВАННЯ (ДОЧІРНІЙ ПРОЦЕС)
+# ==============================================================================
+
+
+def _max_rss_mb() -> float:
+    # Linux: кілобайти, macOS: байти
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+def _pandas_report(filepath: str) -> int:
+    """Відтворення попередньої реалізації _create_stock_report_sync."""
+    import pandas as pd
+    from sqlalchemy import select
+
+    from database.engine import sync_session
+    from database.models import Product
+
+    with sync_session() as session:
+        products = session.execute(
+            select(Product)
+            .where(Product.активний == True)
+            .order_by(Product.відділ, Product.артикул)
+        ).scalars().all()
+        data = [
+            {
+                "Артикул": p.артикул,
+                "Назва": p.назва,
+                "Відділ": p.відділ,
+                "Група": p.група,
+                "Кількість": p.кількість,
+                "Відкладено": p.відкладено or 0,
+                "Ціна": p.ціна or 0.0,
+                "Сума залишку": p.сума_залишку or 0.0,
+                "Місяці без руху": p.місяці_без_руху or 0,
+            }
+            for p in products
+        ]
+    pd.DataFrame(data).to_excel(filepath, index=False, engine="openpyxl")
+    return len(data)
+
+
+def run_mode(mode: str, rows: int) -> None:
+    _use_bench_db(rows)
+    from handlers.admin.report_handlers import _write_stock_report_sync
+
+    filepath = os.path.join(tempfile.gettempdir(), f"epic_bench_report_{mode}.xlsx")
+    base_rss = _max_rss_mb()
+    started = time.perf_counter()
+
+    if mode == "pandas":
+        count = _pandas_report(filepath)
+    else:
+        count = _write_stock_report_sync(filepath)
+
+    elapsed = time.perf_counter() - started
+    os.remove(filepath)
+    print(f"{mode} {elapsed:.2f} {base_rss:.0f} {_max_rss_mb():.0f} {count}")
+
+
+# ==============================================================================
+# 🚀 ЗАПУСК
+# ==============================================================================
+
+
+def main(rows: int) -> None:
+    path = make_db(rows)
+    print(f"БД: {path} ({rows} товарів)")
+    print(f"{'режим':>8} {'час, с':>8} {'база, МБ':>9} {'пік, МБ':>8} {'приріст, МБ':>12} {'рядків':>8}")
+
+    for mode in MODES:
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_stock_report", "--run", mode, str(rows)],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.split()
+        name, elapsed, base, peak, count = out[-5:]
+        print(
+            f"{name:>8} {float(elapsed):>8.2f} {base:>9} {peak:>8} "
+            f"{int(peak) - int(base):>12} {count:>8}"
+        )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--run":
+        run_mode(sys.argv[2], int(sys.argv[3]))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS)
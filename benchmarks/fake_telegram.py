@@ -0,0 +1,158 @@
+# epicservice/benchmarks/fake_telegram.py
+
+"""
+Фейковий Bot API сервер для локальної перевірки режиму webhook.
+
+Сервер відповідає на запити бота (getMe, sendMessage, setWebhook, ...),
+а коли бот зареєструє webhook — надсилає на нього синтетичні оновлення:
+users користувачів × messages повідомлень "q<user>_<n>". Пошуковий хендлер
+відповідає "Нічого не знайдено за запитом: `q<user>_<n>`", тож за
+відповідями видно пропускну здатність, затримку та чи зберігся порядок
+повідомлень кожного користувача.
+
+Запуск (у двох терміналах, з кореня проєкту):
+    python -m benchmarks.fake_telegram [users] [messages]
+    TELEGRAM_API_URL=http://127.0.0.1:8081 BOT_MODE=webhook \\
+        WEBHOOK_BASE_URL=http://127.0.0.1:8080 BOT_WORKERS=4 python bot.py
+
+Повідомлення одного користувача надсилаються з інтервалом USER_INTERVAL,
+щоб їх не відсікав ThrottlingMiddleware (0.5 с).
+"""
+
+import asyncio
+import re
+import statistics
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from aiohttp import ClientSession, web
+
+HOST, PORT = "127.0.0.1", 8081
+DEFAULT_USERS = 200
+DEFAULT_MESSAGES = 5
+USER_INTERVAL = 0.6
+FIRST_USER_ID = 100_000
+REPLY_TIMEOUT = 60
+
+QUERY = re.compile(r"q(\d+)_(\d+)")
+
+
+class FakeTelegram:
+    def __init__(self, users: int, messages: int):
+        self.users = users
+        self.messages = messages
+        self.webhook: Tuple[str, str] = ("", "")
+        self.webhook_set = asyncio.Event()
+        self.sent: Dict[Tuple[int, int], float] = {}
+        self.replies: Dict[int, List[int]] = defaultdict(list)
+        self.latencies: List[float] = []
+        self.calls: Dict[str, int] = defaultdict(int)
+        self._message_id = 0
+
+    # --- Bot API ---
+
+    async def api(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        fields = await request.post()
+        self.calls[method] += 1
+
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+        elif method in ("sendMessage", "editMessageText"):
+            result = self._message(int(fields["chat_id"]), fields.get("text", ""))
+        elif method == "setWebhook":
+            self.webhook = (fields["url"], fields.get("secret_token", ""))
+            self.webhook_set.set()
+            result = True
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    def _message(self, chat_id: int, text: str) -> dict:
+        match = QUERY.search(text)
+        if match:
+            user, n = int(match.group(1)), int(match.group(2))
+            self.replies[user].append(n)
+            started = self.sent.get((user, n))
+            if started is not None:
+                self.latencies.append(time.perf_counter() - started)
+        self._message_id += 1
+        return {
+            "message_id": self._message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": text,
+        }
+
+    # --- Синтетичні оновлення ---
+
+    async def _post_user(self, http: ClientSession, index: int) -> None:
+        url, secret = self.webhook
+        user = FIRST_USER_ID + index
+        headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+        for n in range(self.messages):
+            update_id = index * self.messages + n + 1
+            update = {
+                "update_id": update_id,
+                "message": {
+                    "message_id": update_id,
+                    "date": int(time.time()),
+                    "chat": {"id": user, "type": "private", "first_name": "U"},
+                    "from": {"id": user, "is_bot": False, "first_name": "U"},
+                    "text": f"q{user}_{n}",
+                },
+            }
+            self.sent[(user, n)] = time.perf_counter()
+            async with http.post(url, json=update, headers=headers) as response:
+                response.raise_for_status()
+            await asyncio.sleep(USER_INTERVAL)
+
+    async def run(self) -> None:
+        await self.webhook_set.wait()
+        print(f"Webhook: {self.webhook[0]}, надсилаю {self.users}×{self.messages} оновлень")
+        expected = self.users * self.messages
+
+        started = time.perf_counter()
+        async with ClientSession() as http:
+            await asyncio.gather(*(self._post_user(http, i) for i in range(self.users)))
+
+        deadline = time.perf_counter() + REPLY_TIMEOUT
+        while len(self.latencies) < expected and time.perf_counter() < deadline:
+            await asyncio.sleep(0.2)
+        elapsed = time.perf_counter() - started
+
+        out_of_order = sum(1 for ns in self.replies.values() if ns != sorted(ns))
+        print(f"Відповідей: {len(self.latencies)} / {expected} за {elapsed:.1f} с")
+        if self.latencies:
+            ordered = sorted(self.latencies)
+            print(
+                f"Затримка: p50 {statistics.median(ordered) * 1000:.0f} мс, "
+                f"p95 {ordered[int(len(ordered) * 0.95) - 1] * 1000:.0f} мс"
+            )
+        print(f"Користувачів з порушеним порядком: {out_of_order}")
+        print(f"Виклики API: {dict(self.calls)}")
+
+
+async def main(users: int, messages: int) -> None:
+    fake = FakeTelegram(users, messages)
+    app = web.Application()
+    app.router.add_post(r"/bot{token}/{method}", fake.api)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, HOST, PORT).start()
+    print(f"Фейковий Bot API: http://{HOST}:{PORT}")
+    try:
+        await fake.run()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_USERS,
+            int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_MESSAGES,
+        )
+    )
@@ -2,15 +2,35 @@
 
 import asyncio
 import logging
+import multiprocessing as mp
+import signal
 import sys
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from sqlalchemy import text
 from apscheduler.schedulers.asyncio import AsyncIOScheduler # 👇 Додано
 
-from config import BOT_TOKEN
+from config import (
+    BOT_MODE,
+    BOT_TOKEN,
+    BOT_WORKERS,
+    FSM_STORAGE,
+    JOB_POLL_INTERVAL,
+    REPORT_PRERENDER_INTERVAL,
+    TELEGRAM_API_URL,
+)
 from database.engine import async_session
+from database.fsm_storage import DatabaseStorage
+from database.orm.analytics import orm_ensure_rollups
+from database.orm.stock_history import (
+    orm_ensure_stock_history_partitions,
+    orm_maintain_stock_history,
+)
+from database.orm.products_fts import orm_ensure_products_fts
+from database.orm.search_index import product_search_index
 
 # --- ІМПОРТИ РОУТЕРІВ ---
 from handlers import archive, common, error_handler, menu_navigation, user_search
@@ -24,36 +44,45 @@ from handlers.admin import utilities as admin_utilities
 from handlers.user import item_addition, list_editing, list_management, list_saving
 from middlewares.logging_middleware import LoggingMiddleware
 from middlewares.throttling import ThrottlingMiddleware
+from services.broadcast import broadcaster
+from services.catalog_sync import catalog_watcher
+from services.job_queue import job_queue
+from utils.render_pool import render_pool
 
 # 👇 Імпорт сервісу пошти
 from services.email_listener import EmailService
+from services.webhook import WebhookFront, consume_updates
+
+logger = logging.getLogger(__name__)
 
 async def set_main_menu(bot: Bot):
     await bot.set_my_commands([])
 
-async def main():
-    log_format = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+
+def setup_logging():
+    log_format = "%(asctime)s - %(levelname)s - %(processName)s - %(name)s - %(message)s"
     logging.basicConfig(
         level=logging.INFO,
         format=log_format,
         handlers=[logging.StreamHandler(sys.stdout), logging.FileHandler("bot.log", mode="a")],
+        force=True,
     )
-    logger = logging.getLogger(__name__)
 
-    if not BOT_TOKEN:
-        sys.exit(1)
 
-    # Перевірка БД
-    try:
-        async with async_session() as session:
-            await session.execute(text("SELECT 1"))
-        logger.info("Підключення до бази даних успішне.")
-    except Exception as e:
-        logger.critical("Помилка підключення до БД: %s", e)
-        sys.exit(1)
+def create_bot() -> Bot:
+    session = None
+    if TELEGRAM_API_URL:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL))
+    return Bot(
+        token=BOT_TOKEN,
+        session=session,
+        default=DefaultBotProperties(parse_mode="Markdown", link_preview_is_disabled=True),
+    )
 
-    bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode="Markdown", link_preview_is_disabled=True))
-    dp = Dispatcher()
+
+def create_dispatcher() -> Dispatcher:
+    # Стани FSM у БД переживають перезапуск і доступні кільком процесам
+    dp = Dispatcher(storage=DatabaseStorage() if FSM_STORAGE == "db" else None)
 
     dp.update.middleware(LoggingMiddleware())
     dp.message.middleware(ThrottlingMiddleware(rate_limit=0.5))
@@ -76,14 +105,95 @@ async def main():
     dp.include_router(archive.router)
     dp.include_router(common.router)
     dp.include_router(user_search.router)
+    return dp
+
 
+def start_scheduler(bot: Bot) -> AsyncIOScheduler:
     # --- 📧 ЗАПУСК EMAIL СЕРВІСУ ---
     email_service = EmailService(bot)
     scheduler = AsyncIOScheduler()
     # Перевіряємо пошту кожні 5 хвилин
     scheduler.add_job(email_service.check_email_and_process, "interval", minutes=5)
+    # Звіт по залишках рендериться наперед після кожного імпорту
+    scheduler.add_job(
+        admin_reports.prerender_stock_report,
+        "interval",
+        seconds=REPORT_PRERENDER_INTERVAL,
+        max_instances=1,
+        coalesce=True,
+    )
+    # Черга фонових завдань (імпорти, експорти, віднімання зібраного)
+    scheduler.add_job(
+        job_queue.poll,
+        "interval",
+        seconds=JOB_POLL_INTERVAL,
+        args=[bot],
+        max_instances=1,
+        coalesce=True,
+    )
+    # Щоночі: секції stock_history наперед і стиснення старої історії
+    scheduler.add_job(orm_maintain_stock_history, "cron", hour=3, minute=30)
     scheduler.start()
     logger.info("📧 Email Listener запущено (інтервал: 5 хв)")
+    return scheduler
+
+
+async def check_database():
+    try:
+        async with async_session() as session:
+            await session.execute(text("SELECT 1"))
+        logger.info("Підключення до бази даних успішне.")
+    except Exception as e:
+        logger.critical("Помилка підключення до БД: %s", e)
+        sys.exit(1)
+
+
+async def prepare_database():
+    """Підготовка БД, яку досить виконати один раз (не в кожному воркері)."""
+    try:
+        await orm_ensure_products_fts()
+    except Exception as e:
+        logger.error("Не вдалося створити FTS-індекс товарів: %s", e, exc_info=True)
+
+    # Щоденні агрегати статистики (порожні — одразу після міграції 0004)
+    await orm_ensure_rollups()
+
+    # Секції історії залишків на поточний і наступні місяці (PostgreSQL)
+    try:
+        await orm_ensure_stock_history_partitions()
+    except Exception as e:
+        logger.error("Не вдалося створити секції stock_history: %s", e, exc_info=True)
+
+
+async def build_search_index():
+    # Пошуковий індекс у пам'яті процесу (до побудови пошук іде через БД:
+    # FTS5 на SQLite, pg_trgm на PostgreSQL)
+    try:
+        await product_search_index.rebuild()
+    except Exception as e:
+        logger.error("Не вдалося побудувати пошуковий індекс: %s", e, exc_info=True)
+
+
+async def shutdown(bot: Bot):
+    logger.info("Завершення роботи бота...")
+    await broadcaster.shutdown()
+    await job_queue.shutdown()
+    render_pool.shutdown()
+    await bot.session.close()
+
+
+# ==============================================================================
+# 🔁 POLLING (ОДИН ПРОЦЕС)
+# ==============================================================================
+
+
+async def run_polling():
+    await prepare_database()
+    await build_search_index()
+
+    bot = create_bot()
+    dp = create_dispatcher()
+    start_scheduler(bot)
 
     try:
         await set_main_menu(bot)
@@ -93,11 +203,72 @@ async def main():
     except Exception as e:
         logger.critical("Критична помилка: %s", e, exc_info=True)
     finally:
-        logger.info("Завершення роботи бота...")
+        await shutdown(bot)
+
+
+# ==============================================================================
+# 🌐 WEBHOOK (ФРОНТ + ВОРКЕРИ)
+# ==============================================================================
+
+
+async def run_worker(shard: int, queue: mp.Queue, ready: mp.Queue):
+    await check_database()
+    await build_search_index()
+
+    bot = create_bot()
+    dp = create_dispatcher()
+    # Фонові завдання (і черга завдань з імпортами та розсилками) — лише в
+    # одному воркері; зміни каталогу решта підтягує з БД
+    if shard == 0:
+        start_scheduler(bot)
+    catalog_watcher.start()
+
+    try:
+        await dp.emit_startup(bot=bot)
+        ready.put(shard)
+        await consume_updates(dp, bot, queue)
+    except Exception as e:
+        logger.critical("Критична помилка воркера %s: %s", shard, e, exc_info=True)
+    finally:
+        await catalog_watcher.stop()
+        await dp.emit_shutdown(bot=bot)
+        await shutdown(bot)
+
+
+def worker_main(shard: int, queue: mp.Queue, ready: mp.Queue):
+    """Точка входу процесу-воркера (зупиняється сигналом від фронту)."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    setup_logging()
+    asyncio.run(run_worker(shard, queue, ready))
+
+
+async def run_webhook():
+    await prepare_database()
+
+    bot = create_bot()
+    try:
+        await set_main_menu(bot)
+        await WebhookFront(worker_main, BOT_WORKERS).run(bot)
+    finally:
         await bot.session.close()
 
+
+async def main():
+    setup_logging()
+
+    if not BOT_TOKEN:
+        sys.exit(1)
+
+    # Перевірка БД
+    await check_database()
+
+    if BOT_MODE == "webhook":
+        await run_webhook()
+    else:
+        await run_polling()
+
 if __name__ == "__main__":
     try:
         asyncio.run(main())
     except (KeyboardInterrupt, SystemExit):
-        pass
\ No newline at end of file
+        pass
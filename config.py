@@ -122,3 +122,80 @@ else:
 # --- Конфігурація Сховища ---
 ARCHIVES_PATH = "archives"
 BACKUP_DIR = "backups"
+
+# --- Пул рендерингу файлів (Excel) ---
+# RENDER_POOL: "thread" або "process" (openpyxl тримає GIL, процеси дають
+# справжній паралелізм ціною передачі DataFrame між процесами)
+RENDER_POOL = os.getenv("RENDER_POOL", "thread").lower()
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))
+# Скільки завдань може чекати на вільного воркера понад RENDER_WORKERS
+RENDER_QUEUE_SIZE = int(os.getenv("RENDER_QUEUE_SIZE", "50"))
+
+# --- Знімки звіту по залишках ---
+# Готові файли звіту для поточної версії каталогу (повторні запити без рендерингу)
+REPORT_SNAPSHOTS_PATH = os.path.join(ARCHIVES_PATH, "snapshots")
+# Як часто (с) планувальник перевіряє, чи завершився імпорт, щоб наперед
+# відрендерити звіт
+REPORT_PRERENDER_INTERVAL = int(os.getenv("REPORT_PRERENDER_INTERVAL", "30"))
+
+# --- Історія залишків ---
+# Старша історія стискається до одного рядка на товар за день (чистий підсумок)
+STOCK_HISTORY_RETENTION_DAYS = int(os.getenv("STOCK_HISTORY_RETENTION_DAYS", "90"))
+
+# --- Розсилка ---
+# Глобальний ліміт Telegram — ~30 повідомлень/с; тримаємо запас
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "25"))
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "10"))
+# Як часто (с) оновлювати прогрес у повідомленні адміна
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv("BROADCAST_PROGRESS_INTERVAL", "5"))
+# Повтори одного повідомлення після TelegramRetryAfter
+BROADCAST_MAX_RETRIES = int(os.getenv("BROADCAST_MAX_RETRIES", "3"))
+
+# --- Примусове збереження списків перед імпортом ---
+# Скільки користувачів одночасно отримують файли (ліміт швидкості — BROADCAST_RATE)
+FORCE_SAVE_CONCURRENCY = int(os.getenv("FORCE_SAVE_CONCURRENCY", "10"))
+
+# --- ZIP архівів користувача ---
+# Останній зібраний ZIP кожного користувача (до зміни набору архівів)
+ARCHIVE_ZIP_CACHE_PATH = os.path.join(ARCHIVES_PATH, "zip_cache")
+
+# --- Сховище станів FSM ---
+# "db" — таблиця fsm_states в основній БД (стани переживають перезапуск),
+# "memory" — MemoryStorage aiogram
+FSM_STORAGE = os.getenv("FSM_STORAGE", "db").lower()
+# Локальний LRU станів: розмір і час життя запису (с)
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "10000"))
+FSM_CACHE_TTL = int(os.getenv("FSM_CACHE_TTL", "600"))
+# Як часто (с) змінені стани пачкою записуються в БД
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", "1"))
+
+# --- Режим запуску бота ---
+# "polling" — один процес; "webhook" — фронт-процес приймає оновлення від
+# Telegram і розподіляє їх між BOT_WORKERS процесами за user_id
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", str(os.cpu_count() or 1)))
+# Публічна адреса, на яку Telegram надсилатиме оновлення (https://...)
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+# Перевіряється в заголовку X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+# Як часто (с) кожен воркер підтягує зміни каталогу, зроблені іншими
+# процесами (пошуковий індекс і кеші товарів — свої в кожному воркері)
+CATALOG_SYNC_INTERVAL = float(os.getenv("CATALOG_SYNC_INTERVAL", "5"))
+# Інший Bot API сервер (локальний telegram-bot-api або benchmarks/fake_telegram.py)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
+
+# --- Черга фонових завдань ---
+# Як часто (с) планувальник перевіряє чергу
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+# Скільки завдань виконується одночасно
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Затримка (с) перед повтором, множиться на номер спроби
+JOB_RETRY_DELAY = int(os.getenv("JOB_RETRY_DELAY", "30"))
+# Як часто (с) оновлювати прогрес у повідомленні
+JOB_PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", "3"))
+# Завдання "running" без оновлень довше за це (с) вважається завислим
+JOB_STALE_AFTER = int(os.getenv("JOB_STALE_AFTER", "600"))
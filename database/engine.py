@@ -1,8 +1,9 @@
 # epicservice/database/engine.py
 
 import logging
+from datetime import datetime
 
-from sqlalchemy import create_engine, event
+from sqlalchemy import create_engine, event, func
 from sqlalchemy.engine import Engine
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
@@ -133,6 +134,41 @@ logger.info(
 )
 
 
+# ==============================================================================
+# 🔀 ДІАЛЕКТНІ КОНСТРУКЦІЇ
+# ==============================================================================
+
+
+def is_postgres() -> bool:
+    """Чи працює бот з PostgreSQL (а не з SQLite)."""
+    return DB_TYPE == "postgres"
+
+
+def dialect_insert(table):
+    """
+    Повертає INSERT для поточної БД з підтримкою ON CONFLICT.
+    PostgreSQL і SQLite (3.24+) мають однаковий синтаксис upsert.
+    """
+    if is_postgres():
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+
+def datetime_bound(value: datetime):
+    """
+    Межа для порівняння з DateTime-колонкою (з точністю до секунди).
+    SQLite зберігає дати текстом, а SQLAlchemy прив'язує datetime як
+    "YYYY-MM-DD HH:MM:SS.ffffff": значення з func.now() чи datetime(...)
+    ("YYYY-MM-DD HH:MM:SS") рівно на межі лексично менше за неї. datetime()
+    зводить межу до того ж формату.
+    """
+    if is_postgres():
+        return value
+    return func.datetime(value)
+
+
 # ==============================================================================
 # 🧪 ТЕСТУВАННЯ ПІДКЛЮЧЕННЯ
 # ==============================================================================
@@ -0,0 +1,175 @@
+# epicservice/database/fsm_storage.py
+
+"""
+Сховище станів FSM aiogram в основній БД (таблиця fsm_states).
+
+- Читання йде з процесного LRU (cachetools.TTLCache); до БД звертаємося
+  лише на промах — один SELECT на ключ.
+- Запис одразу оновлює LRU, а в БД потрапляє пачкою раз на
+  FSM_FLUSH_INTERVAL секунд (write-behind) і при закритті сховища.
+- Порожній стан (без state і data) видаляється з таблиці.
+
+Кілька процесів бота можуть ділити таблицю, якщо оновлення одного чату
+обробляє один процес (TTL кешу обмежує, наскільки застарілим може бути
+стан, якщо чат перейде до іншого процесу).
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Mapping, NamedTuple, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from cachetools import TTLCache
+from sqlalchemy import delete, func, select
+
+from config import FSM_CACHE_SIZE, FSM_CACHE_TTL, FSM_FLUSH_INTERVAL
+from database.engine import async_session, dialect_insert
+from database.models import FsmState
+
+logger = logging.getLogger(__name__)
+
+
+class _Record(NamedTuple):
+    state: Optional[str]
+    data: Dict[str, Any]
+
+
+class _Pending(NamedTuple):
+    state: Optional[str]
+    data: str  # JSON
+
+    @property
+    def empty(self) -> bool:
+        return self.state is None and self.data == "{}"
+
+
+class DatabaseStorage(BaseStorage):
+    """FSM-сховище: LRU у процесі + пакетний запис у fsm_states."""
+
+    def __init__(
+        self,
+        cache_size: int = FSM_CACHE_SIZE,
+        cache_ttl: int = FSM_CACHE_TTL,
+        flush_interval: float = FSM_FLUSH_INTERVAL,
+    ):
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self.flush_interval = flush_interval
+        self._cache: TTLCache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        # Змінені, ще не записані стани; _flushing — пачка, що пишеться зараз
+        self._dirty: Dict[str, _Pending] = {}
+        self._flushing: Dict[str, _Pending] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+
+    # --- Читання ---
+
+    async def _get(self, key: StorageKey) -> _Record:
+        k = self.key_builder.build(key)
+        record = self._cache.get(k)
+        if record is not None:
+            return record
+
+        pending = self._dirty.get(k) or self._flushing.get(k)
+        if pending is not None:
+            record = _Record(pending.state, json.loads(pending.data))
+        else:
+            async with async_session() as session:
+                row = (
+                    await session.execute(
+                        select(FsmState.state, FsmState.data).where(FsmState.key == k)
+                    )
+                ).one_or_none()
+            record = _Record(row.state, json.loads(row.data)) if row else _Record(None, {})
+
+        self._cache[k] = record
+        return record
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._get(key)).state
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._get(key)).data.copy()
+
+    # --- Запис ---
+
+    def _put(self, key: StorageKey, state: Optional[str], data: Dict[str, Any]) -> None:
+        k = self.key_builder.build(key)
+        # JSON одразу — неприпустимі дані дають помилку в хендлері, а не при записі
+        pending = _Pending(state, json.dumps(data, ensure_ascii=False))
+        self._cache[k] = _Record(state, data)
+        self._dirty[k] = pending
+
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._get(key)
+        new_state = state.state if isinstance(state, State) else state
+        self._put(key, new_state, record.data)
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        record = await self._get(key)
+        self._put(key, record.state, dict(data))
+
+    # --- Пакетний запис у БД ---
+
+    async def _flush_loop(self) -> None:
+        while self._dirty:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Помилка запису станів FSM: %s", e, exc_info=True)
+
+    async def flush(self) -> int:
+        """Записує всі змінені стани однією транзакцією. Повертає їх кількість."""
+        async with self._flush_lock:
+            if not self._dirty:
+                return 0
+            self._flushing, self._dirty = self._dirty, {}
+            try:
+                upserts = [
+                    {"key": k, "state": p.state, "data": p.data}
+                    for k, p in self._flushing.items()
+                    if not p.empty
+                ]
+                removed = [k for k, p in self._flushing.items() if p.empty]
+
+                async with async_session() as session:
+                    if upserts:
+                        stmt = dialect_insert(FsmState)
+                        await session.execute(
+                            stmt.on_conflict_do_update(
+                                index_elements=[FsmState.key],
+                                set_={
+                                    "state": stmt.excluded.state,
+                                    "data": stmt.excluded.data,
+                                    "updated_at": func.now(),
+                                },
+                            ),
+                            upserts,
+                        )
+                    if removed:
+                        await session.execute(delete(FsmState).where(FsmState.key.in_(removed)))
+                    await session.commit()
+                return len(self._flushing)
+
+            except BaseException:
+                # Повертаємо незаписане (новіші зміни з _dirty мають перевагу)
+                for k, p in self._flushing.items():
+                    self._dirty.setdefault(k, p)
+                raise
+            finally:
+                self._flushing = {}
+
+    async def close(self) -> None:
+        if self._flusher is not None and not self._flusher.done():
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        logger.info("Стани FSM записано в БД")
@@ -1,17 +1,22 @@
 # epicservice/database/models.py
 
-from datetime import datetime
+from datetime import date, datetime
 from typing import List, Optional
 
 from sqlalchemy import (
     BigInteger,
     Boolean,
+    Date,
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
+    Text,
+    UniqueConstraint,
     func,
+    text,
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
@@ -26,6 +31,8 @@ class User(Base):
     username: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
     first_name: Mapped[str] = mapped_column(String(100))
     created_at: Mapped[datetime] = mapped_column(DateTime, default=func.now())
+    # Коли бот був заблокований користувачем (розсилки його пропускають)
+    blocked_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
     saved_lists: Mapped[List["SavedList"]] = relationship(back_populates="user")
     temp_list_items: Mapped[List["TempList"]] = relationship(back_populates="user")
@@ -46,7 +53,31 @@ class Product(Base):
     ціна: Mapped[float] = mapped_column(Float, nullable=True, default=0.0)
     активний: Mapped[bool] = mapped_column(Boolean, default=True, index=True)
     updated_at: Mapped[datetime] = mapped_column(
-        DateTime, default=func.now(), onupdate=func.now()
+        DateTime, default=func.now(), onupdate=func.now(), index=True
+    )
+
+    # Індекси пошуку тільки для PostgreSQL (потрібне розширення pg_trgm),
+    # створюються міграцією alembic/versions/0002_product_search_indexes.py
+    __table_args__ = (
+        Index(
+            "ix_products_назва_trgm",
+            "назва",
+            postgresql_using="gin",
+            postgresql_ops={"назва": "gin_trgm_ops"},
+            postgresql_where=text("активний = true"),
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_products_артикул_trgm",
+            "артикул",
+            postgresql_using="gin",
+            postgresql_ops={"артикул": "gin_trgm_ops"},
+            postgresql_where=text("активний = true"),
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_products_відділ_active",
+            "відділ",
+            postgresql_where=text("активний = true"),
+        ).ddl_if(dialect="postgresql"),
     )
 
 
@@ -55,15 +86,23 @@ class StockHistory(Base):
 
     __tablename__ = "stock_history"
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    product_id: Mapped[int] = mapped_column(ForeignKey("products.id"), index=True)
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id"))
     articul: Mapped[str] = mapped_column(String(20))
     old_quantity: Mapped[str] = mapped_column(String(50))
     new_quantity: Mapped[str] = mapped_column(String(50))
     change_source: Mapped[str] = mapped_column(
         String(50)
-    )  # 'import', 'user_list', 'manual'
+    )  # 'import', 'user_list', 'manual', 'order', 'compacted'
     changed_at: Mapped[datetime] = mapped_column(DateTime, default=func.now())
 
+    # На PostgreSQL таблиця секціонована помісячно за changed_at (PK — id,
+    # changed_at), див. alembic/versions/0005_stock_history_partitions.py;
+    # історію старшу за STOCK_HISTORY_RETENTION_DAYS стискає orm_compact_stock_history
+    __table_args__ = (
+        Index("ix_stock_history_product_changed", "product_id", "changed_at"),
+        Index("ix_stock_history_changed_at", "changed_at"),
+    )
+
 
 class SavedList(Base):
     __tablename__ = "saved_lists"
@@ -98,3 +137,85 @@ class TempList(Base):
 
     product: Mapped["Product"] = relationship()
     user: Mapped["User"] = relationship(back_populates="temp_list_items")
+
+    # Одна позиція на товар у списку користувача: додавання робиться
+    # upsert-ом ON CONFLICT (міграція alembic/versions/0003_temp_list_unique.py)
+    __table_args__ = (
+        UniqueConstraint("user_id", "product_id", name="uq_temp_lists_user_product"),
+    )
+
+
+class CollectedDaily(Base):
+    """
+    Щоденні агрегати зібраного: день × відділ × артикул.
+    Оновлюється в транзакції збереження списку, перебудовується з
+    saved_lists/saved_list_items (міграція 0004, /rebuild_stats).
+    """
+
+    __tablename__ = "collected_daily"
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    department: Mapped[int] = mapped_column(BigInteger, primary_key=True)  # 0 — невідомий
+    article: Mapped[str] = mapped_column(String(255), primary_key=True)
+    quantity: Mapped[int] = mapped_column(Integer, default=0)
+    orders: Mapped[int] = mapped_column(Integer, default=0)  # списків з цим артикулом
+    users: Mapped[int] = mapped_column(Integer, default=0)  # різних користувачів за день
+
+    __table_args__ = (Index("ix_collected_daily_article", "article"),)
+
+
+class UserDailyActivity(Base):
+    """Щоденна активність користувача: збережені списки, позиції, кількість."""
+
+    __tablename__ = "user_daily_activity"
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    user_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    lists: Mapped[int] = mapped_column(Integer, default=0)
+    positions: Mapped[int] = mapped_column(Integer, default=0)
+    quantity: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class FsmState(Base):
+    """
+    Стан FSM aiogram (ключ — DefaultKeyBuilder). Пишеться пачками з
+    database/fsm_storage.py (міграція 0007).
+    """
+
+    __tablename__ = "fsm_states"
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    state: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    data: Mapped[str] = mapped_column(Text, default="{}")  # JSON
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=func.now(), onupdate=func.now()
+    )
+
+
+class Job(Base):
+    """
+    Фонове завдання (імпорт, віднімання, експорт...). Ставиться в чергу
+    хендлером, виконується services/job_queue.py (міграція 0008).
+    status: 'queued' | 'running' | 'done' | 'failed'.
+    """
+
+    __tablename__ = "jobs"
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(50))
+    status: Mapped[str] = mapped_column(String(20), default="queued")
+    payload: Mapped[str] = mapped_column(Text, default="{}")  # JSON
+    # Куди писати прогрес і результат
+    chat_id: Mapped[int] = mapped_column(BigInteger)
+    message_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    progress: Mapped[int] = mapped_column(Integer, default=0)  # 0..100
+    result: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    result_path: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, default=3)
+    run_after: Mapped[datetime] = mapped_column(DateTime, default=func.now())
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=func.now())
+    # Оновлюється під час виконання (за ним знаходимо завислі завдання)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=func.now(), onupdate=func.now()
+    )
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+    __table_args__ = (Index("ix_jobs_status_run_after", "status", "run_after"),)
@@ -7,10 +7,17 @@
 
 # --- Аналітика ---
 from .analytics import (
-    orm_get_all_collected_items_sync,
+    COLLECTED_GROUPINGS,
+    orm_ensure_rollups,
+    orm_get_collected_summary_sync,
     orm_get_department_stats,
     orm_get_top_products,
     orm_get_user_activity_stats,
+    orm_iter_collected_items_sync,
+    orm_rebuild_rollup_days,
+    orm_rebuild_rollups,
+    orm_record_saved_list,
+    orm_record_saved_lists,
 )
 
 # --- Архіви ---
@@ -27,6 +34,17 @@ from .archives import (
     # orm_get_saved_list_items,   # ❌ Видалено (не існує в archives.py)
 )
 
+# --- Фонові завдання ---
+from .jobs import (
+    orm_claim_job,
+    orm_enqueue_job,
+    orm_fail_job,
+    orm_finish_job,
+    orm_get_recent_jobs,
+    orm_requeue_stale_jobs,
+    orm_update_job_progress,
+)
+
 # --- Товари ---
 from .products import (
     get_available_quantity,
@@ -43,11 +61,32 @@ from .products import (
     validate_product_quantity,
 )
 
+# --- Імпорт залишків ---
+from .stock_import import StockImportReadError, orm_import_stock
+
+# --- Історія залишків ---
+from .stock_history import (
+    orm_compact_stock_history,
+    orm_ensure_stock_history_partitions,
+    orm_maintain_stock_history,
+)
+
+# --- Пошуковий індекс ---
+from .products_fts import (
+    orm_ensure_products_fts,
+    orm_rebuild_products_fts,
+    orm_search_products_fts,
+)
+from .search_index import SearchHit, product_search_index
+
 # --- Тимчасові списки ---
 from .temp_lists import (
+    ProductCardView,
     orm_add_item_to_temp_list,
     orm_clear_temp_list,
     orm_delete_item_from_temp_list,
+    orm_get_product_card,
+    orm_get_product_card_view,
     orm_get_temp_list,
     orm_get_temp_list_department,
     orm_get_temp_list_item,
@@ -76,6 +115,19 @@ __all__ = [
     "orm_get_total_stock_value",
     "validate_product_quantity",
     "get_available_quantity",
+    # Імпорт залишків
+    "orm_import_stock",
+    "StockImportReadError",
+    # Історія залишків
+    "orm_compact_stock_history",
+    "orm_ensure_stock_history_partitions",
+    "orm_maintain_stock_history",
+    # Пошуковий індекс
+    "SearchHit",
+    "product_search_index",
+    "orm_ensure_products_fts",
+    "orm_rebuild_products_fts",
+    "orm_search_products_fts",
     # Тимчасові списки
     "orm_get_temp_list",
     "orm_get_temp_list_department",
@@ -86,6 +138,9 @@ __all__ = [
     "orm_clear_temp_list",
     "orm_get_total_temp_reservation_for_product",
     "orm_get_temp_list_summary",
+    "orm_get_product_card",
+    "orm_get_product_card_view",
+    "ProductCardView",
     # Архіви
     "orm_get_user_lists_archive",
     "orm_get_all_archives",
@@ -94,8 +149,23 @@ __all__ = [
     "orm_delete_archive_by_id",   # ✅
     "orm_pack_user_files_to_zip",
     # Аналітика
-    "orm_get_all_collected_items_sync",
+    "COLLECTED_GROUPINGS",
+    "orm_iter_collected_items_sync",
+    "orm_get_collected_summary_sync",
     "orm_get_top_products",
     "orm_get_department_stats",
     "orm_get_user_activity_stats",
+    "orm_record_saved_list",
+    "orm_record_saved_lists",
+    "orm_rebuild_rollups",
+    "orm_rebuild_rollup_days",
+    "orm_ensure_rollups",
+    # Фонові завдання
+    "orm_enqueue_job",
+    "orm_claim_job",
+    "orm_update_job_progress",
+    "orm_finish_job",
+    "orm_fail_job",
+    "orm_requeue_stale_jobs",
+    "orm_get_recent_jobs",
 ]
\ No newline at end of file
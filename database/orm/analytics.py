@@ -1,72 +1,514 @@
 # epicservice/database/orm/analytics.py
 
 import logging
-from datetime import datetime, timedelta
-from typing import List
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
-from sqlalchemy import func, select
+from sqlalchemy import Date, case, cast, delete, distinct, func, insert, select, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from database.engine import sync_session
+from database.engine import async_session, dialect_insert, is_postgres, sync_session
 from database.models import (
+    CollectedDaily,
     Product,
     SavedList,
     SavedListItem,
     StockHistory,
     TempList,
     User,
+    UserDailyActivity,
 )
 
 logger = logging.getLogger(__name__)
 
 
 # ==============================================================================
-# 📊 СИНХРОННІ ФУНКЦІЇ (ДЛЯ EXECUTOR)
+# 🧮 SQL-ВИРАЗИ ТА КОЛОНКОВІ РЕЗУЛЬТАТИ
 # ==============================================================================
 
+# Назва позиції у SavedListItem: "АРТИКУЛ - НАЗВА"
+_ARTICLE_SEPARATOR = " - "
 
-def orm_get_all_collected_items_sync() -> List[dict]:
+# Допустимі групування зібраного (orm_get_collected_summary_sync)
+COLLECTED_GROUPINGS = ("article", "user", "department", "day")
+
+# Користувачів на один запит "уже збирав сьогодні" (ліміт параметрів SQLite)
+_ROLLUP_BATCH_SIZE = 500
+
+
+def _separator_pos():
+    """Позиція першого " - " у назві позиції (0 — немає)."""
+    if is_postgres():
+        return func.strpos(SavedListItem.article_name, _ARTICLE_SEPARATOR)
+    return func.instr(SavedListItem.article_name, _ARTICLE_SEPARATOR)
+
+
+def _article_expr():
+    """Артикул з назви позиції (як article_name.split(" - ", 1)[0])."""
+    pos = _separator_pos()
+    return case(
+        (pos > 0, func.substr(SavedListItem.article_name, 1, pos - 1)),
+        else_=SavedListItem.article_name,
+    )
+
+
+def _name_expr():
+    """Назва товару з назви позиції (без артикулу)."""
+    pos = _separator_pos()
+    return case(
+        (pos > 0, func.substr(SavedListItem.article_name, pos + len(_ARTICLE_SEPARATOR))),
+        else_=SavedListItem.article_name,
+    )
+
+
+def _day_expr():
+    """День збереження списку як DATE."""
+    if is_postgres():
+        return cast(SavedList.created_at, Date)
+    # SQLite: CAST AS DATE дає число, date() — рядок 'YYYY-MM-DD'
+    return type_coerce(func.date(SavedList.created_at), Date)
+
+
+def _in_period(stmt, date_from: Optional[datetime], date_to: Optional[datetime]):
+    """Фільтр за датою збереження списку: [date_from, date_to)."""
+    if date_from is not None:
+        stmt = stmt.where(SavedList.created_at >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(SavedList.created_at < date_to)
+    return stmt
+
+
+def _columns(result) -> Dict[str, list]:
     """
-    СИНХРОННА функція для отримання всіх зібраних товарів з усіх збережених списків.
-    Використовується в executor для генерації звітів.
+    Результат запиту як колонки {назва: [значення, ...]} — готово для
+    pd.DataFrame(...) без словника на кожен рядок.
+    """
+    keys = list(result.keys())
+    rows = result.all()
+    if not rows:
+        return {key: [] for key in keys}
+    return {key: list(values) for key, values in zip(keys, zip(*rows))}
+
+
+# ==============================================================================
+# 📊 ЗІБРАНІ ТОВАРИ (ДЛЯ EXECUTOR)
+# ==============================================================================
+
+
+def orm_iter_collected_items_sync(
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    yield_per: int = 2000,
+) -> Iterator[Tuple[str, str, int, int, datetime]]:
+    """
+    СИНХРОННА функція: потоково віддає позиції збережених списків
+    (новіші першими), за потреби — лише збережених у [date_from, date_to).
+    Артикул і назва розбираються в SQL, рядки читаються з курсора пачками
+    по yield_per.
+
+    Yields:
+        (article, name, quantity, user_id, created_at)
+    """
+    stmt = _in_period(
+        select(
+            _article_expr().label("article"),
+            _name_expr().label("name"),
+            SavedListItem.quantity.label("quantity"),
+            SavedList.user_id.label("user_id"),
+            SavedList.created_at.label("created_at"),
+        )
+        .join(SavedList, SavedListItem.list_id == SavedList.id)
+        .order_by(SavedList.created_at.desc()),
+        date_from,
+        date_to,
+    )
+    with sync_session() as session:
+        result = session.execute(stmt.execution_options(yield_per=yield_per))
+        yield from result.tuples()
+
+
+def orm_get_collected_summary_sync(
+    group_by: Sequence[str] = ("article",),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> Dict[str, list]:
+    """
+    СИНХРОННА функція: агрегати зібраного, пораховані в БД.
+
+    Групування без користувача та лише за користувачем/днем читаються з
+    щоденних агрегатів (collected_daily, user_daily_activity) — тоді період
+    береться з точністю до дня. Користувач разом з артикулом/відділом
+    рахується по saved_lists/saved_list_items.
+
+    Args:
+        group_by: будь-яка комбінація COLLECTED_GROUPINGS
+            ("article", "user", "department", "day")
+        date_from, date_to: період збереження списків [date_from, date_to)
 
     Returns:
-        Список словників з інформацією про зібрані товари
+        Колонки групування (для "article" — ще name, для "user" — username),
+        далі total_quantity, positions. Сортування — за колонками
+        групування, NULL (напр. артикул не з каталогу) в кінці.
     """
+    unknown = set(group_by) - set(COLLECTED_GROUPINGS)
+    if not group_by or unknown:
+        raise ValueError(f"Невідоме групування зібраного: {sorted(unknown) or group_by}")
+
+    if set(group_by) <= {"user", "day"}:
+        stmt = _user_daily_summary(group_by, date_from, date_to)
+    elif "user" not in group_by:
+        stmt = _collected_daily_summary(group_by, date_from, date_to)
+    else:
+        stmt = _saved_items_summary(group_by, date_from, date_to)
+
     try:
         with sync_session() as session:
-            # Отримуємо всі позиції з збережених списків
-            result = session.execute(
-                select(SavedListItem, SavedList)
-                .join(SavedList, SavedListItem.list_id == SavedList.id)
-                .order_by(SavedList.created_at.desc())
-            )
+            return _columns(session.execute(stmt))
 
-            items = []
-            for item, saved_list in result:
-                # Парсимо назву товару (формат: "АРТИКУЛ - НАЗВА")
-                parts = item.article_name.split(" - ", 1)
-                article = parts[0] if len(parts) > 0 else ""
-                name = parts[1] if len(parts) > 1 else item.article_name
+    except Exception as e:
+        logger.error("Помилка агрегації зібраного (%s): %s", group_by, e, exc_info=True)
+        return {column.key: [] for column in stmt.selected_columns}
+
+
+def _ordered(stmt, keys):
+    return stmt.group_by(*keys).order_by(*(key.asc().nulls_last() for key in keys))
+
+
+def _saved_items_summary(group_by, date_from, date_to):
+    """Агрегати по saved_lists/saved_list_items (групування з користувачем)."""
+    article = _article_expr()
+    keys, extra = [], []
+    if "article" in group_by:
+        keys.append(article.label("article"))
+        extra.append(func.max(_name_expr()).label("name"))
+    if "user" in group_by:
+        keys.append(SavedList.user_id.label("user_id"))
+        extra.append(func.max(User.username).label("username"))
+    if "department" in group_by:
+        keys.append(Product.відділ.label("department"))
+    if "day" in group_by:
+        keys.append(_day_expr().label("day"))
+
+    stmt = select(
+        *keys,
+        *extra,
+        func.sum(SavedListItem.quantity).label("total_quantity"),
+        func.count(SavedListItem.id).label("positions"),
+    ).join(SavedList, SavedListItem.list_id == SavedList.id)
+    if "user" in group_by:
+        stmt = stmt.outerjoin(User, SavedList.user_id == User.id)
+    if "department" in group_by:
+        # Відділ не зберігається в SavedListItem — беремо з каталогу за артикулом
+        stmt = stmt.outerjoin(Product, Product.артикул == article)
+    return _ordered(_in_period(stmt, date_from, date_to), keys)
+
+
+def _collected_daily_summary(group_by, date_from, date_to):
+    """Агрегати з collected_daily (день × відділ × артикул)."""
+    keys, extra = [], []
+    if "article" in group_by:
+        keys.append(CollectedDaily.article.label("article"))
+        extra.append(
+            func.coalesce(func.max(Product.назва), CollectedDaily.article).label("name")
+        )
+    if "department" in group_by:
+        keys.append(func.nullif(CollectedDaily.department, 0).label("department"))
+    if "day" in group_by:
+        keys.append(CollectedDaily.day.label("day"))
+
+    stmt = select(
+        *keys,
+        *extra,
+        func.sum(CollectedDaily.quantity).label("total_quantity"),
+        func.sum(CollectedDaily.orders).label("positions"),
+    )
+    if "article" in group_by:
+        stmt = stmt.outerjoin(Product, Product.артикул == CollectedDaily.article)
+    return _ordered(_in_days(stmt, CollectedDaily.day, date_from, date_to), keys)
+
+
+def _user_daily_summary(group_by, date_from, date_to):
+    """Агрегати з user_daily_activity (день × користувач)."""
+    keys, extra = [], []
+    if "user" in group_by:
+        keys.append(UserDailyActivity.user_id.label("user_id"))
+        extra.append(func.max(User.username).label("username"))
+    if "day" in group_by:
+        keys.append(UserDailyActivity.day.label("day"))
+
+    stmt = select(
+        *keys,
+        *extra,
+        func.sum(UserDailyActivity.quantity).label("total_quantity"),
+        func.sum(UserDailyActivity.positions).label("positions"),
+    )
+    if "user" in group_by:
+        stmt = stmt.outerjoin(User, UserDailyActivity.user_id == User.id)
+    return _ordered(_in_days(stmt, UserDailyActivity.day, date_from, date_to), keys)
 
-                items.append(
-                    {
-                        "article": article,
-                        "name": name,
-                        "quantity": item.quantity,
-                        "user_id": saved_list.user_id,
-                        "created_at": saved_list.created_at,
-                        "department": "",  # Відділ не зберігається в SavedListItem
-                        "group": "",  # Група не зберігається в SavedListItem
-                    }
+
+# ==============================================================================
+# 🗃 ЩОДЕННІ АГРЕГАТИ (collected_daily, user_daily_activity)
+# ==============================================================================
+
+
+def _in_days(stmt, day_column, date_from: Optional[datetime], date_to: Optional[datetime]):
+    """Фільтр [date_from, date_to) з точністю до дня (неповний день входить)."""
+    if date_from is not None:
+        stmt = stmt.where(day_column >= date_from.date())
+    if date_to is not None:
+        last = date_to.date()
+        if date_to == datetime.combine(last, datetime.min.time()):
+            stmt = stmt.where(day_column < last)
+        else:
+            stmt = stmt.where(day_column <= last)
+    return stmt
+
+
+async def orm_record_saved_list(
+    session: AsyncSession,
+    list_id: int,
+    user_id: int,
+    created_at: datetime,
+    items: Sequence[Tuple[Optional[int], str, int]],
+) -> None:
+    """
+    Додає збережений список до щоденних агрегатів. Викликається в
+    транзакції збереження списку (до commit), тож агрегати і списки
+    не розходяться.
+
+    Args:
+        items: позиції списку (відділ, артикул, кількість)
+    """
+    await orm_record_saved_lists(session, [(list_id, user_id, created_at, items)])
+
+
+async def orm_record_saved_lists(
+    session: AsyncSession,
+    saved_lists: Sequence[
+        Tuple[int, int, datetime, Sequence[Tuple[Optional[int], str, int]]]
+    ],
+) -> None:
+    """
+    Пакетний orm_record_saved_list для кількох щойно збережених списків
+    (list_id, user_id, created_at, items): один запит "уже збирав сьогодні"
+    і по одному upsert на таблицю агрегатів (пачками).
+    """
+    if not saved_lists:
+        return
+
+    list_ids = [list_id for list_id, _, _, _ in saved_lists]
+    user_ids = list({user_id for _, user_id, _, _ in saved_lists})
+    days = list({created_at.date() for _, _, created_at, _ in saved_lists})
+
+    # Артикули, які користувачі вже збирали в ці дні в інших списках
+    article = _article_expr()
+    day_expr = _day_expr()
+    seen = set()
+    for start in range(0, len(user_ids), _ROLLUP_BATCH_SIZE):
+        seen.update(
+            (
+                await session.execute(
+                    select(SavedList.user_id, day_expr, article)
+                    .join(SavedList, SavedListItem.list_id == SavedList.id)
+                    .where(
+                        SavedList.user_id.in_(user_ids[start : start + _ROLLUP_BATCH_SIZE]),
+                        SavedList.id.not_in(list_ids),
+                        day_expr.in_(days),
+                    )
+                )
+            ).tuples()
+        )
+
+    collected: Dict[Tuple[date, int, str], List[int]] = {}
+    activity: Dict[Tuple[date, int], List[int]] = {}
+    for _, user_id, created_at, items in saved_lists:
+        day = created_at.date()
+        totals: Dict[Tuple[int, str], int] = {}
+        for department, article_value, quantity in items:
+            key = (department or 0, article_value)
+            totals[key] = totals.get(key, 0) + quantity
+
+        for (department, article_value), quantity in totals.items():
+            row = collected.setdefault((day, department, article_value), [0, 0, 0])
+            row[0] += quantity
+            row[1] += 1
+            if (user_id, day, article_value) not in seen:
+                row[2] += 1
+                seen.add((user_id, day, article_value))
+
+        row = activity.setdefault((day, user_id), [0, 0, 0])
+        row[0] += 1
+        row[1] += len(items)
+        row[2] += sum(totals.values())
+
+    rows = [
+        {
+            "day": day,
+            "department": department,
+            "article": article_value,
+            "quantity": quantity,
+            "orders": orders,
+            "users": users,
+        }
+        for (day, department, article_value), (quantity, orders, users) in collected.items()
+    ]
+    if rows:
+        # executemany: рядки діляться на пачки без компіляції VALUES щоразу
+        stmt = dialect_insert(CollectedDaily)
+        await session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[
+                    CollectedDaily.day,
+                    CollectedDaily.department,
+                    CollectedDaily.article,
+                ],
+                set_={
+                    "quantity": CollectedDaily.quantity + stmt.excluded.quantity,
+                    "orders": CollectedDaily.orders + stmt.excluded.orders,
+                    "users": CollectedDaily.users + stmt.excluded.users,
+                },
+            ),
+            rows,
+        )
+
+    rows = [
+        {
+            "day": day,
+            "user_id": user_id,
+            "lists": lists,
+            "positions": positions,
+            "quantity": quantity,
+        }
+        for (day, user_id), (lists, positions, quantity) in activity.items()
+    ]
+    stmt = dialect_insert(UserDailyActivity)
+    await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[UserDailyActivity.day, UserDailyActivity.user_id],
+            set_={
+                "lists": UserDailyActivity.lists + stmt.excluded.lists,
+                "positions": UserDailyActivity.positions + stmt.excluded.positions,
+                "quantity": UserDailyActivity.quantity + stmt.excluded.quantity,
+            },
+        ),
+        rows,
+    )
+
+
+async def _rebuild_rollups(session: AsyncSession, days: Optional[List[date]] = None) -> None:
+    """
+    Перебудовує щоденні агрегати з saved_lists/saved_list_items
+    (INSERT ... SELECT у БД) у транзакції викликача: усі або лише за days.
+    """
+    article = _article_expr()
+    day = _day_expr()
+    department = func.coalesce(Product.відділ, 0)
+
+    collected = (
+        select(
+            day,
+            department,
+            article,
+            func.sum(SavedListItem.quantity),
+            func.count(SavedListItem.id),
+            func.count(distinct(SavedList.user_id)),
+        )
+        .join(SavedList, SavedListItem.list_id == SavedList.id)
+        .outerjoin(Product, Product.артикул == article)
+        .group_by(day, department, article)
+    )
+    activity = (
+        select(
+            day,
+            SavedList.user_id,
+            func.count(distinct(SavedList.id)),
+            func.count(SavedListItem.id),
+            func.coalesce(func.sum(SavedListItem.quantity), 0),
+        )
+        .outerjoin(SavedListItem, SavedListItem.list_id == SavedList.id)
+        .group_by(day, SavedList.user_id)
+    )
+
+    if days is None:
+        batches = [(collected, activity, delete(CollectedDaily), delete(UserDailyActivity))]
+    else:
+        batches = []
+        for start in range(0, len(days), _ROLLUP_BATCH_SIZE):
+            chunk = days[start : start + _ROLLUP_BATCH_SIZE]
+            batches.append(
+                (
+                    collected.where(day.in_(chunk)),
+                    activity.where(day.in_(chunk)),
+                    delete(CollectedDaily).where(CollectedDaily.day.in_(chunk)),
+                    delete(UserDailyActivity).where(UserDailyActivity.day.in_(chunk)),
                 )
+            )
+
+    for collected_stmt, activity_stmt, delete_collected, delete_activity in batches:
+        await session.execute(delete_collected)
+        await session.execute(delete_activity)
+        await session.execute(
+            insert(CollectedDaily).from_select(
+                ["day", "department", "article", "quantity", "orders", "users"],
+                collected_stmt,
+            )
+        )
+        await session.execute(
+            insert(UserDailyActivity).from_select(
+                ["day", "user_id", "lists", "positions", "quantity"], activity_stmt
+            )
+        )
+
+
+async def orm_rebuild_rollup_days(session: AsyncSession, days: Iterable[date]) -> None:
+    """
+    Перебудовує щоденні агрегати за вказані дні. Викликається в транзакції,
+    що видаляє збережені списки (до commit), тож агрегати і списки
+    не розходяться.
+    """
+    days = sorted(set(days))
+    if days:
+        await _rebuild_rollups(session, days)
 
-            logger.info("Отримано %s зібраних позицій", len(items))
-            return items
 
+async def orm_rebuild_rollups() -> Dict[str, int]:
+    """
+    Перебудовує щоденні агрегати з saved_lists/saved_list_items
+    (INSERT ... SELECT у БД, однією транзакцією).
+
+    Returns:
+        Кількість рядків у collected_daily та user_daily_activity
+    """
+    async with async_session() as session:
+        await _rebuild_rollups(session)
+        await session.commit()
+
+        counts = {
+            "collected_daily": await session.scalar(select(func.count()).select_from(CollectedDaily)),
+            "user_daily_activity": await session.scalar(
+                select(func.count()).select_from(UserDailyActivity)
+            ),
+        }
+
+    logger.info("Щоденні агрегати перебудовано: %s", counts)
+    return counts
+
+
+async def orm_ensure_rollups() -> None:
+    """
+    Заповнює щоденні агрегати при старті, якщо вони порожні, а збережені
+    списки вже є (перший запуск після міграції 0004).
+    """
+    try:
+        async with async_session() as session:
+            has_rollups = await session.scalar(select(UserDailyActivity.day).limit(1))
+            has_lists = await session.scalar(select(SavedList.id).limit(1))
+        if has_rollups is None and has_lists is not None:
+            await orm_rebuild_rollups()
     except Exception as e:
-        logger.error("Помилка отримання зібраних товарів: %s", e, exc_info=True)
-        return []
+        logger.error("Не вдалося заповнити щоденні агрегати: %s", e, exc_info=True)
 
 
 # ==============================================================================
@@ -74,29 +516,43 @@ def orm_get_all_collected_items_sync() -> List[dict]:
 # ==============================================================================
 
 
-def orm_get_top_products(limit: int = 10) -> List[dict]:
+def orm_get_top_products(
+    limit: int = 10,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> List[dict]:
     """
-    Повертає топ товарів за частотою замовлень.
+    Повертає топ товарів за частотою замовлень (з collected_daily;
+    період — з точністю до дня).
     """
+    order_count = func.sum(CollectedDaily.orders)
+    stmt = _in_days(
+        select(
+            CollectedDaily.article,
+            func.max(Product.назва).label("name"),
+            func.sum(CollectedDaily.quantity).label("total_quantity"),
+            order_count.label("order_count"),
+        )
+        .outerjoin(Product, Product.артикул == CollectedDaily.article)
+        .group_by(CollectedDaily.article)
+        .order_by(order_count.desc())
+        .limit(limit),
+        CollectedDaily.day,
+        date_from,
+        date_to,
+    )
+
     try:
         with sync_session() as session:
-            # Рахуємо кількість замовлень кожного товару
-            result = session.execute(
-                select(
-                    SavedListItem.article_name,
-                    func.sum(SavedListItem.quantity).label("total_quantity"),
-                    func.count(SavedListItem.id).label("order_count"),
-                )
-                .group_by(SavedListItem.article_name)
-                .order_by(func.count(SavedListItem.id).desc())
-                .limit(limit)
-            )
+            result = session.execute(stmt)
 
             top_products = []
             for row in result:
                 top_products.append(
                     {
-                        "article_name": row.article_name,
+                        "article_name": (
+                            f"{row.article} - {row.name}" if row.name else row.article
+                        ),
                         "total_quantity": int(row.total_quantity),
                         "order_count": int(row.order_count),
                     }
@@ -152,23 +608,25 @@ def orm_get_department_stats() -> List[dict]:
 
 def orm_get_user_activity_stats(days: int = 30) -> List[dict]:
     """
-    Статистика активності користувачів за вказаний період.
+    Статистика активності користувачів за вказаний період
+    (з user_daily_activity, з точністю до дня).
     """
     try:
         with sync_session() as session:
             cutoff_date = datetime.now() - timedelta(days=days)
 
+            list_count = func.sum(UserDailyActivity.lists)
             result = session.execute(
                 select(
-                    SavedList.user_id,
+                    UserDailyActivity.user_id,
                     User.username,
                     User.first_name,
-                    func.count(SavedList.id).label("list_count"),
+                    list_count.label("list_count"),
                 )
-                .join(User, SavedList.user_id == User.id)
-                .where(SavedList.created_at >= cutoff_date)
-                .group_by(SavedList.user_id, User.username, User.first_name)
-                .order_by(func.count(SavedList.id).desc())
+                .join(User, UserDailyActivity.user_id == User.id)
+                .where(UserDailyActivity.day >= cutoff_date.date())
+                .group_by(UserDailyActivity.user_id, User.username, User.first_name)
+                .order_by(list_count.desc())
             )
 
             stats = []
@@ -256,8 +714,10 @@ def orm_get_general_stats() -> dict:
             # Кількість користувачів
             users_count = session.execute(select(func.count(User.id))).scalar_one()
 
-            # Кількість збережених списків
-            lists_count = session.execute(select(func.count(SavedList.id))).scalar_one()
+            # Кількість збережених списків (з щоденних агрегатів)
+            lists_count = session.execute(
+                select(func.coalesce(func.sum(UserDailyActivity.lists), 0))
+            ).scalar_one()
 
             # Поточні тимчасові списки
             temp_items = session.execute(select(func.count(TempList.id))).scalar_one()
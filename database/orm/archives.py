@@ -8,6 +8,8 @@ from sqlalchemy import delete, select
 
 from database.engine import async_session
 from database.models import SavedList, SavedListItem
+from database.orm.analytics import orm_rebuild_rollup_days
+from utils.archive_zip import UserZip, drop_user_zip, get_user_zip
 
 logger = logging.getLogger(__name__)
 
@@ -79,6 +81,7 @@ async def orm_delete_user_archives(user_id: int) -> bool:
     """
     Видаляє всі архіви користувача та файли.
     ВАЖЛИВО: Спочатку видаляє items, потім lists (FOREIGN KEY).
+    Щоденні агрегати за дні цих списків перебудовуються.
     """
     try:
         async with async_session() as session:
@@ -110,8 +113,14 @@ async def orm_delete_user_archives(user_id: int) -> bool:
             # Тепер видаляємо lists
             await session.execute(delete(SavedList).where(SavedList.user_id == user_id))
 
+            # Щоденні агрегати за дні видалених списків — у тій же транзакції
+            await orm_rebuild_rollup_days(
+                session, (saved_list.created_at.date() for saved_list in saved_lists)
+            )
+
             await session.commit()
 
+            drop_user_zip(user_id)
             logger.info("Видалено архіви користувача %s", user_id)
             return True
 
@@ -124,7 +133,8 @@ async def orm_delete_user_archives(user_id: int) -> bool:
 
 async def orm_delete_archive_by_id(archive_id: int) -> bool:
     """
-    Видаляє конкретний архів за ID (включно з items та файлом).
+    Видаляє конкретний архів за ID (включно з items та файлом)
+    і перебудовує щоденні агрегати за день списку.
     """
     try:
         async with async_session() as session:
@@ -156,8 +166,12 @@ async def orm_delete_archive_by_id(archive_id: int) -> bool:
             # Видаляємо сам список
             await session.execute(delete(SavedList).where(SavedList.id == archive_id))
 
+            # Щоденні агрегати за день списку — у тій же транзакції
+            await orm_rebuild_rollup_days(session, [archive.created_at.date()])
+
             await session.commit()
 
+            drop_user_zip(archive.user_id)
             logger.info("Видалено архів ID %s", archive_id)
             return True
 
@@ -171,16 +185,13 @@ async def orm_delete_archive_by_id(archive_id: int) -> bool:
 # ==============================================================================
 
 
-async def orm_pack_user_files_to_zip(user_id: int) -> Optional[str]:
+async def orm_pack_user_files_to_zip(user_id: int) -> Optional[UserZip]:
     """
-    Пакує всі файли користувача в ZIP архів.
-    Повертає шлях до створеного ZIP файлу або None.
+    Пакує всі файли користувача в ZIP архів (у пулі рендерингу).
+    Поки набір архівів не змінився, повертає вже зібраний ZIP — файл
+    кешований, видаляти його після надсилання не треба.
+    Повертає UserZip або None.
     """
-    import zipfile
-    from datetime import datetime
-
-    from config import ARCHIVES_PATH
-
     try:
         archives = await orm_get_user_lists_archive(user_id)
 
@@ -188,21 +199,7 @@ async def orm_pack_user_files_to_zip(user_id: int) -> Optional[str]:
             logger.warning("Немає архівів для user_id %s", user_id)
             return None
 
-        # Створюємо ZIP
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        zip_filename = f"archives_{user_id}_{timestamp}.zip"
-        zip_path = os.path.join(ARCHIVES_PATH, zip_filename)
-
-        os.makedirs(ARCHIVES_PATH, exist_ok=True)
-
-        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zipf:
-            for archive in archives:
-                if archive.file_path and os.path.exists(archive.file_path):
-                    # Додаємо файл в ZIP з оригінальною назвою
-                    zipf.write(archive.file_path, arcname=archive.file_name)
-
-        logger.info("Створено ZIP архів для user_id %s: %s", user_id, zip_filename)
-        return zip_path
+        return await get_user_zip(user_id, archives)
 
     except Exception as e:
         logger.error(
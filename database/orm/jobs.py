@@ -0,0 +1,215 @@
+# epicservice/database/orm/jobs.py
+
+"""
+Черга фонових завдань (таблиця jobs).
+
+Завдання забирає воркер умовним UPDATE ... WHERE status = 'queued', тож
+навіть кілька процесів бота не виконають одне завдання двічі. Усі часові
+мітки ставляться з datetime.now() процесу (не func.now() БД), щоб
+порівняння run_after/updated_at були в одному часовому поясі.
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, update
+
+from config import JOB_MAX_ATTEMPTS, JOB_RETRY_DELAY
+from database.engine import async_session
+from database.models import Job
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# Помилка завдання, перерваного зупинкою бота, коли спроб більше немає
+JOB_INTERRUPTED_ERROR = "Завдання перервано зупинкою бота"
+
+
+# ==============================================================================
+# ➕ ПОСТАНОВКА В ЧЕРГУ
+# ==============================================================================
+
+
+async def orm_enqueue_job(
+    kind: str,
+    payload: Dict[str, Any],
+    chat_id: int,
+    message_id: Optional[int] = None,
+    max_attempts: int = JOB_MAX_ATTEMPTS,
+) -> int:
+    """Ставить завдання в чергу. Повертає id завдання."""
+    now = datetime.now()
+    async with async_session() as session:
+        job = Job(
+            kind=kind,
+            status=JOB_QUEUED,
+            payload=json.dumps(payload, ensure_ascii=False),
+            chat_id=chat_id,
+            message_id=message_id,
+            progress=0,
+            attempts=0,
+            max_attempts=max_attempts,
+            run_after=now,
+            created_at=now,
+            updated_at=now,
+        )
+        session.add(job)
+        await session.commit()
+        logger.info("Завдання #%s (%s) поставлено в чергу", job.id, kind)
+        return job.id
+
+
+async def orm_set_job_message(job_id: int, message_id: int) -> None:
+    """Запам'ятовує повідомлення, в якому показується прогрес завдання."""
+    async with async_session() as session:
+        await session.execute(update(Job).where(Job.id == job_id).values(message_id=message_id))
+        await session.commit()
+
+
+# ==============================================================================
+# ⚙️ ВИКОНАННЯ
+# ==============================================================================
+
+
+async def orm_claim_job() -> Optional[Job]:
+    """
+    Забирає найстаріше готове до виконання завдання (status -> running,
+    attempts + 1). None — якщо черга порожня.
+    """
+    now = datetime.now()
+    async with async_session() as session:
+        candidates = await session.scalars(
+            select(Job.id)
+            .where(Job.status == JOB_QUEUED, Job.run_after <= now)
+            .order_by(Job.run_after, Job.id)
+            .limit(5)
+        )
+        for job_id in candidates.all():
+            claimed = await session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == JOB_QUEUED)
+                .values(status=JOB_RUNNING, attempts=Job.attempts + 1, updated_at=now)
+            )
+            if claimed.rowcount:
+                await session.commit()
+                return await session.get(Job, job_id, populate_existing=True)
+        return None
+
+
+async def orm_update_job_progress(job_id: int, progress: int) -> None:
+    """Записує прогрес (і заодно позначає, що завдання живе)."""
+    async with async_session() as session:
+        await session.execute(
+            update(Job)
+            .where(Job.id == job_id)
+            .values(progress=progress, updated_at=datetime.now())
+        )
+        await session.commit()
+
+
+async def orm_finish_job(
+    job_id: int, result: Optional[str], result_path: Optional[str] = None
+) -> None:
+    now = datetime.now()
+    async with async_session() as session:
+        await session.execute(
+            update(Job)
+            .where(Job.id == job_id)
+            .values(
+                status=JOB_DONE,
+                progress=100,
+                result=result,
+                result_path=result_path,
+                error=None,
+                updated_at=now,
+                finished_at=now,
+            )
+        )
+        await session.commit()
+
+
+async def orm_fail_job(job_id: int, error: str, retry: bool = True) -> bool:
+    """
+    Фіксує помилку. Якщо спроби ще лишились (і retry), повертає завдання
+    в чергу з затримкою JOB_RETRY_DELAY × номер спроби.
+    Повертає True, якщо завдання буде повторено.
+    """
+    now = datetime.now()
+    async with async_session() as session:
+        job = await session.get(Job, job_id)
+        if job is None:
+            return False
+
+        job.error = error
+        job.updated_at = now
+        will_retry = retry and job.attempts < job.max_attempts
+        if will_retry:
+            job.status = JOB_QUEUED
+            job.run_after = now + timedelta(seconds=JOB_RETRY_DELAY * job.attempts)
+        else:
+            job.status = JOB_FAILED
+            job.finished_at = now
+        await session.commit()
+        return will_retry
+
+
+async def orm_requeue_stale_jobs(stale_after: int) -> List[Job]:
+    """
+    Обробляє завдання "running", які не оновлювались stale_after секунд
+    (процес бота впав або перезапустився посеред виконання): якщо спроби ще
+    лишились — повертає в чергу, інакше позначає failed (перерване завдання
+    з max_attempts=1, як віднімання зібраного, повторно не виконується).
+    Повертає завдання, які стали failed (щоб прибрати їхні файли).
+    """
+    now = datetime.now()
+    async with async_session() as session:
+        stale = (
+            Job.status == JOB_RUNNING,
+            Job.updated_at < now - timedelta(seconds=stale_after),
+        )
+        requeued = await session.execute(
+            update(Job)
+            .where(*stale, Job.attempts < Job.max_attempts)
+            .values(status=JOB_QUEUED, run_after=now, updated_at=now)
+        )
+        failed = list(
+            (
+                await session.scalars(
+                    update(Job)
+                    .where(*stale, Job.attempts >= Job.max_attempts)
+                    .values(
+                        status=JOB_FAILED,
+                        error=JOB_INTERRUPTED_ERROR,
+                        updated_at=now,
+                        finished_at=now,
+                    )
+                    .returning(Job)
+                )
+            ).all()
+        )
+        await session.commit()
+    if requeued.rowcount:
+        logger.warning("Повернуто в чергу завислих завдань: %s", requeued.rowcount)
+    if failed:
+        logger.warning(
+            "Перервані завдання без спроб, позначено failed: %s", [job.id for job in failed]
+        )
+    return failed
+
+
+# ==============================================================================
+# 📋 ПЕРЕГЛЯД
+# ==============================================================================
+
+
+async def orm_get_recent_jobs(limit: int = 10) -> List[Job]:
+    """Останні завдання (для адміна)."""
+    async with async_session() as session:
+        result = await session.scalars(select(Job).order_by(Job.id.desc()).limit(limit))
+        return list(result.all())
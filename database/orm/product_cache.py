@@ -0,0 +1,148 @@
+# epicservice/database/orm/product_cache.py
+
+"""
+Процесні кеші даних товарів (cachetools.TTLCache: LRU-витіснення + TTL).
+
+- card_views — товарна частина картки (назва, артикул, ціна, залишок,
+  відкладено, резерв у тимчасових списках) з коротким TTL. Кнопки ➕/➖
+  несуть product_id і обрану кількість у callback data, тому з цим кешем
+  повторні натискання перемальовують картку без запитів до БД.
+
+Кожен, хто змінює залишок, відкладено або тимчасові списки, викликає
+invalidate_products (або invalidate_all для масових змін); TTL лише
+страхує від змін, зроблених поза цим процесом.
+"""
+
+import logging
+from typing import Any, Dict, Hashable, Iterable, List, Optional
+
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+CARD_VIEW_TTL = 15  # секунд
+CARD_VIEW_MAXSIZE = 5000
+
+
+class CountingTTLCache(TTLCache):
+    """TTLCache з лічильниками влучань, промахів, витіснень і прострочень."""
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def lookup(self, key: Hashable) -> Optional[Any]:
+        """get() з підрахунком влучань і промахів."""
+        value = self.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def popitem(self):
+        # Викликається TTLCache лише при витісненні LRU через maxsize
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+    def clear(self) -> None:
+        # MutableMapping.clear іде через popitem — це не витіснення
+        evictions = self.evictions
+        super().clear()
+        self.evictions = evictions
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        self.expirations += len(expired)
+        return expired
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.hits + self.misses
+        return {
+            "cache": self.name,
+            "size": self.currsize,
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / requests, 3) if requests else 0.0,
+        }
+
+
+card_views = CountingTTLCache("card_views", CARD_VIEW_MAXSIZE, CARD_VIEW_TTL)
+
+
+# ==============================================================================
+# 🃏 КАРТКИ
+# ==============================================================================
+
+
+def get_card_view(product_id: int) -> Optional[Any]:
+    """Кешований ProductCardView (без полів користувача) або None."""
+    return card_views.lookup(product_id)
+
+
+def put_card_view(product_id: int, view: Any) -> None:
+    card_views[product_id] = view
+
+
+# ==============================================================================
+# 🗂 ВЕРСІЯ КАТАЛОГУ
+# ==============================================================================
+
+# Лічильники змін колонок товарів у цьому процесі (ключ знімків звіту по
+# залишках). Зміни з інших процесів ловить відбиток БД у знімках звіту.
+_catalog_changes = 0
+_catalog_imports = 0
+
+
+def catalog_changed(imported: bool = False) -> None:
+    """
+    Позначає зміну каталогу: залишок, відкладено, активність товарів.
+    imported=True — завершився імпорт залишків.
+    """
+    global _catalog_changes, _catalog_imports
+    _catalog_changes += 1
+    if imported:
+        _catalog_imports += 1
+
+
+def catalog_version() -> int:
+    """Номер поточної версії каталогу в цьому процесі."""
+    return _catalog_changes
+
+
+def catalog_imports() -> int:
+    """Кількість завершених імпортів залишків у цьому процесі."""
+    return _catalog_imports
+
+
+# ==============================================================================
+# 🧹 ІНВАЛІДАЦІЯ ТА СТАТИСТИКА
+# ==============================================================================
+
+
+def invalidate_products(product_ids: Iterable[int]) -> None:
+    """
+    Скидає кеш для товарів, у яких змінився залишок або резерви.
+    """
+    for product_id in product_ids:
+        card_views.pop(product_id, None)
+
+
+def invalidate_all() -> None:
+    """Скидає кеші повністю (імпорт залишків, масові зміни)."""
+    card_views.clear()
+    logger.debug("Кеші товарів очищено")
+
+
+def cache_stats() -> List[Dict[str, Any]]:
+    """Лічильники всіх кешів товарів (для адмін-статистики)."""
+    return [cache.stats() for cache in (card_views,)]
@@ -1,12 +1,16 @@
 # epicservice/database/orm/products.py
 
 import logging
-from typing import List, Optional
+from typing import List, Optional, Sequence, Union
 
-from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy import func, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from database.engine import is_postgres
 from database.models import Product
+from database.orm.product_cache import catalog_changed, invalidate_products
+from database.orm.products_fts import orm_search_products_fts, products_fts_ready
+from database.orm.search_index import SearchHit, product_search_index
 
 logger = logging.getLogger(__name__)
 
@@ -64,30 +68,98 @@ async def orm_get_all_products(
 # ==============================================================================
 
 
-async def orm_search_products_fuzzy(
-    session: AsyncSession, query: str, limit: int = 10
+def _text_filter(query: str, typo_tolerant: bool = False):
+    """
+    Умова пошуку за назвою або артикулом.
+    PostgreSQL: ILIKE або оператор схожості % (обидва йдуть по GIN pg_trgm),
+    SQLite: ILIKE.
+    """
+    query = query.strip()
+    if typo_tolerant:
+        return or_(Product.назва.op("%")(query), Product.артикул.op("%")(query))
+    search_pattern = f"%{query}%"
+    return or_(
+        Product.назва.ilike(search_pattern),
+        Product.артикул.ilike(search_pattern),
+    )
+
+
+def _similarity(query: str):
+    """Оцінка схожості pg_trgm для сортування (тільки PostgreSQL)."""
+    query = query.strip()
+    return func.greatest(
+        func.similarity(Product.назва, query), func.similarity(Product.артикул, query)
+    )
+
+
+async def _search_products_db(
+    session: AsyncSession,
+    query: str,
+    limit: int,
+    department: Optional[int] = None,
+    typo_tolerant: bool = False,
 ) -> List[Product]:
     """
-    Нечіткий пошук товарів за назвою або артикулом.
-    Повертає тільки активні товари.
+    Пошук у БД.
+    PostgreSQL: результати впорядковані за similarity(), а при typo_tolerant
+    і порожньому результаті ILIKE повторюється через %.
+    SQLite: FTS5 (префікси слів, bm25), якщо нічого — ILIKE (підрядок
+    всередині слова, наприклад середина артикулу).
     """
-    try:
-        search_pattern = f"%{query.strip()}%"
+    stmt = select(Product).where(Product.активний == True)
+    if department is not None:
+        stmt = stmt.where(Product.відділ == department)
+
+    if not query:
+        result = await session.execute(stmt.limit(limit))
+        return list(result.scalars().all())
 
+    if not is_postgres():
+        if products_fts_ready():
+            products = await orm_search_products_fts(session, query, limit, department)
+            if products:
+                return products
+        result = await session.execute(stmt.where(_text_filter(query)).limit(limit))
+        return list(result.scalars().all())
+
+    order = (_similarity(query).desc(), Product.id)
+    result = await session.execute(
+        stmt.where(_text_filter(query)).order_by(*order).limit(limit)
+    )
+    products = list(result.scalars().all())
+    if not products and typo_tolerant:
         result = await session.execute(
-            select(Product)
-            .where(
-                and_(
-                    Product.активний == True,
-                    or_(
-                        Product.назва.ilike(search_pattern),
-                        Product.артикул.ilike(search_pattern),
-                    ),
-                )
-            )
+            stmt.where(_text_filter(query, typo_tolerant=True))
+            .order_by(*order)
             .limit(limit)
         )
-        return list(result.scalars().all())
+        products = list(result.scalars().all())
+    return products
+
+
+async def orm_search_products_fuzzy(
+    session: AsyncSession, query: str, limit: int = 10, typo_tolerant: bool = True
+) -> Sequence[Union[Product, SearchHit]]:
+    """
+    Нечіткий пошук товарів за назвою або артикулом.
+    Повертає тільки активні товари.
+
+    Якщо пошуковий індекс побудований — відповідає з пам'яті знімками
+    SearchHit (id, артикул, назва, відділ), інакше шукає в БД
+    (PostgreSQL — індекси pg_trgm і similarity(), SQLite — FTS5, потім ILIKE).
+    Коли за підрядком нічого не знайдено і typo_tolerant=True,
+    виконує пошук, стійкий до одруківок (індекс або pg_trgm).
+    """
+    hits = product_search_index.search(query, limit=limit)
+    if hits is not None:
+        if not hits and typo_tolerant:
+            hits = product_search_index.search_fuzzy(query, limit=limit)
+        return hits
+
+    try:
+        return await _search_products_db(
+            session, query, limit, typo_tolerant=typo_tolerant
+        )
     except Exception as e:
         logger.error(
             "Помилка пошуку товарів за запитом '%s': %s", query, e, exc_info=True
@@ -97,24 +169,19 @@ async def orm_search_products_fuzzy(
 
 async def orm_search_products_by_department(
     session: AsyncSession, department: int, query: str = "", limit: int = 50
-) -> List[Product]:
-    """Пошук товарів за відділом з опціональним фільтром."""
-    try:
-        base_query = select(Product).where(
-            and_(Product.активний == True, Product.відділ == department)
-        )
-
-        if query:
-            search_pattern = f"%{query.strip()}%"
-            base_query = base_query.where(
-                or_(
-                    Product.назва.ilike(search_pattern),
-                    Product.артикул.ilike(search_pattern),
-                )
-            )
+) -> Sequence[Union[Product, SearchHit]]:
+    """
+    Пошук товарів за відділом з опціональним фільтром.
+    З фільтром використовує пошуковий індекс (якщо побудований),
+    інакше БД як orm_search_products_fuzzy.
+    """
+    if query:
+        hits = product_search_index.search(query, limit=limit, department=department)
+        if hits is not None:
+            return hits
 
-        result = await session.execute(base_query.limit(limit))
-        return list(result.scalars().all())
+    try:
+        return await _search_products_db(session, query, limit, department=department)
     except Exception as e:
         logger.error(
             "Помилка пошуку товарів за відділом %s: %s", department, e, exc_info=True
@@ -141,6 +208,8 @@ async def orm_update_product_quantity(
             .values(кількість=new_quantity)
         )
         await session.commit()
+        invalidate_products((product_id,))
+        catalog_changed()
         logger.info("Оновлено кількість товару ID %s: %s", product_id, new_quantity)
         return True
     except Exception as e:
@@ -162,6 +231,8 @@ async def orm_update_product_reserved(
             .values(відкладено=new_reserved)
         )
         await session.commit()
+        invalidate_products((product_id,))
+        catalog_changed()
         logger.info(
             "Оновлено відкладено для товару ID %s: %s", product_id, new_reserved
         )
@@ -184,6 +255,9 @@ async def orm_deactivate_product(session: AsyncSession, product_id: int) -> bool
             update(Product).where(Product.id == product_id).values(активний=False)
         )
         await session.commit()
+        invalidate_products((product_id,))
+        catalog_changed()
+        product_search_index.remove(product_id)
         logger.info("Деактивовано товар ID %s", product_id)
         return True
     except Exception as e:
@@ -0,0 +1,137 @@
+# epicservice/database/orm/products_fts.py
+
+"""
+Повнотекстовий пошук товарів для SQLite (FTS5).
+
+Віртуальна таблиця products_fts дзеркалить products(артикул, назва, група)
+як external content (content='products', rowid = products.id), тож сам
+текст не дублюється. Артикул, назву і групу змінює лише імпорт залишків,
+тому таблиця перебудовується після імпорту ('rebuild'), без тригерів
+на кожен UPDATE кількості.
+
+Створюється ліниво при старті бота, якщо її ще немає. Якщо SQLite зібрано
+без FTS5, пошук залишається на ILIKE.
+"""
+
+import logging
+import re
+from typing import List, Optional
+
+from sqlalchemy import column, select, table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.engine import async_session, is_postgres
+from database.models import Product
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "products_fts"
+
+_TOKEN_RE = re.compile(r"\w+")
+_fts = table(FTS_TABLE, column("rowid"))
+
+# None — ще не перевіряли, False — FTS5 недоступний або не SQLite
+_fts_ready: Optional[bool] = None
+
+
+def products_fts_ready() -> bool:
+    """Чи можна шукати через FTS5 (таблиця створена і заповнена)."""
+    return bool(_fts_ready)
+
+
+def build_match_query(query: str) -> str:
+    """
+    Перетворює запит користувача на вираз MATCH: кожне слово — префіксний
+    пошук у лапках ("фарб"* "біл"*), слова поєднуються через AND.
+    """
+    return " ".join(f'"{token}"*' for token in _TOKEN_RE.findall(query.lower()))
+
+
+# ==============================================================================
+# 🏗 СТВОРЕННЯ ТА ПЕРЕБУДОВА
+# ==============================================================================
+
+
+async def orm_ensure_products_fts() -> bool:
+    """
+    Створює products_fts, якщо її немає (тільки SQLite), і заповнює її.
+    Повертає True, якщо FTS5 готовий до пошуку.
+    """
+    global _fts_ready
+
+    if is_postgres():
+        _fts_ready = False
+        return False
+
+    try:
+        async with async_session() as session:
+            exists = await session.scalar(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": FTS_TABLE},
+            )
+            if not exists:
+                await session.execute(
+                    text(
+                        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                        "артикул, назва, група, "
+                        "content='products', content_rowid='id', "
+                        "tokenize='unicode61 remove_diacritics 2')"
+                    )
+                )
+                await session.execute(
+                    text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+                )
+                await session.commit()
+                logger.info("Створено таблицю повнотекстового пошуку %s", FTS_TABLE)
+        _fts_ready = True
+    except Exception as e:
+        _fts_ready = False
+        logger.warning(
+            "FTS5 недоступний, пошук працюватиме через ILIKE: %s", e, exc_info=True
+        )
+    return _fts_ready
+
+
+async def orm_rebuild_products_fts() -> None:
+    """Перебудовує products_fts з таблиці products (після імпорту)."""
+    if not _fts_ready:
+        return
+    async with async_session() as session:
+        await session.execute(
+            text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        )
+        await session.commit()
+    logger.info("Таблицю %s перебудовано", FTS_TABLE)
+
+
+# ==============================================================================
+# 🔍 ПОШУК
+# ==============================================================================
+
+
+async def orm_search_products_fts(
+    session: AsyncSession,
+    query: str,
+    limit: int = 10,
+    department: Optional[int] = None,
+) -> List[Product]:
+    """
+    Пошук активних товарів через FTS5 MATCH з префіксами слів,
+    впорядкований за bm25 (артикул важить більше за назву, назва — за групу).
+    """
+    match = build_match_query(query)
+    if not match:
+        return []
+
+    stmt = (
+        select(Product)
+        .join(_fts, _fts.c.rowid == Product.id)
+        .where(text(f"{FTS_TABLE} MATCH :match"), Product.активний == True)
+        .order_by(text(f"bm25({FTS_TABLE}, 10.0, 5.0, 1.0)"), Product.id)
+        .limit(limit)
+    )
+    if department is not None:
+        stmt = stmt.where(Product.відділ == department)
+
+    result = await session.execute(stmt, {"match": match})
+    return list(result.scalars().all())
@@ -0,0 +1,449 @@
+# epicservice/database/orm/search_index.py
+
+"""
+Процесний пошуковий індекс активних товарів (артикул + назва).
+
+Будується при старті бота і оновлюється точково після імпорту та
+деактивації товарів. Пошук відповідає без звернення до БД.
+
+Структура:
+- документи у слотах: нормалізовані артикул, назва, слова, триграми;
+- інвертований індекс триграм: триграма -> відсортований список слотів.
+
+Списки триграм лише доповнюються; видалені та змінені документи
+лишають порожні слоти, які пошук пропускає.
+Коли застарілих записів стає забагато, індекс перебудовується з пам'яті.
+
+Два режими пошуку:
+- search — підрядки (як ILIKE) з ранжуванням;
+- search_fuzzy — стійкий до одруківок: кандидати за кількістю спільних
+  триграм, оцінка найкращих кількох сотень через thefuzz.
+"""
+
+import asyncio
+import logging
+import re
+from bisect import bisect_left
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from thefuzz import fuzz
+
+from database.engine import async_session
+from database.models import Product
+
+logger = logging.getLogger(__name__)
+
+# Після скількох змінених артикулів дешевше перебудувати індекс повністю
+FULL_REBUILD_THRESHOLD = 5000
+# Частка застарілих записів у списках триграм, після якої індекс ущільнюється
+COMPACT_RATIO = 0.25
+# Скільки точково доданих товарів тримати поза основним порядком
+MAX_DELTA_DOCS = 2000
+# Розмір пачки для IN (...) при точковому оновленні
+REFRESH_BATCH_SIZE = 1000
+# Скільки кандидатів з найбільшою кількістю спільних триграм оцінювати thefuzz
+FUZZY_CANDIDATES = 300
+# Мінімальна оцінка thefuzz (0-100) для результату нечіткого пошуку
+FUZZY_MIN_SCORE = 75
+
+_TOKEN_RE = re.compile(r"\w+")
+_APOSTROPHES = str.maketrans({"’": "'", "ʼ": "'", "`": "'", "ё": "е"})
+
+
+class SearchHit(NamedTuple):
+    """Знімок товару в результатах пошуку (поля, потрібні клавіатурі пошуку)."""
+
+    id: int
+    артикул: str
+    назва: str
+    відділ: int
+
+
+# ==============================================================================
+# 🛠 НОРМАЛІЗАЦІЯ
+# ==============================================================================
+
+
+def normalize(text: str) -> str:
+    """Нижній регістр (з кирилицею), уніфіковані апострофи, стиснуті пробіли."""
+    return " ".join(str(text or "").casefold().translate(_APOSTROPHES).split())
+
+
+def _trigrams(text: str) -> Set[str]:
+    """Триграми тексту з пробілами по краях (щоб 2-символьні підрядки теж мали триграму)."""
+    padded = f" {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def _query_trigrams(term: str) -> List[str]:
+    return [term[i : i + 3] for i in range(len(term) - 2)]
+
+
+# ==============================================================================
+# 📚 СТАН ІНДЕКСУ
+# ==============================================================================
+
+
+class _Doc:
+    __slots__ = ("hit", "article", "name", "words", "grams")
+
+    def __init__(self, hit: SearchHit):
+        self.hit = hit
+        self.article = normalize(hit.артикул)
+        self.name = normalize(hit.назва)
+        # " артикул слово1 слово2" — перевірка "слово запиту є початком слова"
+        # зводиться до пошуку підрядка " " + term
+        self.words = " " + " ".join(_TOKEN_RE.findall(f"{self.article} {self.name}"))
+        self.grams = _trigrams(self.article) | _trigrams(self.name)
+
+    def contains(self, term: str) -> bool:
+        return term in self.article or term in self.name
+
+    def sort_key(self) -> Tuple[int, int]:
+        return len(self.name), self.hit.id
+
+
+class _State:
+    """
+    Кожна версія документа отримує новий слот (зростаючий номер), тому
+    списки триграм завжди відсортовані за слотом. При побудові слоти
+    роздаються в порядку (довжина назви, id) — обхід основної частини
+    (слоти < base_size) йде в порядку ранжування серед рівних за релевантністю.
+    Товари, додані точково, отримують слоти після base_size і перевіряються
+    пошуком завжди, до наступного ущільнення.
+    """
+
+    def __init__(self):
+        self.slots: List[Optional[_Doc]] = []
+        self.slot_of: Dict[int, int] = {}
+        self.by_article: Dict[str, int] = {}
+        self.postings: Dict[str, List[int]] = {}
+        self.postings_total = 0
+        self.stale = 0
+        self.base_size = 0
+        # Відсортовані назви й артикули основної частини (для has_prefix)
+        self.base_prefixes: List[str] = []
+        # Кеш списків триграм у вигляді numpy-масивів: триграма -> (довжина, масив)
+        self._arrays: Dict[str, Tuple[int, np.ndarray]] = {}
+
+    @classmethod
+    def build(cls, hits: Iterable[SearchHit]) -> "_State":
+        state = cls()
+        for doc in sorted(map(_Doc, hits), key=_Doc.sort_key):
+            state._add(doc)
+        state.base_size = len(state.slots)
+        state.base_prefixes = sorted(
+            text for doc in state.slots for text in (doc.name, doc.article)
+        )
+        return state
+
+    def _add(self, doc: _Doc) -> None:
+        slot = len(self.slots)
+        self.slots.append(doc)
+        self.slot_of[doc.hit.id] = slot
+        self.by_article[doc.article] = slot
+        for gram in doc.grams:
+            self.postings.setdefault(gram, []).append(slot)
+        self.postings_total += len(doc.grams)
+
+    def upsert(self, hit: SearchHit) -> None:
+        self.remove(hit.id)
+        self._add(_Doc(hit))
+
+    def remove(self, product_id: int) -> None:
+        slot = self.slot_of.pop(product_id, None)
+        if slot is None:
+            return
+        doc = self.slots[slot]
+        self.slots[slot] = None
+        if self.by_article.get(doc.article) == slot:
+            del self.by_article[doc.article]
+        self.stale += len(doc.grams)
+
+    def docs(self) -> List[_Doc]:
+        return [doc for doc in self.slots if doc is not None]
+
+    def needs_compaction(self) -> bool:
+        return (
+            self.stale > self.postings_total * COMPACT_RATIO
+            or len(self.slots) - self.base_size > MAX_DELTA_DOCS
+        )
+
+    def candidates(self, terms: List[str]) -> List[int]:
+        """
+        Відсортовані слоти, що можуть містити всі terms (включно із застарілими).
+        Для кожного слова береться найкоротший список його триграм,
+        списки різних слів перетинаються.
+        """
+        long_terms = [t for t in terms if len(t) >= 3]
+        if not long_terms:
+            # Лише 1-2 символи: об'єднання списків триграм, що містять слово
+            term = max(terms, key=len)
+            slots: Set[int] = set()
+            for gram, posting in self.postings.items():
+                if term in gram:
+                    slots.update(posting)
+            return sorted(slots)
+
+        lists = []
+        for term in long_terms:
+            posting = [self.postings.get(gram) for gram in _query_trigrams(term)]
+            if not all(posting):
+                return []
+            lists.append(min(posting, key=len))
+
+        lists.sort(key=len)
+        if len(lists) == 1:
+            return lists[0]
+        common = set(lists[0]).intersection(*lists[1:])
+        return sorted(common)
+
+    def gram_counts(self, grams: Iterable[str]) -> np.ndarray:
+        """Кількість спільних з grams триграм для кожного слоту."""
+        arrays = []
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if not posting:
+                continue
+            cached = self._arrays.get(gram)
+            if cached is None or cached[0] != len(posting):
+                cached = (len(posting), np.array(posting, dtype=np.int32))
+                self._arrays[gram] = cached
+            arrays.append(cached[1])
+
+        if not arrays:
+            return np.zeros(0, dtype=np.intp)
+        return np.bincount(np.concatenate(arrays), minlength=len(self.slots))
+
+    def has_prefix(self, phrase: str) -> bool:
+        """Чи може артикул або назва в основній частині починатися з phrase."""
+        pos = bisect_left(self.base_prefixes, phrase)
+        return pos < len(self.base_prefixes) and self.base_prefixes[pos].startswith(
+            phrase
+        )
+
+
+# ==============================================================================
+# 🔍 ІНДЕКС
+# ==============================================================================
+
+
+class ProductSearchIndex:
+    """
+    Пошук по активних товарах без БД.
+
+    Семантика збігу як у ILIKE '%q%': кожне слово запиту має бути підрядком
+    артикулу або назви (регістр не враховується, включно з кирилицею).
+
+    Ранжування:
+    1. Точний збіг артикулу.
+    2. Артикул або назва починаються з запиту.
+    3. Більше слів запиту збігаються з початком слів артикулу чи назви.
+    4. Коротша назва, потім менший id.
+    """
+
+    def __init__(self):
+        self._state = _State()
+        self._lock = asyncio.Lock()
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._state.slot_of)
+
+    # --- Пошук ---
+
+    def search(
+        self, query: str, limit: int = 10, department: Optional[int] = None
+    ) -> Optional[List[SearchHit]]:
+        """
+        Повертає до limit знімків товарів, впорядкованих за релевантністю.
+        None — індекс ще не побудований (викликач має піти в БД).
+        """
+        if not self.ready:
+            return None
+
+        phrase = normalize(query)
+        terms = _TOKEN_RE.findall(phrase) or ([phrase] if phrase else [])
+        if not terms or limit <= 0:
+            return []
+
+        state = self._state
+        slots = state.slots
+        ranked: List[Tuple[int, int, int, int, int]] = []
+
+        # 1. Точний збіг артикулу — завжди першим
+        exact_slot = state.by_article.get(phrase)
+        if exact_slot is not None:
+            exact = slots[exact_slot]
+            if department is None or exact.hit.відділ == department:
+                ranked.append((0, 0, *exact.sort_key(), exact_slot))
+
+        # Найкраща досяжна оцінка решти: набравши limit таких товарів
+        # з основної частини, решту основної частини можна пропустити
+        best = (1 if state.has_prefix(phrase) else 2, -len(terms))
+        n_best = len(ranked)
+
+        spaced = [" " + t for t in terms]
+        candidates = state.candidates(terms)
+        pos = 0
+        while pos < len(candidates):
+            slot = candidates[pos]
+            pos += 1
+            doc = slots[slot]
+            if doc is None or slot == exact_slot:
+                continue
+            if not all(doc.contains(t) for t in terms):
+                continue
+            if department is not None and doc.hit.відділ != department:
+                continue
+
+            prefix = doc.article.startswith(phrase) or doc.name.startswith(phrase)
+            overlap = sum(1 for t in spaced if t in doc.words)
+            key = (1 if prefix else 2, -overlap)
+            ranked.append((*key, *doc.sort_key(), slot))
+
+            if key <= best and slot < state.base_size:
+                n_best += 1
+                if n_best >= limit:
+                    # Точково додані товари (після base_size) перевіряємо завжди
+                    pos = max(pos, bisect_left(candidates, state.base_size))
+
+        ranked.sort()
+        return [slots[item[-1]].hit for item in ranked[:limit]]
+
+    def search_fuzzy(
+        self,
+        query: str,
+        limit: int = 10,
+        department: Optional[int] = None,
+        candidates: int = FUZZY_CANDIDATES,
+        min_score: int = FUZZY_MIN_SCORE,
+    ) -> Optional[List[SearchHit]]:
+        """
+        Пошук, стійкий до одруківок ("фарбаа", "грунтовка").
+
+        1. Кандидати — candidates слотів з найбільшою кількістю спільних
+           з запитом триграм (numpy bincount по спискам триграм).
+        2. Кожен кандидат оцінюється thefuzz: WRatio по назві, ratio по артикулу.
+        3. Результати з оцінкою >= min_score впорядковуються за оцінкою,
+           потім за кількістю спільних триграм.
+
+        None — індекс ще не побудований.
+        """
+        if not self.ready:
+            return None
+
+        phrase = normalize(query)
+        if len(phrase) < 2 or limit <= 0:
+            return []
+
+        state = self._state
+        slots = state.slots
+        grams = _trigrams(phrase)
+        counts = state.gram_counts(grams)
+        if not counts.size:
+            return []
+
+        # Кандидати з хоча б третиною спільних триграм запиту
+        threshold = max(1, len(grams) // 3)
+        if candidates < counts.size:
+            top = np.argpartition(counts, -candidates)[-candidates:]
+        else:
+            top = np.arange(counts.size)
+        top = top[counts[top] >= threshold]
+
+        scored: List[Tuple[int, int, int, int, int]] = []
+        for slot in top.tolist():
+            doc = slots[slot]
+            if doc is None:
+                continue
+            if department is not None and doc.hit.відділ != department:
+                continue
+            score = max(
+                fuzz.WRatio(phrase, doc.name, force_ascii=False, full_process=False),
+                fuzz.ratio(phrase, doc.article),
+            )
+            if score >= min_score:
+                scored.append((-score, -int(counts[slot]), *doc.sort_key(), slot))
+
+        scored.sort()
+        return [slots[item[-1]].hit for item in scored[:limit]]
+
+    # --- Оновлення ---
+
+    async def rebuild(self) -> None:
+        """Повна перебудова з БД (старт бота, масовий імпорт)."""
+        async with self._lock:
+            async with async_session() as session:
+                result = await session.execute(
+                    select(
+                        Product.id, Product.артикул, Product.назва, Product.відділ
+                    ).where(Product.активний == True)
+                )
+                hits = [SearchHit(*row) for row in result]
+
+            loop = asyncio.get_running_loop()
+            self._state = await loop.run_in_executor(None, _State.build, hits)
+            self.ready = True
+        logger.info("Пошуковий індекс побудовано: %s товарів", len(hits))
+
+    async def refresh_articles(self, articles: Iterable[str]) -> None:
+        """
+        Точкове оновлення за артикулами: активні товари перечитуються з БД,
+        решта (деактивовані) прибираються з індексу.
+        """
+        if not self.ready:
+            return
+        articles = list(dict.fromkeys(articles))
+        if not articles:
+            return
+        if len(articles) > FULL_REBUILD_THRESHOLD:
+            await self.rebuild()
+            return
+
+        async with self._lock:
+            fresh: Dict[str, SearchHit] = {}
+            async with async_session() as session:
+                for start in range(0, len(articles), REFRESH_BATCH_SIZE):
+                    chunk = articles[start : start + REFRESH_BATCH_SIZE]
+                    result = await session.execute(
+                        select(
+                            Product.id, Product.артикул, Product.назва, Product.відділ
+                        ).where(Product.артикул.in_(chunk), Product.активний == True)
+                    )
+                    for row in result:
+                        fresh[row.артикул] = SearchHit(*row)
+
+            state = self._state
+            for art in articles:
+                hit = fresh.get(art)
+                if hit is not None:
+                    state.upsert(hit)
+                    continue
+                slot = state.by_article.get(normalize(art))
+                if slot is not None:
+                    state.remove(state.slots[slot].hit.id)
+
+            if state.needs_compaction():
+                docs = [doc.hit for doc in state.docs()]
+                loop = asyncio.get_running_loop()
+                self._state = await loop.run_in_executor(None, _State.build, docs)
+                logger.info("Пошуковий індекс ущільнено: %s товарів", len(docs))
+
+    def remove(self, product_id: int) -> None:
+        """Прибирає товар з індексу (деактивація)."""
+        self._state.remove(product_id)
+
+    def stats(self) -> Dict[str, int]:
+        state = self._state
+        return {
+            "products": len(state.slot_of),
+            "trigrams": len(state.postings),
+            "postings": state.postings_total,
+            "stale": state.stale,
+        }
+
+
+product_search_index = ProductSearchIndex()
@@ -0,0 +1,219 @@
+# epicservice/database/orm/stock_history.py
+
+"""
+Обслуговування історії залишків (stock_history).
+
+- PostgreSQL: таблиця секціонована помісячно за changed_at (міграція 0005).
+  orm_ensure_stock_history_partitions заздалегідь створює секції на
+  поточний і наступні місяці, щоб нові рядки не падали в DEFAULT-секцію.
+- Стиснення: історія старша за STOCK_HISTORY_RETENTION_DAYS згортається
+  до одного рядка на товар за день (old_quantity першої зміни,
+  new_quantity останньої, change_source = "compacted", changed_at —
+  початок дня). Кожен місяць стискається окремою транзакцією.
+"""
+
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from sqlalchemy import case, delete, func, insert, literal, select, text
+
+from config import STOCK_HISTORY_RETENTION_DAYS
+from database.engine import async_session, datetime_bound, is_postgres
+from database.models import StockHistory
+
+logger = logging.getLogger(__name__)
+
+COMPACTED_SOURCE = "compacted"
+
+# На скільки місяців наперед створювати секції (PostgreSQL)
+PARTITION_MONTHS_AHEAD = 2
+
+
+def _next_month(day: date) -> date:
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+# ==============================================================================
+# 🗂 СЕКЦІЇ (POSTGRESQL)
+# ==============================================================================
+
+
+async def orm_ensure_stock_history_partitions(
+    months_ahead: int = PARTITION_MONTHS_AHEAD,
+) -> int:
+    """
+    Створює місячні секції stock_history від поточного місяця на
+    months_ahead наперед (лише PostgreSQL і лише для секціонованої таблиці).
+    Повертає кількість створених секцій.
+    """
+    if not is_postgres():
+        return 0
+
+    created = 0
+    async with async_session() as session:
+        partitioned = await session.scalar(
+            text(
+                "SELECT 1 FROM pg_partitioned_table "
+                "WHERE partrelid = to_regclass('stock_history')"
+            )
+        )
+        if not partitioned:
+            return 0
+
+        month = date.today().replace(day=1)
+        for _ in range(months_ahead + 1):
+            following = _next_month(month)
+            name = f"stock_history_{month:%Y_%m}"
+            if await session.scalar(text("SELECT to_regclass(:name)"), {"name": name}) is None:
+                try:
+                    async with session.begin_nested():
+                        await session.execute(
+                            text(
+                                f"CREATE TABLE {name} PARTITION OF stock_history "
+                                f"FOR VALUES FROM ('{month}') TO ('{following}')"
+                            )
+                        )
+                    created += 1
+                except Exception as e:
+                    # Напр. DEFAULT-секція вже містить рядки цього місяця
+                    logger.warning("Не вдалося створити секцію %s: %s", name, e)
+            month = following
+        await session.commit()
+
+    if created:
+        logger.info("Створено секцій stock_history: %s", created)
+    return created
+
+
+# ==============================================================================
+# 🗜 СТИСНЕННЯ СТАРОЇ ІСТОРІЇ
+# ==============================================================================
+
+
+def _day_start(column):
+    """Початок дня для DateTime-колонки."""
+    if is_postgres():
+        return func.date_trunc("day", column)
+    return func.datetime(func.date(column))
+
+
+async def _compact_range(start: datetime, end: datetime) -> int:
+    """
+    Стискає історію за [start, end) (межі — початки днів) в одній
+    транзакції. Повертає, на скільки рядків поменшало.
+    """
+    async with async_session() as session:
+        max_id = await session.scalar(select(func.max(StockHistory.id)))
+        if max_id is None:
+            return 0
+
+        day = _day_start(StockHistory.changed_at)
+        group = (StockHistory.product_id, day)
+        ranked = (
+            select(
+                StockHistory.id,
+                StockHistory.product_id,
+                StockHistory.articul,
+                StockHistory.old_quantity,
+                StockHistory.new_quantity,
+                day.label("day"),
+                func.row_number()
+                .over(partition_by=group, order_by=(StockHistory.changed_at, StockHistory.id))
+                .label("first"),
+                func.row_number()
+                .over(
+                    partition_by=group,
+                    order_by=(StockHistory.changed_at.desc(), StockHistory.id.desc()),
+                )
+                .label("last"),
+                # Дні, де вже лише стиснений рядок, не чіпаємо
+                func.max(case((StockHistory.change_source != COMPACTED_SOURCE, 1), else_=0))
+                .over(partition_by=group)
+                .label("raw"),
+            )
+            .where(
+                StockHistory.changed_at >= datetime_bound(start),
+                StockHistory.changed_at < datetime_bound(end),
+                # Нові стиснені рядки цієї ж транзакції в розрахунок не потрапляють
+                StockHistory.id <= max_id,
+            )
+            .subquery()
+        )
+
+        net = (
+            select(
+                ranked.c.product_id,
+                func.max(ranked.c.articul),
+                func.max(case((ranked.c.first == 1, ranked.c.old_quantity))),
+                func.max(case((ranked.c.last == 1, ranked.c.new_quantity))),
+                literal(COMPACTED_SOURCE),
+                ranked.c.day,
+            )
+            .where(ranked.c.raw == 1)
+            .group_by(ranked.c.product_id, ranked.c.day)
+        )
+        inserted = (
+            await session.execute(
+                insert(StockHistory).from_select(
+                    [
+                        "product_id",
+                        "articul",
+                        "old_quantity",
+                        "new_quantity",
+                        "change_source",
+                        "changed_at",
+                    ],
+                    net,
+                )
+            )
+        ).rowcount
+        deleted = (
+            await session.execute(
+                delete(StockHistory).where(
+                    StockHistory.id.in_(select(ranked.c.id).where(ranked.c.raw == 1))
+                )
+            )
+        ).rowcount
+        await session.commit()
+
+    return deleted - inserted
+
+
+async def orm_compact_stock_history(
+    retention_days: int = STOCK_HISTORY_RETENTION_DAYS,
+) -> int:
+    """
+    Згортає історію старшу за retention_days днів до денних підсумків
+    (по місяцю за транзакцію). Повертає, на скільки рядків поменшало.
+    """
+    horizon = datetime.combine(date.today() - timedelta(days=retention_days), time.min)
+
+    async with async_session() as session:
+        oldest: Optional[datetime] = await session.scalar(
+            select(func.min(StockHistory.changed_at)).where(
+                StockHistory.changed_at < datetime_bound(horizon),
+                StockHistory.change_source != COMPACTED_SOURCE,
+            )
+        )
+    if oldest is None:
+        return 0
+
+    removed = 0
+    start = datetime.combine(oldest.date(), time.min)
+    while start < horizon:
+        end = min(datetime.combine(_next_month(start.date()), time.min), horizon)
+        removed += await _compact_range(start, end)
+        start = end
+
+    logger.info("Історію залишків до %s стиснено: -%s рядків", horizon.date(), removed)
+    return removed
+
+
+async def orm_maintain_stock_history() -> None:
+    """Завдання планувальника: секції наперед + стиснення старої історії."""
+    try:
+        await orm_ensure_stock_history_partitions()
+        await orm_compact_stock_history()
+    except Exception as e:
+        logger.error("Помилка обслуговування історії залишків: %s", e, exc_info=True)
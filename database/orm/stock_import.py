@@ -0,0 +1,352 @@
+# epicservice/database/orm/stock_import.py
+
+import asyncio
+import logging
+import pickle
+import tempfile
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import pandas as pd
+from sqlalchemy import Row, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.engine import async_session, dialect_insert
+from database.models import Product, StockHistory
+from database.orm.product_cache import catalog_changed, invalidate_all
+from database.orm.products_fts import orm_rebuild_products_fts
+from database.orm.search_index import product_search_index
+
+logger = logging.getLogger(__name__)
+
+# Розмір пачки для IN (...) та багаторядкових INSERT.
+# 1000 рядків × 10 колонок вкладаються в ліміти параметрів SQLite та asyncpg.
+IMPORT_BATCH_SIZE = 1000
+
+# Поля товару, які синхронізуються з файлу імпорту
+_SYNC_FIELDS = (
+    "назва",
+    "відділ",
+    "група",
+    "кількість",
+    "ціна",
+    "сума_залишку",
+    "місяці_без_руху",
+    "активний",
+)
+
+# Поля, які потрапляють у пошук (індекс у пам'яті, FTS5)
+_SEARCH_FIELDS = ("назва", "відділ", "група")
+
+
+class StockImportReadError(Exception):
+    """Файл імпорту не вдалося прочитати; каталог не змінено."""
+
+
+# ==============================================================================
+# 🛠 ДОПОМІЖНІ ФУНКЦІЇ
+# ==============================================================================
+
+
+def _chunks(items: List[Any], size: int = IMPORT_BATCH_SIZE) -> Iterator[List[Any]]:
+    """Розбиває список на пачки фіксованого розміру."""
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _clean(value: Any) -> Any:
+    """Перетворює NaN/None з DataFrame на None."""
+    if value is None:
+        return None
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return value
+
+
+def _is_zero(quantity: Any) -> bool:
+    try:
+        return float(str(quantity).replace(",", ".")) == 0
+    except (TypeError, ValueError):
+        return False
+
+
+def _prepare_records(processed_df: pd.DataFrame) -> Dict[str, dict]:
+    """
+    Готує рядки файлу до синхронізації: артикул -> нормалізовані поля.
+    Дублікати артикулів схлопуються, перемагає останній рядок файлу.
+    """
+    records = {}
+    for raw in processed_df.to_dict("records"):
+        row = {key: _clean(value) for key, value in raw.items()}
+        art = str(row["артикул"])
+        records[art] = {
+            "кількість": str(row["кількість"]).replace(".", ","),
+            "zero": _is_zero(row["кількість"]),
+            "ціна": float(row["ціна"]) if row.get("ціна") is not None else None,
+            "сума_залишку": (
+                float(row["сума_залишку"])
+                if row.get("сума_залишку") is not None
+                else None
+            ),
+            "місяці_без_руху": (
+                int(row["місяці_без_руху"])
+                if row.get("місяці_без_руху") is not None
+                else None
+            ),
+            "назва": row.get("назва") or None,
+            "група": row.get("група") or None,
+            "відділ": int(row["відділ"]) if row.get("відділ") else None,
+        }
+    return records
+
+
+def _spool_next(frames: Iterator[pd.DataFrame], spool: BinaryIO) -> bool:
+    """
+    Читає наступну порцію, готує її записи і дописує в тимчасовий файл
+    (виконується в executor). False — порції скінчились.
+    """
+    frame = next(frames, None)
+    if frame is None:
+        return False
+    pickle.dump(_prepare_records(frame), spool, pickle.HIGHEST_PROTOCOL)
+    return True
+
+
+# ==============================================================================
+# 📥 ПАКЕТНИЙ ІМПОРТ ЗАЛИШКІВ
+# ==============================================================================
+
+
+async def _sync_records(
+    session: AsyncSession,
+    records: Dict[str, dict],
+    change_source: str,
+    stats: Dict[str, int],
+    seen: Dict[str, Tuple[Optional[Row], bool]],
+    history: Dict[str, dict],
+) -> Tuple[int, List[str]]:
+    """
+    Кроки 1-3 для однієї порції: існуючі товари, різниця, пакетний upsert.
+
+    seen — артикули попередніх порцій: стан товару в БД до імпорту (None для
+    нових) і чи нульовий залишок у їх останньому рядку. Повтор артикула
+    в пізнішій порції не рахується вдруге, а зливається зі станом до імпорту,
+    як і дублікат у межах порції (перемагає останній рядок файлу).
+    history — рядки історії за артикулами, записуються в кінці імпорту.
+
+    Повертає (кількість записаних товарів, артикули зі зміненими для пошуку
+    полями).
+    """
+    # --- 1. ІСНУЮЧІ ТОВАРИ ---
+    existing = {}
+    for chunk in _chunks([art for art in records if art not in seen]):
+        result = await session.execute(
+            select(
+                Product.id,
+                Product.артикул,
+                *(getattr(Product, field) for field in _SYNC_FIELDS),
+            ).where(Product.артикул.in_(chunk))
+        )
+        for row in result:
+            existing[row.артикул] = row
+
+    # --- 2. РІЗНИЦЯ В ПАМ'ЯТІ ---
+    upserts = []
+    reindex = []
+
+    for art, rec in records.items():
+        repeated = art in seen
+        if repeated:
+            current, was_zero = seen[art]
+            stats["zero"] += rec["zero"] - was_zero
+        else:
+            current = existing.get(art)
+            stats["zero"] += rec["zero"]
+        seen[art] = (current, rec["zero"])
+
+        if current is None:
+            upserts.append(
+                {
+                    "артикул": art,
+                    "назва": rec["назва"] or "Без назви",
+                    "відділ": rec["відділ"] or 0,
+                    "група": rec["група"] or "",
+                    "кількість": rec["кількість"],
+                    "ціна": rec["ціна"] or 0.0,
+                    "сума_залишку": rec["сума_залишку"] or 0.0,
+                    "місяці_без_руху": rec["місяці_без_руху"] or 0,
+                    "активний": True,
+                }
+            )
+            if not repeated:
+                stats["added"] += 1
+            reindex.append(art)
+            continue
+
+        if not repeated:
+            stats["updated"] += 1
+            if not current.активний:
+                stats["reactivated"] += 1
+
+        if current.кількість != rec["кількість"]:
+            history[art] = {
+                "product_id": current.id,
+                "articul": art,
+                "old_quantity": current.кількість,
+                "new_quantity": rec["кількість"],
+                "change_source": change_source,
+            }
+        else:
+            history.pop(art, None)
+
+        # Часткове оновлення: порожні поля файлу залишають значення з БД
+        merged = {"артикул": art, "активний": True}
+        for field in _SYNC_FIELDS:
+            if field == "активний":
+                continue
+            value = rec[field]
+            merged[field] = value if value is not None else getattr(current, field)
+
+        # Повтор записується завжди: попередня порція вже змінила рядок у БД
+        if repeated or any(
+            merged[field] != getattr(current, field) for field in _SYNC_FIELDS
+        ):
+            upserts.append(merged)
+            if repeated or not current.активний or any(
+                merged[field] != getattr(current, field) for field in _SEARCH_FIELDS
+            ):
+                reindex.append(art)
+
+    # --- 3. ЗАПИС ЗМІН ---
+    for chunk in _chunks(upserts):
+        stmt = dialect_insert(Product).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Product.артикул],
+            set_={
+                **{field: stmt.excluded[field] for field in _SYNC_FIELDS},
+                "updated_at": func.now(),
+            },
+        )
+        await session.execute(stmt)
+
+    return len(upserts), reindex
+
+
+async def orm_import_stock(
+    processed: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+    change_source: str = "import",
+) -> Dict[str, int]:
+    """
+    Синхронізує каталог з результатом process_import_dataframe пакетно:
+    1. Завантажує існуючі товари з артикулами файлу (IN-пачками).
+    2. Рахує різницю в пам'яті: нові, змінені, відновлені товари.
+    3. Записує зміни пакетним INSERT ... ON CONFLICT DO UPDATE.
+    4. Деактивує активні товари, яких немає у файлі.
+
+    processed — DataFrame або ітератор порцій (process_excel_stream).
+    Спершу всі порції читаються в executor і складаються в тимчасовий файл
+    (у пам'яті — лише одна порція), без відкритої транзакції: на SQLite
+    блокування запису не тримається, поки розбирається файл. Потім порції
+    пишуться з тимчасового файлу однією транзакцією. Артикул, що
+    трапляється в кількох порціях, рахується й потрапляє в історію один раз.
+
+    Порожні поля файлу не перезаписують значення в БД.
+    Якщо у файлі немає жодного валідного рядка, нічого не змінюється.
+    Помилка читання файлу — StockImportReadError (БД не змінено); помилка
+    БД відкочує транзакцію повністю і пробрасується далі.
+
+    Returns:
+        Словник статистики: added, updated, reactivated, deactivated, zero
+    """
+    stats = {"added": 0, "updated": 0, "reactivated": 0, "deactivated": 0, "zero": 0}
+    frames = iter([processed] if isinstance(processed, pd.DataFrame) else processed)
+    loop = asyncio.get_running_loop()
+
+    seen: Dict[str, Tuple[Optional[Row], bool]] = {}
+    history: Dict[str, dict] = {}
+    written = 0
+    reindex: List[str] = []
+
+    with tempfile.TemporaryFile() as spool:
+        # --- ЧИТАННЯ ФАЙЛУ (без транзакції) ---
+        spooled = 0
+        while True:
+            try:
+                more = await loop.run_in_executor(None, _spool_next, frames, spool)
+            except Exception as e:
+                logger.error("Імпорт (%s): помилка читання файлу: %s", change_source, e, exc_info=True)
+                raise StockImportReadError(str(e)) from e
+            if not more:
+                break
+            spooled += 1
+
+        if not spooled:
+            logger.warning(
+                "Імпорт (%s): немає валідних рядків, зміни не застосовано",
+                change_source,
+            )
+            return stats
+        spool.seek(0)
+
+        # --- ЗАПИС (одна коротка транзакція) ---
+        async with async_session() as session:
+            try:
+                res_active = await session.execute(
+                    select(Product.артикул).where(Product.активний == True)
+                )
+                db_active_articles = set(res_active.scalars().all())
+
+                for _ in range(spooled):
+                    chunk_written, chunk_reindex = await _sync_records(
+                        session, pickle.load(spool), change_source, stats, seen, history
+                    )
+                    written += chunk_written
+                    reindex.extend(chunk_reindex)
+
+                if not seen:
+                    await session.rollback()
+                    logger.warning(
+                        "Імпорт (%s): немає валідних рядків, зміни не застосовано",
+                        change_source,
+                    )
+                    return stats
+
+                for chunk in _chunks(list(history.values())):
+                    await session.execute(insert(StockHistory).values(chunk))
+
+                # --- 4. ДЕАКТИВАЦІЯ ---
+                to_deact = list(db_active_articles - seen.keys())
+                for chunk in _chunks(to_deact):
+                    await session.execute(
+                        update(Product)
+                        .where(Product.артикул.in_(chunk))
+                        .values(активний=False)
+                    )
+                stats["deactivated"] = len(to_deact)
+
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+
+    invalidate_all()
+    catalog_changed(imported=True)
+
+    logger.info(
+        "Імпорт (%s): записано %s, історія %s, статистика %s",
+        change_source,
+        written,
+        len(history),
+        stats,
+    )
+
+    # Пошукові індекси не повинні ламати вже закомічений імпорт
+    try:
+        await product_search_index.refresh_articles(reindex + to_deact)
+        if reindex:
+            await orm_rebuild_products_fts()
+    except Exception as e:
+        logger.error("Помилка оновлення пошукового індексу: %s", e, exc_info=True)
+    return stats
@@ -1,18 +1,40 @@
 # epicservice/database/orm/temp_lists.py
 
 import logging
-from typing import List, Optional
+from typing import List, NamedTuple, Optional
 
-from sqlalchemy import and_, delete, func, select
+from sqlalchemy import and_, delete, func, literal, null, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import aliased, joinedload
 
-from database.engine import async_session
+from database.engine import async_session, dialect_insert
 from database.models import Product, TempList
+from database.orm.product_cache import get_card_view, invalidate_products, put_card_view
 
 logger = logging.getLogger(__name__)
 
 
+class ProductCardView(NamedTuple):
+    """
+    Дані картки товару для користувача: поля товару (ті ж імена, що в Product),
+    резерви та кошик. Збирається одним запитом в orm_get_product_card.
+    """
+
+    id: int
+    артикул: str
+    назва: str
+    відділ: int
+    група: str
+    кількість: str
+    відкладено: int
+    ціна: Optional[float]
+    місяці_без_руху: Optional[int]
+    temp_reserved: int  # сума в тимчасових списках усіх користувачів
+    in_cart: int  # у списку цього користувача
+    cart_department: Optional[int]  # відділ поточного списку користувача
+    available: int  # залишок - відкладено - temp_reserved (не менше 0)
+
+
 # ==============================================================================
 # 📋 ОТРИМАННЯ ТИМЧАСОВОГО СПИСКУ
 # ==============================================================================
@@ -88,6 +110,101 @@ async def orm_get_temp_list_item(user_id: int, product_id: int) -> Optional[Temp
         return None
 
 
+# ==============================================================================
+# 🃏 КАРТКА ТОВАРУ
+# ==============================================================================
+
+
+async def orm_get_product_card(
+    user_id: Optional[int], product_id: int
+) -> Optional[ProductCardView]:
+    """
+    Все для картки товару одним запитом: товар, загальний резерв у тимчасових
+    списках, кількість у списку користувача та відділ його списку
+    (скалярні підзапити). Повертає None, якщо товар не знайдено.
+
+    Без user_id поля користувача не запитуються (in_cart=0,
+    cart_department=None). Товарна частина результату кладеться в кеш карток.
+    """
+    temp_reserved = (
+        select(func.coalesce(func.sum(TempList.quantity), 0))
+        .where(TempList.product_id == Product.id)
+        .scalar_subquery()
+    )
+    if user_id is None:
+        in_cart = literal(0)
+        cart_department = null()
+    else:
+        in_cart = (
+            select(func.coalesce(func.sum(TempList.quantity), 0))
+            .where(TempList.product_id == Product.id, TempList.user_id == user_id)
+            .scalar_subquery()
+        )
+        cart_product = aliased(Product)
+        cart_department = (
+            select(cart_product.відділ)
+            .join(TempList, TempList.product_id == cart_product.id)
+            .where(TempList.user_id == user_id)
+            .limit(1)
+            .scalar_subquery()
+        )
+
+    try:
+        async with async_session() as session:
+            result = await session.execute(
+                select(
+                    Product.id,
+                    Product.артикул,
+                    Product.назва,
+                    Product.відділ,
+                    Product.група,
+                    Product.кількість,
+                    Product.відкладено,
+                    Product.ціна,
+                    Product.місяці_без_руху,
+                    temp_reserved,
+                    in_cart,
+                    cart_department,
+                ).where(Product.id == product_id)
+            )
+            row = result.one_or_none()
+    except Exception as e:
+        logger.error(
+            "Помилка отримання картки товару (user_id=%s, product_id=%s): %s",
+            user_id,
+            product_id,
+            e,
+            exc_info=True,
+        )
+        return None
+
+    if row is None:
+        return None
+
+    try:
+        stock_qty = float(str(row.кількість).replace(",", "."))
+    except ValueError:
+        stock_qty = 0
+    reserved = int(row[9] or 0)
+    available = max(0, int(stock_qty - (row.відкладено or 0) - reserved))
+
+    card = ProductCardView(*row[:9], reserved, int(row[10] or 0), row[11], available)
+    put_card_view(product_id, card._replace(in_cart=0, cart_department=None))
+    return card
+
+
+async def orm_get_product_card_view(product_id: int) -> Optional[ProductCardView]:
+    """
+    Товарна частина картки з короткочасного кешу (для ➕/➖ без запиту до БД).
+    При промаху — orm_get_product_card без користувача. in_cart і
+    cart_department у результаті не заповнені.
+    """
+    card = get_card_view(product_id)
+    if card is None:
+        card = await orm_get_product_card(None, product_id)
+    return card
+
+
 # ==============================================================================
 # ➕ ДОДАВАННЯ ДО СПИСКУ
 # ==============================================================================
@@ -95,46 +212,34 @@ async def orm_get_temp_list_item(user_id: int, product_id: int) -> Optional[Temp
 
 async def orm_add_item_to_temp_list(
     user_id: int, product_id: int, quantity: int
-) -> bool:
+) -> Optional[int]:
     """
     Додає товар до тимчасового списку або збільшує кількість, якщо вже є.
-    Повертає True при успіху.
+    Один атомарний INSERT ... ON CONFLICT (user_id, product_id) DO UPDATE,
+    тож подвійне натискання не створює дублікатів і не губить кількість.
+    Повертає нову кількість у списку або None при помилці.
     """
+    stmt = dialect_insert(TempList).values(
+        user_id=user_id, product_id=product_id, quantity=quantity
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TempList.user_id, TempList.product_id],
+        set_={"quantity": TempList.quantity + stmt.excluded.quantity},
+    ).returning(TempList.quantity)
+
     try:
         async with async_session() as session:
-            # Перевіряємо, чи вже є товар в списку
-            existing = await session.execute(
-                select(TempList).where(
-                    and_(TempList.user_id == user_id, TempList.product_id == product_id)
-                )
-            )
-            existing_item = existing.scalar_one_or_none()
-
-            if existing_item:
-                # Збільшуємо кількість
-                existing_item.quantity += quantity
-                logger.info(
-                    "Збільшено кількість товару (user_id=%s, product_id=%s): %s -> %s",
-                    user_id,
-                    product_id,
-                    existing_item.quantity - quantity,
-                    existing_item.quantity,
-                )
-            else:
-                # Додаємо новий товар
-                new_item = TempList(
-                    user_id=user_id, product_id=product_id, quantity=quantity
-                )
-                session.add(new_item)
-                logger.info(
-                    "Додано товар до списку (user_id=%s, product_id=%s, quantity=%s)",
-                    user_id,
-                    product_id,
-                    quantity,
-                )
-
+            new_quantity = (await session.execute(stmt)).scalar_one()
             await session.commit()
-            return True
+            invalidate_products((product_id,))
+            logger.info(
+                "Додано товар до списку (user_id=%s, product_id=%s): +%s -> %s",
+                user_id,
+                product_id,
+                quantity,
+                new_quantity,
+            )
+            return new_quantity
 
     except Exception as e:
         logger.error(
@@ -144,7 +249,7 @@ async def orm_add_item_to_temp_list(
             e,
             exc_info=True,
         )
-        return False
+        return None
 
 
 # ==============================================================================
@@ -164,8 +269,14 @@ async def orm_update_item_quantity(
     try:
         if new_quantity <= 0:
             # Видаляємо через ту ж сесію
-            await session.execute(delete(TempList).where(TempList.id == item_id))
+            result = await session.execute(
+                delete(TempList)
+                .where(TempList.id == item_id)
+                .returning(TempList.product_id)
+            )
+            product_ids = result.scalars().all()
             await session.commit()
+            invalidate_products(product_ids)
             logger.info("Видалено позицію ID %s (кількість <= 0)", item_id)
             return True
 
@@ -178,7 +289,9 @@ async def orm_update_item_quantity(
 
         old_quantity = item.quantity
         item.quantity = new_quantity
+        product_id = item.product_id
         await session.commit()
+        invalidate_products((product_id,))
 
         logger.info(
             "Оновлено кількість позиції ID %s: %s -> %s",
@@ -200,8 +313,14 @@ async def orm_delete_item_from_temp_list(item_id: int) -> bool:
     """Видаляє товар з тимчасового списку за ID позиції."""
     try:
         async with async_session() as session:
-            await session.execute(delete(TempList).where(TempList.id == item_id))
+            result = await session.execute(
+                delete(TempList)
+                .where(TempList.id == item_id)
+                .returning(TempList.product_id)
+            )
+            product_ids = result.scalars().all()
             await session.commit()
+            invalidate_products(product_ids)
             logger.info("Видалено позицію ID %s з тимчасового списку", item_id)
             return True
 
@@ -215,10 +334,14 @@ async def orm_clear_temp_list(user_id: int) -> bool:
     try:
         async with async_session() as session:
             result = await session.execute(
-                delete(TempList).where(TempList.user_id == user_id)
+                delete(TempList)
+                .where(TempList.user_id == user_id)
+                .returning(TempList.product_id)
             )
-            deleted_count = result.rowcount
+            product_ids = result.scalars().all()
+            deleted_count = len(product_ids)
             await session.commit()
+            invalidate_products(product_ids)
 
             logger.info(
                 "Очищено тимчасовий список user_id %s (видалено %s позицій)",
@@ -66,7 +66,8 @@ async def admin_view_all_archives(message: Message):
 
 async def _pack_user_files_to_zip(user_id: int):
     """
-    Внутрішня функція для пакування файлів користувача в ZIP.
+    Внутрішня функція для пакування файлів користувача в ZIP
+    (UserZip з кешу або новий, зібраний у пулі рендерингу).
     Використовується в menu_navigation.py
     """
     from database.orm import orm_pack_user_files_to_zip
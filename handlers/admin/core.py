@@ -4,10 +4,12 @@ import logging
 from typing import Union
 
 from aiogram import Bot, F, Router
+from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, Message
 
 from config import ADMIN_IDS
+from database.orm import orm_get_recent_jobs, orm_rebuild_rollups
 
 # Використовуємо НОВУ клавіатуру (Reply)
 from keyboards.reply import get_admin_menu_kb
@@ -63,3 +65,46 @@ async def admin_panel_callback_handler(
 
 # Старі хендлери для експортів/звітів (inline) видалені,
 # оскільки тепер це робиться через menu_navigation.py
+
+
+@router.message(Command("rebuild_stats"))
+async def rebuild_stats_handler(message: Message):
+    """Перебудовує щоденні агрегати статистики з історії збережених списків."""
+    msg = await message.answer("⏳ Перебудовую щоденні агрегати статистики...")
+    try:
+        counts = await orm_rebuild_rollups()
+        await msg.edit_text(
+            "✅ **Агрегати перебудовано**\n\n"
+            f"📦 День × відділ × артикул: **{counts['collected_daily']}**\n"
+            f"👥 День × користувач: **{counts['user_daily_activity']}**"
+        )
+    except Exception as e:
+        logger.error("Помилка перебудови агрегатів: %s", e, exc_info=True)
+        await msg.edit_text(f"❌ Помилка перебудови агрегатів:\n{str(e)}")
+
+
+# Позначки статусів завдань у /jobs
+_JOB_STATUS_ICONS = {"queued": "🕓", "running": "⏳", "done": "✅", "failed": "❌"}
+
+
+@router.message(Command("jobs"))
+async def jobs_handler(message: Message):
+    """Показує останні фонові завдання та їхній стан."""
+    jobs = await orm_get_recent_jobs(10)
+    if not jobs:
+        await message.answer("📭 Фонових завдань ще не було.")
+        return
+
+    # Без Markdown: kind і текст помилки містять "_" та інші службові символи
+    lines = ["📋 Останні фонові завдання:\n"]
+    for job in jobs:
+        icon = _JOB_STATUS_ICONS.get(job.status, "•")
+        line = (
+            f"{icon} #{job.id} {job.kind} — {job.progress}% "
+            f"(спроба {job.attempts}/{job.max_attempts}), "
+            f"{job.created_at.strftime('%d.%m %H:%M')}"
+        )
+        if job.status == "failed" and job.error:
+            line += f"\n    {job.error[:100]}"
+        lines.append(line)
+    await message.answer("\n".join(lines), parse_mode=None)
@@ -1,63 +1,75 @@
 # epicservice/handlers/admin/export_handlers.py
 
 import asyncio
+import csv
+import gzip
 import logging
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
 
 import pandas as pd
 from aiogram import F, Router
-from aiogram.types import FSInputFile, Message
+from aiogram.types import CallbackQuery, FSInputFile, Message
 
-from config import ADMIN_IDS, ARCHIVES_PATH
+from config import ADMIN_IDS
 from database.orm.analytics import (
-    orm_get_all_collected_items_sync,
+    orm_get_collected_summary_sync,
     orm_get_department_stats,
     orm_get_general_stats,
+    orm_iter_collected_items_sync,
 )
-from handlers.admin.report_handlers import _create_stock_report_sync
+from database.orm.product_cache import cache_stats
+from handlers.admin.report_handlers import use_stock_report_snapshot
+from keyboards.inline import get_export_format_kb, get_export_period_kb
+from services.job_queue import JobContext, JobError, enqueue_job, job_handler
+from utils.exporters import EXPORT_FORMATS, export_path, write_rows
+from utils.render_pool import render_pool
 
 logger = logging.getLogger(__name__)
 router = Router()
 
+# Формати для кожного експорту (статистика — кілька різнорідних таблиць,
+# тому без Parquet)
+EXPORT_KINDS = {
+    "stock": EXPORT_FORMATS,
+    "collected": EXPORT_FORMATS,
+    "stats": ("xlsx", "csv"),
+}
+
+# Розмір пачки курсора для експорту зібраного
+COLLECTED_YIELD_PER = 2000
+
+# Періоди експорту зібраного: ключ -> (підпис, днів; 0 — з початку доби,
+# None — вся історія)
+COLLECTED_PERIODS = {
+    "today": ("📅 Сьогодні", 0),
+    "7": ("7 днів", 7),
+    "30": ("30 днів", 30),
+    "all": ("🗂 Вся історія", None),
+}
+
 
 # ==============================================================================
-# 📤 ЕКСПОРТ ЗАЛИШКІВ
+# 📦 ВИБІР ФОРМАТУ
 # ==============================================================================
 
 
+async def ask_export_format(message: Message, kind: str):
+    """Пропонує обрати формат експорту (Excel / CSV.gz / Parquet)."""
+    await message.answer(
+        "📦 Оберіть формат експорту:",
+        reply_markup=get_export_format_kb(kind, EXPORT_KINDS[kind]),
+    )
+
+
 @router.message(F.text == "📤 Експорт залишків")
 async def export_stock(message: Message):
-    """Експортує поточні залишки складу в Excel."""
+    """Експортує поточні залишки складу."""
     if message.from_user.id not in ADMIN_IDS:
         await message.answer("🚫 У вас немає доступу до цієї функції.")
         return
-
-    await message.answer("📤 Формую звіт по залишках...")
-
-    try:
-        loop = asyncio.get_running_loop()
-        report_path = await loop.run_in_executor(None, _create_stock_report_sync)
-
-        if report_path and os.path.exists(report_path):
-            await message.answer_document(
-                FSInputFile(report_path),
-                caption=f"📊 **Звіт по залишках**\n📅 {datetime.now().strftime('%d.%m.%Y %H:%M')}",
-            )
-
-            # Видаляємо файл після відправки
-            os.remove(report_path)
-        else:
-            await message.answer("❌ Помилка створення звіту. Можливо, немає товарів.")
-
-    except Exception as e:
-        logger.error("Помилка експорту залишків: %s", e, exc_info=True)
-        await message.answer(f"❌ Помилка експорту:\n{str(e)}")
-
-
-# ==============================================================================
-# 📋 ЕКСПОРТ ЗІБРАНОГО
-# ==============================================================================
+    await ask_export_format(message, "stock")
 
 
 @router.message(F.text == "📋 Експорт зібраного")
@@ -66,126 +78,324 @@ async def export_collected(message: Message):
     if message.from_user.id not in ADMIN_IDS:
         await message.answer("🚫 У вас немає доступу до цієї функції.")
         return
+    await ask_export_format(message, "collected")
 
-    await message.answer("📋 Формую звіт по зібраному...")
 
-    try:
-        loop = asyncio.get_running_loop()
-        items = await loop.run_in_executor(None, orm_get_all_collected_items_sync)
+@router.message(F.text == "📊 Експорт статистики")
+async def export_statistics(message: Message):
+    """Експортує загальну статистику по системі."""
+    if message.from_user.id not in ADMIN_IDS:
+        await message.answer("🚫 У вас немає доступу до цієї функції.")
+        return
+    await ask_export_format(message, "stats")
 
-        if not items:
-            await message.answer("📭 Зібраних товарів ще немає.")
-            return
 
-        # Формуємо DataFrame
-        df = pd.DataFrame(items)
+@router.callback_query(F.data.startswith("export:"))
+async def on_export_format(callback: CallbackQuery):
+    """Ставить експорт в обраному форматі в чергу фонових завдань."""
+    if callback.from_user.id not in ADMIN_IDS:
+        await callback.answer("🚫 Немає доступу", show_alert=True)
+        return
 
-        # Перейменовуємо колонки для зручності
-        column_mapping = {
-            "article": "Артикул",
-            "name": "Назва",
-            "quantity": "Кількість",
-            "user_id": "User ID",
-            "created_at": "Дата",
-        }
-        df = df.rename(columns=column_mapping)
+    _, kind, fmt = callback.data.split(":", 2)
+    if fmt not in EXPORT_KINDS.get(kind, ()):
+        await callback.answer("❌ Формат недоступний", show_alert=True)
+        return
 
-        # Форматуємо дату
-        if "Дата" in df.columns:
-            df["Дата"] = pd.to_datetime(df["Дата"]).dt.strftime("%d.%m.%Y %H:%M")
+    await callback.answer()
+    if kind == "collected":
+        await callback.message.edit_text(
+            "📅 Оберіть період:",
+            reply_markup=get_export_period_kb(
+                kind, fmt, {key: label for key, (label, _) in COLLECTED_PERIODS.items()}
+            ),
+        )
+        return
 
-        # Створюємо файл
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"collected_report_{timestamp}.xlsx"
-        filepath = os.path.join(ARCHIVES_PATH, filename)
-        os.makedirs(ARCHIVES_PATH, exist_ok=True)
+    await callback.message.edit_text(f"📤 Експорт ({fmt})")
+    await enqueue_job(
+        callback.message, "export", {"kind": kind, "fmt": fmt}, f"Експорт ({fmt})"
+    )
 
-        await loop.run_in_executor(
-            None, lambda: df.to_excel(filepath, index=False, engine="openpyxl")
-        )
 
-        # Відправляємо файл
-        await message.answer_document(
-            FSInputFile(filepath),
-            caption=f"📋 **Звіт по зібраним товарам**\n📊 Всього позицій: {len(items)}",
-        )
+@router.callback_query(F.data.startswith("export_period:"))
+async def on_export_period(callback: CallbackQuery):
+    """Ставить експорт зібраного за обраний період у чергу фонових завдань."""
+    if callback.from_user.id not in ADMIN_IDS:
+        await callback.answer("🚫 Немає доступу", show_alert=True)
+        return
 
-        # Видаляємо файл
-        os.remove(filepath)
+    _, kind, fmt, period = callback.data.split(":", 3)
+    if fmt not in EXPORT_KINDS.get(kind, ()) or period not in COLLECTED_PERIODS:
+        await callback.answer("❌ Період недоступний", show_alert=True)
+        return
 
-        logger.info("Експортовано зібрані товари: %s позицій", len(items))
+    label, days = COLLECTED_PERIODS[period]
+    date_from = None
+    if days is not None:
+        today = datetime.combine(datetime.now().date(), datetime.min.time())
+        date_from = (today - timedelta(days=days) if days else today).isoformat()
 
-    except Exception as e:
-        logger.error("Помилка експорту зібраного: %s", e, exc_info=True)
-        await message.answer(f"❌ Помилка експорту:\n{str(e)}")
+    await callback.answer()
+    await callback.message.edit_text(f"📤 Експорт ({fmt}, {label})")
+    await enqueue_job(
+        callback.message,
+        "export",
+        {"kind": kind, "fmt": fmt, "date_from": date_from, "date_to": None},
+        f"Експорт ({fmt})",
+    )
+
+
+@job_handler("export")
+async def run_export_job(ctx: JobContext) -> Optional[str]:
+    """Фонове завдання: формує експорт і надсилає файл у чат."""
+    kind, fmt = ctx.payload["kind"], ctx.payload["fmt"]
+    ctx.report(10, "формую файл")
+    result = await _EXPORTERS[kind](ctx, fmt)
+    logger.info("Експорт %s (%s) надіслано", kind, fmt)
+    return result
+
+
+async def _send_and_remove(ctx: JobContext, filepath: str, caption: str):
+    ctx.report(90, "надсилаю файл")
+    await ctx.send_document(FSInputFile(filepath), caption=caption)
+
+    # Видаляємо файл після відправки
+    os.remove(filepath)
 
 
 # ==============================================================================
-# 📊 ЕКСПОРТ СТАТИСТИКИ
+# 📤 ЕКСПОРТ ЗАЛИШКІВ
 # ==============================================================================
 
 
-@router.message(F.text == "📊 Експорт статистики")
-async def export_statistics(message: Message):
-    """Експортує загальну статистику по системі."""
-    if message.from_user.id not in ADMIN_IDS:
-        await message.answer("🚫 У вас немає доступу до цієї функції.")
-        return
+async def _export_stock(ctx: JobContext, fmt: str):
+    """Звіт зі знімка: файл не видаляється, доки не зміниться каталог."""
+    async with use_stock_report_snapshot(fmt) as snapshot:
+        if not snapshot:
+            raise JobError("Помилка створення звіту. Можливо, немає товарів.")
+
+        ctx.report(90, "надсилаю файл")
+        sent = await ctx.send_document(
+            snapshot.file_id or FSInputFile(snapshot.path),
+            caption=f"📊 **Звіт по залишках**\n📅 {snapshot.created_at.strftime('%d.%m.%Y %H:%M')}",
+        )
+        snapshot.file_id = sent.document.file_id
+    return "✅ Звіт по залишках надіслано"
+
 
-    await message.answer("📊 Формую статистику...")
+# ==============================================================================
+# 📋 ЕКСПОРТ ЗІБРАНОГО
+# ==============================================================================
 
-    try:
-        loop = asyncio.get_running_loop()
+_COLLECTED_HEADERS = ("Артикул", "Назва", "Кількість", "User ID", "Дата")
+_COLLECTED_WIDTHS = (12, 50, 10, 12, 16)
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _write_collected_sync(
+    filepath: str, fmt: str, date_from: Optional[datetime], date_to: Optional[datetime]
+) -> int:
+    """
+    Потоково пише позиції збережених у [date_from, date_to) списків (новіші
+    першими) прямо з курсора БД. Повертає кількість позицій.
+    """
+    return write_rows(
+        fmt,
+        filepath,
+        _COLLECTED_HEADERS,
+        orm_iter_collected_items_sync(date_from, date_to, COLLECTED_YIELD_PER),
+        _COLLECTED_WIDTHS,
+        sheet_name="Зібране",
+    )
+
+
+async def _export_collected(ctx: JobContext, fmt: str):
+    # Період з payload; без нього (старі завдання в черзі) — вся історія
+    date_from = _parse_datetime(ctx.payload.get("date_from"))
+    date_to = _parse_datetime(ctx.payload.get("date_to"))
+    filepath = export_path("collected_report", fmt)
+    count = await render_pool.run(
+        "collected_export", _write_collected_sync, filepath, fmt, date_from, date_to
+    )
+    if not count:
+        os.remove(filepath)
+        return "📭 Зібраних товарів за цей період немає."
 
-        # Отримуємо загальну статистику
-        general_stats = await loop.run_in_executor(None, orm_get_general_stats)
+    period = f"з {date_from.strftime('%d.%m.%Y')}" if date_from else "за весь час"
+    await _send_and_remove(
+        ctx,
+        filepath,
+        f"📋 **Звіт по зібраним товарам** ({period})\n📊 Всього позицій: {count}",
+    )
+    return f"✅ Звіт по зібраним товарам надіслано ({count} позицій)"
 
-        # Статистика по відділам
-        department_stats = await loop.run_in_executor(None, orm_get_department_stats)
 
-        # Створюємо Excel з кількома листами
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"statistics_{timestamp}.xlsx"
-        filepath = os.path.join(ARCHIVES_PATH, filename)
-        os.makedirs(ARCHIVES_PATH, exist_ok=True)
+# ==============================================================================
+# 📊 ЕКСПОРТ СТАТИСТИКИ
+# ==============================================================================
 
-        with pd.ExcelWriter(filepath, engine="openpyxl") as writer:
-            # Лист 1: Загальна статистика
-            general_df = pd.DataFrame([general_stats])
-            general_df = general_df.rename(
-                columns={
-                    "products_count": "Кількість товарів",
-                    "total_value": "Загальна вартість",
-                    "users_count": "Кількість користувачів",
-                    "saved_lists_count": "Збережених списків",
-                    "temp_items_count": "Поточних позицій",
+
+# Період агрегатів зібраного у статистиці
+STATS_PERIOD_DAYS = 30
+
+_COLLECTED_SUMMARY_COLUMNS = {
+    "department": "Відділ",
+    "day": "День",
+    "total_quantity": "Зібрано, шт",
+    "positions": "Позицій",
+}
+
+
+def _statistics_tables(
+    general_stats: dict,
+    department_stats: list,
+    collected_departments: dict,
+    collected_days: dict,
+    caches: list,
+    render_jobs: list,
+) -> List[Tuple[str, pd.DataFrame]]:
+    """Таблиці статистики як пари (назва аркуша, DataFrame)."""
+    tables = []
+
+    # Загальна статистика
+    general_df = pd.DataFrame([general_stats]).rename(
+        columns={
+            "products_count": "Кількість товарів",
+            "total_value": "Загальна вартість",
+            "users_count": "Кількість користувачів",
+            "saved_lists_count": "Збережених списків",
+            "temp_items_count": "Поточних позицій",
+        }
+    )
+    tables.append(("Загальна статистика", general_df))
+
+    # По відділам
+    if department_stats:
+        dept_df = pd.DataFrame(department_stats).rename(
+            columns={
+                "department": "Відділ",
+                "product_count": "Кількість товарів",
+                "total_value": "Загальна вартість",
+            }
+        )
+        tables.append(("По відділам", dept_df))
+
+    # Зібране за STATS_PERIOD_DAYS (агрегати пораховані в БД, колонками)
+    for title, columns in (
+        ("Зібране по відділах", collected_departments),
+        ("Зібране по днях", collected_days),
+    ):
+        if columns and next(iter(columns.values())):
+            if "department" in columns:
+                # Артикули, яких немає в каталозі
+                columns = {
+                    **columns,
+                    "department": ["—" if d is None else d for d in columns["department"]],
                 }
+            tables.append(
+                (title, pd.DataFrame(columns).rename(columns=_COLLECTED_SUMMARY_COLUMNS))
             )
-            general_df.to_excel(writer, sheet_name="Загальна статистика", index=False)
-
-            # Лист 2: По відділам
-            if department_stats:
-                dept_df = pd.DataFrame(department_stats)
-                dept_df = dept_df.rename(
-                    columns={
-                        "department": "Відділ",
-                        "product_count": "Кількість товарів",
-                        "total_value": "Загальна вартість",
-                    }
-                )
-                dept_df.to_excel(writer, sheet_name="По відділам", index=False)
-
-        # Відправляємо файл
-        await message.answer_document(
-            FSInputFile(filepath),
-            caption=f"📊 **Статистика системи**\n📅 {datetime.now().strftime('%d.%m.%Y %H:%M')}",
+
+    # Кеші товарів (лічильники процесу бота)
+    cache_df = pd.DataFrame(caches).rename(
+        columns={
+            "cache": "Кеш",
+            "size": "Записів",
+            "maxsize": "Ліміт",
+            "ttl": "TTL, с",
+            "hits": "Влучання",
+            "misses": "Промахи",
+            "evictions": "Витіснення",
+            "expirations": "Прострочені",
+            "hit_rate": "Частка влучань",
+        }
+    )
+    tables.append(("Кеші", cache_df))
+
+    # Пул рендерингу (час у черзі та виконання по типах завдань)
+    if render_jobs:
+        render_df = pd.DataFrame(render_jobs).rename(
+            columns={
+                "job": "Завдання",
+                "count": "Виконано",
+                "failed": "Помилок",
+                "avg_wait_s": "Сер. черга, с",
+                "avg_render_s": "Сер. рендер, с",
+                "max_render_s": "Макс. рендер, с",
+                "last_render_s": "Останній, с",
+            }
         )
+        tables.append(("Рендеринг", render_df))
 
-        # Видаляємо файл
-        os.remove(filepath)
+    return tables
 
-        logger.info("Експортовано статистику")
 
-    except Exception as e:
-        logger.error("Помилка експорту статистики: %s", e, exc_info=True)
-        await message.answer(f"❌ Помилка експорту:\n{str(e)}")
+def _write_statistics_sync(filepath: str, fmt: str, *stats) -> str:
+    """
+    Пише статистику (виконується в пулі рендерингу): xlsx — аркуш на таблицю,
+    csv — таблиці одна за одною, кожна після рядка "# Назва".
+    """
+    tables = _statistics_tables(*stats)
+
+    if fmt == "xlsx":
+        with pd.ExcelWriter(filepath, engine="openpyxl") as writer:
+            for title, df in tables:
+                df.to_excel(writer, sheet_name=title, index=False)
+        return filepath
+
+    with gzip.open(filepath, "wt", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        for title, df in tables:
+            writer.writerow([f"# {title}"])
+            writer.writerow(df.columns)
+            writer.writerows(df.itertuples(index=False))
+            writer.writerow([])
+    return filepath
+
+
+async def _export_statistics(ctx: JobContext, fmt: str):
+    loop = asyncio.get_running_loop()
+
+    # Загальна статистика та статистика по відділам
+    general_stats = await loop.run_in_executor(None, orm_get_general_stats)
+    department_stats = await loop.run_in_executor(None, orm_get_department_stats)
+
+    # Зібране за останні STATS_PERIOD_DAYS днів
+    date_from = datetime.now() - timedelta(days=STATS_PERIOD_DAYS)
+    collected_departments = await loop.run_in_executor(
+        None, orm_get_collected_summary_sync, ("department",), date_from
+    )
+    collected_days = await loop.run_in_executor(
+        None, orm_get_collected_summary_sync, ("day",), date_from
+    )
+
+    filepath = export_path("statistics", fmt)
+    await render_pool.run(
+        "statistics_export",
+        _write_statistics_sync,
+        filepath,
+        fmt,
+        general_stats,
+        department_stats,
+        collected_departments,
+        collected_days,
+        cache_stats(),
+        render_pool.stats(),
+    )
+    await _send_and_remove(
+        ctx,
+        filepath,
+        f"📊 **Статистика системи**\n📅 {datetime.now().strftime('%d.%m.%Y %H:%M')}",
+    )
+    return "✅ Статистику надіслано"
+
+
+_EXPORTERS = {
+    "stock": _export_stock,
+    "collected": _export_collected,
+    "stats": _export_statistics,
+}
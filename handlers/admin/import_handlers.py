@@ -11,14 +11,17 @@ from aiogram import Bot, F, Router
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import FSInputFile, Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
-from sqlalchemy import select, update, func
+from sqlalchemy import select, func
 
 from config import ADMIN_IDS, ARCHIVES_PATH, BACKUP_DIR, DB_NAME, DB_TYPE
 from database.engine import async_session
-from database.models import Product, StockHistory
+from database.models import Product
+from database.orm import StockImportReadError, orm_import_stock
 from keyboards.reply import get_admin_menu_kb
 from keyboards.inline import get_yes_no_kb
-from utils.import_processor import generate_import_preview, process_import_dataframe, read_excel_smart
+from services.job_queue import JobContext, JobError, enqueue_job, job_handler
+from utils.force_save_helper import force_save_all_active_lists
+from utils.import_processor import generate_import_preview, process_excel_stream, read_excel_preview
 from utils.markdown_corrector import format_filename_safe, escape_markdown
 
 # 👇 Імпортуємо константи
@@ -98,30 +101,35 @@ async def process_import_file_with_preview(message: Message, state: FSMContext,
 
     try:
         file = await bot.get_file(document.file_id)
+        # Зберігаємо оригінальне розширення: від нього залежить потокове читання
+        ext = os.path.splitext(document.file_name)[1].lower()
         file_path = os.path.join(
             ARCHIVES_PATH,
-            f"import_temp_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+            f"import_temp_{datetime.now().strftime('%Y%m%d_%H%M%S')}{ext}"
         )
         os.makedirs(ARCHIVES_PATH, exist_ok=True)
         await bot.download_file(file.file_path, file_path)
 
+        # Для прев'ю читається лише початок файлу; весь файл — уже в завданні
         loop = asyncio.get_running_loop()
-        df, header_row_idx = await loop.run_in_executor(None, read_excel_smart, file_path)
+        df, sheet = await loop.run_in_executor(None, read_excel_preview, file_path)
         preview = generate_import_preview(df)
+        header_row_idx = sheet.header_row_index
 
         await state.update_data(
             file_path=file_path,
             filename=document.file_name,
-            total_rows=len(df),
+            total_rows=sheet.total_rows,
             header_row_idx=header_row_idx
         )
         await state.set_state(ImportStates.confirming_preview)
 
+        total_text = f"≈{sheet.total_rows}" if sheet.total_rows is not None else "невідомо"
         preview_text = (
             "👁 **ПРЕВʼЮ ІМПОРТУ**\n\n"
             f"📄 Файл: `{format_filename_safe(document.file_name)}`\n"
             f"📌 Заголовок знайдено на рядку: **{header_row_idx + 1}**\n"
-            f"📊 Рядків даних: {preview.stats['total_rows']}\n"
+            f"📊 Рядків даних: {total_text}\n"
             f"📋 Колонок: {preview.stats['columns_count']}\n\n"
             "🔍 **Розпізнані колонки:**\n"
         )
@@ -162,177 +170,146 @@ async def process_import_file_with_preview(message: Message, state: FSMContext,
 
 @router.callback_query(ImportStates.confirming_preview, F.data == "confirm:import:yes")
 async def confirm_and_import(callback: CallbackQuery, state: FSMContext):
+    """Ставить імпорт у чергу фонових завдань — чат адміна не блокується."""
     await callback.message.delete()
     data = await state.get_data()
     file_path = data.get("file_path")
-    filename = data.get("filename")
-    
+    await state.clear()
+
     if not file_path or not os.path.exists(file_path):
         await callback.message.answer("❌ Файл втрачено.")
-        await state.clear()
+        await callback.answer()
         return
 
-    msg = await callback.message.answer("💾 Бекап...")
+    await enqueue_job(
+        callback.message,
+        "stock_import",
+        {
+            "file_path": file_path,
+            "filename": data.get("filename"),
+            "total_rows": data.get("total_rows"),
+            "temp_files": [file_path],
+        },
+        "Імпорт залишків",
+    )
+    await callback.answer()
+
+
+@job_handler("stock_import")
+async def run_stock_import_job(ctx: JobContext) -> str:
+    """Фонове завдання імпорту: бекап, синхронізація порціями, зведений звіт."""
+    file_path = ctx.payload["file_path"]
+    filename = ctx.payload.get("filename") or os.path.basename(file_path)
+    total_rows = ctx.payload.get("total_rows") or 0
+
+    if not os.path.exists(file_path):
+        raise JobError("Файл втрачено.")
+
+    # Кошики зберігаються за старими залишками, до імпорту
+    def on_force_save(stage: str, done: int, total: int) -> None:
+        if stage == "send":
+            ctx.report(2, f"💾 Примусове збереження списків: {done}/{total}")
+
+    ctx.report(2, "💾 Примусове збереження списків...")
+    force_save = await force_save_all_active_lists(ctx.bot, on_force_save)
+
+    ctx.report(5, "💾 Бекап...")
     await create_backup_before_import()
-    await msg.edit_text("📊 СИНХРОНІЗАЦІЯ БАЗИ...")
-    
+    ctx.report(10, "📊 Синхронізація бази...")
+
+    # --- ІМПОРТ (потоково, порціями) ---
+    chunks, validation = process_excel_stream(file_path)
+
+    def tracked_chunks():
+        # Порції читаються в executor — прогрес лише записуємо в ctx.
+        # total_rows — оцінка за розміром аркуша, тож відсоток обмежуємо
+        for chunk in chunks:
+            read = f"📊 Прочитано рядків: {validation.total_rows}"
+            if total_rows:
+                ctx.report(10 + 70 * min(validation.total_rows, total_rows) // total_rows, read)
+            else:
+                ctx.report(10, read)
+            yield chunk
+        ctx.report(80, "💾 Запис у базу...")
+
     try:
-        loop = asyncio.get_running_loop()
-        df, _ = await loop.run_in_executor(None, read_excel_smart, file_path)
-        processed_df, validation = await loop.run_in_executor(
-            None, process_import_dataframe, df, None
-        )
+        stats = await orm_import_stock(tracked_chunks(), change_source="import")
+    except StockImportReadError as e:
+        raise JobError(f"Помилка читання файлу:\n{str(e)[:200]}") from e
 
-        if not validation.is_valid:
-            error_text = "\n".join(validation.errors[:10])
-            await msg.edit_text(f"❌ Валідація не пройшла!\n\n{error_text}")
-            if os.path.exists(file_path): os.remove(file_path)
-            await state.clear()
-            return
-
-        # --- ІМПОРТ ---
-        added, updated, deactivated, reactivated, zero_qty = 0, 0, 0, 0, 0
-        file_articles = set()
-
-        async with async_session() as session:
-            # Отримуємо всі активні з БД
-            res_all = await session.execute(select(Product.артикул).where(Product.активний == True))
-            db_active_articles = set(res_all.scalars().all())
-
-            for _, row in processed_df.iterrows():
-                try:
-                    art = str(row["артикул"])
-                    file_articles.add(art)
-                    qty_str = str(row["кількість"]).replace('.', ',')
-                    price_float = float(row["ціна"]) if row["ціна"] is not None else 0.0
-                    
-                    try:
-                        if float(str(row["кількість"]).replace(",", ".")) == 0: zero_qty += 1
-                    except: pass
-
-                    res = await session.execute(select(Product).where(Product.артикул == art))
-                    existing = res.scalar_one_or_none()
-
-                    if existing:
-                        if not existing.активний:
-                            existing.активний = True
-                            reactivated += 1
-                        
-                        if existing.кількість != qty_str:
-                            hist = StockHistory(
-                                product_id=existing.id, articul=art,
-                                old_quantity=existing.кількість, new_quantity=qty_str,
-                                change_source="import"
-                            )
-                            session.add(hist)
-                        
-                        existing.кількість = qty_str
-                        
-                        # Часткове оновлення полів
-                        if row["ціна"] is not None: existing.ціна = price_float
-                        if row["сума_залишку"] is not None: existing.сума_залишку = float(row["сума_залишку"])
-                        if row["місяці_без_руху"] is not None: existing.місяці_без_руху = int(row["місяці_без_руху"])
-                        if row["назва"]: existing.назва = row["назва"]
-                        if row["група"]: existing.група = row["група"]
-                        if row["відділ"]: existing.відділ = row["відділ"]
-                        
-                        updated += 1
-                    else:
-                        new_p = Product(
-                            артикул=art, назва=row["назва"] or "Без назви", 
-                            відділ=row["відділ"] or 0, група=row["група"] or "",
-                            кількість=qty_str, ціна=price_float,
-                            сума_залишку=float(row["сума_залишку"]) if row["сума_залишку"] else 0.0,
-                            місяці_без_руху=int(row["місяці_без_руху"]) if row["місяці_без_руху"] else 0,
-                            відкладено=0, активний=True
-                        )
-                        session.add(new_p)
-                        added += 1
-                except: pass
-
-            # Деактивація
-            to_deact = db_active_articles - file_articles
-            if to_deact:
-                await session.execute(
-                    update(Product).where(Product.артикул.in_(to_deact)).values(активний=False)
-                )
-                deactivated = len(to_deact)
-
-            await session.commit()
-
-            # --- 📊 ГЕНЕРАЦІЯ ЗВЕДЕНОГО ЗВІТУ ПО СКЛАДУ ---
-            
-            # Загальні показники
-            total_items_query = await session.execute(
-                select(func.count(Product.id)).where(Product.активний == True)
-            )
-            total_items = total_items_query.scalar_one()
+    if not validation.is_valid:
+        error_text = "\n".join(validation.errors[:10])
+        raise JobError(f"Валідація не пройшла!\n\n{error_text}")
 
-            total_value_query = await session.execute(
-                select(func.sum(Product.сума_залишку)).where(Product.активний == True)
-            )
-            total_value = total_value_query.scalar_one() or 0.0
-
-            # По відділах
-            dept_stats_query = await session.execute(
-                select(
-                    Product.відділ,
-                    func.count(Product.id),
-                    func.sum(Product.сума_залишку)
-                )
-                .where(Product.активний == True)
-                .group_by(Product.відділ)
-                .order_by(Product.відділ)
-            )
-            dept_stats = dept_stats_query.all()
-
-        if os.path.exists(file_path): os.remove(file_path)
-
-        # Форматування чисел
-        def fmt(num):
-            return f"{num:,.0f}".replace(",", " ")
-
-        # --- СТВОРЕННЯ КРАСИВОГО ЗВІТУ ---
-        report_text = (
-            f"✅ **СИНХРОНІЗАЦІЮ ЗАВЕРШЕНО!**\n"
-            f"📄 Файл: `{format_filename_safe(filename)}`\n\n"
-            f"➕ Додано нових: {added}\n"
-            f"🔄 Оновлено: {updated - reactivated}\n"
-            f"♻️ Відновлено: {reactivated}\n"
-            f"🔴 Деактивовано: {deactivated}\n"
-            f"⚠️ Нульових: {zero_qty}\n"
-            "━━━━━━━━━━━━━━━━━━━━━━\n"
-            f"📊 **СТАН СКЛАДУ**\n\n"
-            f"Всього товарів: **{fmt(total_items)}** (активні)\n"
-            f"Загальна вартість: **{fmt(total_value)} грн**\n"
-            "━━━━━━━━━━━━━━━━━━━━━━\n"
-            "📍 **ПО ВІДДІЛАХ:**\n\n"
+    ctx.report(95, "📊 Зведений звіт...")
+    report = await _build_import_report(filename, stats)
+    if force_save.users:
+        report = f"{force_save.text()}\n\n{report}"
+    return report
+
+
+async def _build_import_report(filename: str, stats: dict) -> str:
+    async with async_session() as session:
+        # --- 📊 ГЕНЕРАЦІЯ ЗВЕДЕНОГО ЗВІТУ ПО СКЛАДУ ---
+
+        # Загальні показники
+        total_items_query = await session.execute(
+            select(func.count(Product.id)).where(Product.активний == True)
         )
+        total_items = total_items_query.scalar_one()
 
-        for dept_code, count, value in dept_stats:
-            val = value or 0
-            # Отримуємо назву та емодзі з констант
-            dept_name = DEPARTMENTS.get(dept_code, str(dept_code))
-            emoji = DEPARTMENT_EMOJIS.get(dept_code, "📦")
-            
-            # Якщо назва довга, обрізаємо або скорочуємо для краси
-            if len(dept_name) > 20: dept_name = dept_name[:19] + "…"
+        total_value_query = await session.execute(
+            select(func.sum(Product.сума_залишку)).where(Product.активний == True)
+        )
+        total_value = total_value_query.scalar_one() or 0.0
+
+        # По відділах
+        dept_stats_query = await session.execute(
+            select(
+                Product.відділ,
+                func.count(Product.id),
+                func.sum(Product.сума_залишку)
+            )
+            .where(Product.активний == True)
+            .group_by(Product.відділ)
+            .order_by(Product.відділ)
+        )
+        dept_stats = dept_stats_query.all()
+
+    # Форматування чисел
+    def fmt(num):
+        return f"{num:,.0f}".replace(",", " ")
+
+    # --- СТВОРЕННЯ КРАСИВОГО ЗВІТУ ---
+    report_text = (
+        f"✅ **СИНХРОНІЗАЦІЮ ЗАВЕРШЕНО!**\n"
+        f"📄 Файл: `{format_filename_safe(filename)}`\n\n"
+        f"➕ Додано нових: {stats['added']}\n"
+        f"🔄 Оновлено: {stats['updated'] - stats['reactivated']}\n"
+        f"♻️ Відновлено: {stats['reactivated']}\n"
+        f"🔴 Деактивовано: {stats['deactivated']}\n"
+        f"⚠️ Нульових: {stats['zero']}\n"
+        "━━━━━━━━━━━━━━━━━━━━━━\n"
+        f"📊 **СТАН СКЛАДУ**\n\n"
+        f"Всього товарів: **{fmt(total_items)}** (активні)\n"
+        f"Загальна вартість: **{fmt(total_value)} грн**\n"
+        "━━━━━━━━━━━━━━━━━━━━━━\n"
+        "📍 **ПО ВІДДІЛАХ:**\n\n"
+    )
 
-            report_text += f"{emoji} **{dept_name}**\n   └ {count} арт. | **{fmt(val)} грн**\n"
+    for dept_code, count, value in dept_stats:
+        val = value or 0
+        # Отримуємо назву та емодзі з констант
+        dept_name = DEPARTMENTS.get(dept_code, str(dept_code))
+        emoji = DEPARTMENT_EMOJIS.get(dept_code, "📦")
 
-        report_text += "━━━━━━━━━━━━━━━━━━━━━━"
+        # Якщо назва довга, обрізаємо або скорочуємо для краси
+        if len(dept_name) > 20: dept_name = dept_name[:19] + "…"
 
-        await msg.edit_text(report_text)
-        await state.clear()
-        await callback.answer()
+        report_text += f"{emoji} **{dept_name}**\n   └ {count} арт. | **{fmt(val)} грн**\n"
 
-    except Exception as e:
-        logger.error("Import error: %s", e, exc_info=True)
-        await msg.delete()
-        await callback.message.answer(f"❌ Помилка: {e}")
-        if os.path.exists(file_path): os.remove(file_path)
-        await state.clear()
-        await callback.answer()
+    report_text += "━━━━━━━━━━━━━━━━━━━━━━"
+    return report_text
 
 @router.callback_query(ImportStates.confirming_preview, F.data == "confirm:import:no")
 async def cancel_import(callback: CallbackQuery, state: FSMContext):
@@ -3,18 +3,26 @@
 import asyncio
 import logging
 import os
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Dict, Optional
 
 import pandas as pd
 from aiogram import Bot, F, Router
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import FSInputFile, Message
+from sqlalchemy import String, cast, func, select
 
-from config import ADMIN_IDS, ARCHIVES_PATH
-from database.engine import sync_session
+from config import ADMIN_IDS, ARCHIVES_PATH, REPORT_SNAPSHOTS_PATH
+from database.engine import async_session, sync_session
 from database.models import Product
+from database.orm.product_cache import catalog_imports, catalog_version
 from keyboards.reply import get_admin_menu_kb
+from services.job_queue import JobContext, JobError, enqueue_job, job_handler
+from utils.exporters import export_path, write_rows
+from utils.render_pool import render_pool
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -25,69 +33,197 @@ class AdminReportStates(StatesGroup):
 
 
 # ==============================================================================
-# 📊 ГЕНЕРАЦІЯ ЗВІТУ ПО ЗАЛИШКАХ (СИНХРОННА)
+# 📊 ГЕНЕРАЦІЯ ЗВІТУ ПО ЗАЛИШКАХ
 # ==============================================================================
 
 
-def _create_stock_report_sync() -> str:
+# Колонки звіту: заголовок → вираз Core select()
+_STOCK_REPORT_COLUMNS = (
+    ("Артикул", Product.артикул),
+    ("Назва", Product.назва),
+    ("Відділ", Product.відділ),
+    ("Група", Product.група),
+    ("Кількість", Product.кількість),
+    ("Відкладено", func.coalesce(Product.відкладено, 0)),
+    ("Ціна", func.coalesce(Product.ціна, 0.0)),
+    ("Сума залишку", func.coalesce(Product.сума_залишку, 0.0)),
+    ("Місяці без руху", func.coalesce(Product.місяці_без_руху, 0)),
+)
+STOCK_REPORT_YIELD_PER = 2000
+
+
+def _write_stock_report_sync(filepath: str, fmt: str = "xlsx") -> int:
+    """
+    СИНХРОННИЙ потоковий звіт по залишках (виконується в пулі рендерингу):
+    рядки Core select() ідуть курсором пачками по STOCK_REPORT_YIELD_PER
+    прямо у файл (xlsx/csv.gz/parquet), без ORM-об'єктів і DataFrame.
+    Для xlsx ширина колонок — за max(length()) з БД, як в автоширині
+    excel_renderer. Повертає кількість товарів у звіті.
     """
-    СИНХРОННА функція для генерації звіту по залишках.
-    Використовується в executor.
+    headers = [header for header, _ in _STOCK_REPORT_COLUMNS]
+    columns = [expr for _, expr in _STOCK_REPORT_COLUMNS]
+    active = Product.активний == True
+
+    with sync_session() as session:
+        widths = None
+        if fmt == "xlsx":
+            widths = session.execute(
+                select(
+                    *(func.max(func.length(cast(expr, String))) for expr in columns)
+                ).where(active)
+            ).one()
+            widths = [max(w or 0, len(h)) for w, h in zip(widths, headers)]
+
+        result = session.execute(
+            select(*columns)
+            .where(active)
+            .order_by(Product.відділ, Product.артикул)
+            .execution_options(yield_per=STOCK_REPORT_YIELD_PER)
+        )
+        rows = (tuple(row) for row in result)
+        return write_rows(fmt, filepath, headers, rows, widths, sheet_name="Залишки")
+
+
+async def create_stock_report(
+    fmt: str = "xlsx", directory: str = ARCHIVES_PATH
+) -> Optional[str]:
+    """
+    Звіт по залишках у пулі рендерингу.
 
     Returns:
         Шлях до створеного файлу або None
     """
     try:
-        with sync_session() as session:
-            # Отримуємо всі активні товари
-            from sqlalchemy import select
-
-            result = session.execute(
-                select(Product)
-                .where(Product.активний == True)
-                .order_by(Product.відділ, Product.артикул)
-            )
-            products = result.scalars().all()
-
-            if not products:
-                logger.warning("Немає товарів для експорту")
-                return None
-
-            # Формуємо DataFrame
-            data = []
-            for product in products:
-                data.append(
-                    {
-                        "Артикул": product.артикул,
-                        "Назва": product.назва,
-                        "Відділ": product.відділ,
-                        "Група": product.група,
-                        "Кількість": product.кількість,
-                        "Відкладено": product.відкладено or 0,
-                        "Ціна": product.ціна or 0.0,
-                        "Сума залишку": product.сума_залишку or 0.0,
-                        "Місяці без руху": product.місяці_без_руху or 0,
-                    }
-                )
+        filepath = export_path("stock_report", fmt, directory)
+
+        count = await render_pool.run("stock_report", _write_stock_report_sync, filepath, fmt)
+        if not count:
+            logger.warning("Немає товарів для експорту")
+            os.remove(filepath)
+            return None
+
+        logger.info(
+            "Створено звіт по залишках: %s (%s товарів)", os.path.basename(filepath), count
+        )
+        return filepath
+
+    except Exception as e:
+        logger.error("Помилка створення звіту по залишках: %s", e, exc_info=True)
+        return None
 
-            df = pd.DataFrame(data)
 
-            # Створюємо файл
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"stock_report_{timestamp}.xlsx"
-            filepath = os.path.join(ARCHIVES_PATH, filename)
-            os.makedirs(ARCHIVES_PATH, exist_ok=True)
+# ==============================================================================
+# 🗂 ЗНІМКИ ЗВІТУ ПО ЗАЛИШКАХ
+# ==============================================================================
+
+# Формати, які рендеряться наперед після імпорту залишків
+PRERENDER_FORMATS = ("xlsx",)
+
+
+@dataclass
+class StockReportSnapshot:
+    """Готовий файл звіту по залишках для певної версії каталогу."""
+
+    version: tuple
+    path: str
+    created_at: datetime
+    # file_id Telegram після першого надсилання (повторно файл не вивантажується)
+    file_id: Optional[str] = None
+    # Скільки надсилань файлу зараз триває; замінений знімок (retired)
+    # видаляється, коли завершиться останнє
+    users: int = 0
+    retired: bool = False
+
+
+def _remove_snapshot_file(snapshot: StockReportSnapshot) -> None:
+    if os.path.exists(snapshot.path):
+        os.remove(snapshot.path)
+
 
-            df.to_excel(filepath, index=False, engine="openpyxl")
+_snapshots: Dict[str, StockReportSnapshot] = {}
+_snapshot_locks: Dict[str, asyncio.Lock] = {}
+_prerendered_imports = 0
 
+
+async def _catalog_fingerprint() -> tuple:
+    """
+    Версія каталогу: лічильник змін у цьому процесі + відбиток БД
+    (max(updated_at) і кількість товарів) для змін з інших процесів.
+    """
+    async with async_session() as session:
+        row = (
+            await session.execute(select(func.max(Product.updated_at), func.count(Product.id)))
+        ).one()
+    return (catalog_version(), *row)
+
+
+async def get_stock_report_snapshot(fmt: str = "xlsx") -> Optional[StockReportSnapshot]:
+    """
+    Звіт по залишках для поточної версії каталогу. Якщо каталог не змінився
+    з останнього рендерингу, повертає готовий знімок; інакше рендерить
+    новий (для кожного формату — не більше одного рендерингу одночасно).
+    """
+    lock = _snapshot_locks.setdefault(fmt, asyncio.Lock())
+    async with lock:
+        version = await _catalog_fingerprint()
+        snapshot = _snapshots.get(fmt)
+        if snapshot and snapshot.version == version and os.path.exists(snapshot.path):
             logger.info(
-                "Створено звіт по залишках: %s (%s товарів)", filename, len(products)
+                "Звіт по залишках (%s) зі знімка від %s",
+                fmt,
+                snapshot.created_at.strftime("%d.%m.%Y %H:%M:%S"),
             )
-            return filepath
+            return snapshot
 
-    except Exception as e:
-        logger.error("Помилка створення звіту по залишках: %s", e, exc_info=True)
-        return None
+        path = await create_stock_report(fmt, REPORT_SNAPSHOTS_PATH)
+        if not path:
+            return None
+
+        _snapshots[fmt] = StockReportSnapshot(version, path, datetime.now())
+        if snapshot and snapshot.path != path:
+            snapshot.retired = True
+            if not snapshot.users:
+                _remove_snapshot_file(snapshot)
+        return _snapshots[fmt]
+
+
+@asynccontextmanager
+async def use_stock_report_snapshot(fmt: str = "xlsx"):
+    """
+    get_stock_report_snapshot для надсилання: поки блок виконується, файл
+    знімка не видаляється, навіть якщо інший запит уже відрендерив новий.
+    """
+    snapshot = await get_stock_report_snapshot(fmt)
+    if snapshot is None:
+        yield None
+        return
+    snapshot.users += 1
+    try:
+        yield snapshot
+    finally:
+        snapshot.users -= 1
+        if snapshot.retired and not snapshot.users:
+            _remove_snapshot_file(snapshot)
+
+
+async def prerender_stock_report() -> None:
+    """
+    Завдання планувальника: після кожного завершеного імпорту залишків
+    наперед рендерить звіт (PRERENDER_FORMATS), щоб запит адміна отримав
+    готовий файл.
+    """
+    global _prerendered_imports
+    imports = catalog_imports()
+    if imports == _prerendered_imports:
+        return
+    _prerendered_imports = imports
+
+    for fmt in PRERENDER_FORMATS:
+        try:
+            if await get_stock_report_snapshot(fmt):
+                logger.info("Звіт по залишках (%s) відрендерено після імпорту", fmt)
+        except Exception as e:
+            logger.error("Помилка попереднього рендерингу звіту (%s): %s", fmt, e, exc_info=True)
 
 
 # ==============================================================================
@@ -98,7 +234,8 @@ def _create_stock_report_sync() -> str:
 @router.message(AdminReportStates.waiting_for_subtract_file, F.document)
 async def process_subtract_file(message: Message, state: FSMContext, bot: Bot):
     """
-    Обробляє файл з зібраними товарами та віднімає їх від залишків.
+    Приймає файл з зібраними товарами і ставить віднімання від залишків
+    у чергу фонових завдань.
     """
     if message.from_user.id not in ADMIN_IDS:
         return
@@ -109,8 +246,6 @@ async def process_subtract_file(message: Message, state: FSMContext, bot: Bot):
         await message.answer("❌ Невірний формат. Надішліть Excel файл (.xlsx)")
         return
 
-    msg = await message.answer("⏳ Обробка файлу...")
-
     try:
         # Завантажуємо файл
         file = await bot.get_file(document.file_id)
@@ -121,113 +256,122 @@ async def process_subtract_file(message: Message, state: FSMContext, bot: Bot):
 
         await bot.download_file(file.file_path, file_path)
 
-        # Читаємо Excel
-        loop = asyncio.get_running_loop()
-        df = await loop.run_in_executor(None, pd.read_excel, file_path)
+    except Exception as e:
+        logger.error("Помилка завантаження файлу зібраного: %s", e, exc_info=True)
+        await message.answer(f"❌ Помилка завантаження файлу:\n{str(e)}")
+        await state.clear()
+        return
+
+    await state.clear()
+    # Віднімання не ідемпотентне — без повторів
+    await enqueue_job(
+        message,
+        "stock_subtract",
+        {"file_path": file_path, "temp_files": [file_path]},
+        "Імпорт зібраного",
+        max_attempts=1,
+    )
 
-        # Перевірка колонок
-        if "Артикул" not in df.columns or "Кількість" not in df.columns:
-            await msg.edit_text(
-                "❌ У файлі мають бути колонки: **Артикул** та **Кількість**"
-            )
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            await state.clear()
-            return
 
-        # Віднімаємо від залишків
-        from sqlalchemy import select
+@job_handler("stock_subtract")
+async def run_subtract_job(ctx: JobContext) -> str:
+    """Фонове завдання: віднімає зібрані товари з файлу від залишків."""
+    file_path = ctx.payload["file_path"]
+    if not os.path.exists(file_path):
+        raise JobError("Файл втрачено.")
+
+    # Читаємо Excel
+    ctx.report(5, "📄 Читання файлу...")
+    loop = asyncio.get_running_loop()
+    df = await loop.run_in_executor(None, pd.read_excel, file_path)
+
+    # Перевірка колонок
+    if "Артикул" not in df.columns or "Кількість" not in df.columns:
+        raise JobError("У файлі мають бути колонки: Артикул та Кількість")
+
+    # Віднімаємо від залишків
+    from database.models import StockHistory
+    from database.orm.product_cache import catalog_changed, invalidate_products
+
+    updated_count = 0
+    updated_ids = []
+    not_found = []
+    errors = []
+
+    ctx.report(10, "📉 Віднімання від залишків...")
+    async with async_session() as session:
+        for index, row in df.iterrows():
+            ctx.report(10 + 85 * index // max(len(df), 1))
+            try:
+                article = str(row["Артикул"]).strip()
+                quantity_to_subtract = float(
+                    str(row["Кількість"]).replace(",", ".")
+                )
 
-        from database.engine import async_session
-        from database.models import StockHistory
+                # Шукаємо товар
+                result = await session.execute(
+                    select(Product).where(Product.артикул == article)
+                )
+                product = result.scalar_one_or_none()
 
-        updated_count = 0
-        not_found = []
-        errors = []
+                if not product:
+                    not_found.append(article)
+                    continue
 
-        async with async_session() as session:
-            for index, row in df.iterrows():
+                # Парсимо поточну кількість
                 try:
-                    article = str(row["Артикул"]).strip()
-                    quantity_to_subtract = float(
-                        str(row["Кількість"]).replace(",", ".")
-                    )
-
-                    # Шукаємо товар
-                    result = await session.execute(
-                        select(Product).where(Product.артикул == article)
-                    )
-                    product = result.scalar_one_or_none()
-
-                    if not product:
-                        not_found.append(article)
-                        continue
-
-                    # Парсимо поточну кількість
-                    try:
-                        current_qty = float(str(product.кількість).replace(",", "."))
-                    except ValueError:
-                        errors.append(f"{article}: невірний формат кількості")
-                        continue
-
-                    # Віднімаємо
-                    new_qty = max(0, current_qty - quantity_to_subtract)
-                    old_qty_str = product.кількість
-                    product.кількість = str(new_qty).replace(".", ",")
-
-                    # Записуємо в історію
-                    history = StockHistory(
-                        product_id=product.id,
-                        articul=article,
-                        old_quantity=old_qty_str,
-                        new_quantity=product.кількість,
-                        change_source="user_list",
-                    )
-                    session.add(history)
-
-                    updated_count += 1
-
-                except Exception as row_error:
-                    errors.append(f"Рядок {index + 2}: {str(row_error)}")
-                    logger.error("Помилка обробки рядка %s: %s", index + 2, row_error)
-
-            await session.commit()
-
-        # Видаляємо тимчасовий файл
-        if os.path.exists(file_path):
-            os.remove(file_path)
-
-        # Результат
-        result_text = (
-            f"✅ **Імпорт зібраного завершено!**\n\n"
-            f"🔄 Оновлено товарів: **{updated_count}**"
-        )
+                    current_qty = float(str(product.кількість).replace(",", "."))
+                except ValueError:
+                    errors.append(f"{article}: невірний формат кількості")
+                    continue
+
+                # Віднімаємо
+                new_qty = max(0, current_qty - quantity_to_subtract)
+                old_qty_str = product.кількість
+                product.кількість = str(new_qty).replace(".", ",")
+
+                # Записуємо в історію
+                history = StockHistory(
+                    product_id=product.id,
+                    articul=article,
+                    old_quantity=old_qty_str,
+                    new_quantity=product.кількість,
+                    change_source="user_list",
+                )
+                session.add(history)
 
-        if not_found:
-            result_text += f"\n❌ Не знайдено: **{len(not_found)}**"
-            if len(not_found) <= 5:
-                result_text += "\n• " + "\n• ".join(not_found[:5])
+                updated_count += 1
+                updated_ids.append(product.id)
 
-        if errors:
-            result_text += f"\n⚠️ Помилок: **{len(errors)}**"
+            except Exception as row_error:
+                errors.append(f"Рядок {index + 2}: {str(row_error)}")
+                logger.error("Помилка обробки рядка %s: %s", index + 2, row_error)
 
-        await msg.edit_text(result_text)
-        await state.clear()
+        await session.commit()
+    invalidate_products(updated_ids)
+    catalog_changed()
 
-        logger.info(
-            "Імпорт зібраного: оновлено %s, не знайдено %s, помилок %s",
-            updated_count,
-            len(not_found),
-            len(errors),
-        )
+    # Результат
+    result_text = (
+        f"✅ **Імпорт зібраного завершено!**\n\n"
+        f"🔄 Оновлено товарів: **{updated_count}**"
+    )
 
-    except Exception as e:
-        logger.error("Критична помилка імпорту зібраного: %s", e, exc_info=True)
-        await msg.edit_text(f"❌ Помилка обробки файлу:\n{str(e)}")
-        await state.clear()
+    if not_found:
+        result_text += f"\n❌ Не знайдено: **{len(not_found)}**"
+        if len(not_found) <= 5:
+            result_text += "\n• " + "\n• ".join(not_found[:5])
 
-        if os.path.exists(file_path):
-            os.remove(file_path)
+    if errors:
+        result_text += f"\n⚠️ Помилок: **{len(errors)}**"
+
+    logger.info(
+        "Імпорт зібраного: оновлено %s, не знайдено %s, помилок %s",
+        updated_count,
+        len(not_found),
+        len(errors),
+    )
+    return result_text
 
 
 @router.message(AdminReportStates.waiting_for_subtract_file)
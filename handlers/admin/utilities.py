@@ -9,12 +9,8 @@ from aiogram import Bot, F, Router
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message, CallbackQuery, FSInputFile
-from aiogram.exceptions import TelegramRetryAfter
-from sqlalchemy import select
 
 from config import ADMIN_IDS, ARCHIVES_PATH
-from database.engine import async_session
-from database.models import User
 # 👇 Імпортуємо константи кнопок!
 from keyboards.reply import (
     get_utilities_menu_kb, 
@@ -25,6 +21,8 @@ from keyboards.reply import (
     BTN_UTIL_CLEAN_DB
 )
 from keyboards.inline import get_yes_no_kb
+from services.broadcast import broadcaster
+from services.job_queue import JobContext, JobError, enqueue_job, job_handler
 from utils.import_processor import process_import_dataframe, generate_import_preview, read_excel_smart, detect_columns
 
 logger = logging.getLogger(__name__)
@@ -66,50 +64,24 @@ async def process_broadcast(message: Message, state: FSMContext):
 
 @router.callback_query(UtilityStates.waiting_broadcast_message, F.data == "confirm:broadcast:yes")
 async def confirm_broadcast(callback: CallbackQuery, state: FSMContext, bot: Bot):
+    """Ставить розсилку в чергу фонових завдань; прогрес оновлюється в повідомленні."""
     data = await state.get_data()
     text = data.get("broadcast_text")
-    
+    await state.clear()
+
     await callback.message.delete()
-    msg = await callback.message.answer("⏳ Розсилка розпочата...")
-    
-    success = 0
-    blocked = 0
-    error = 0
-    
-    try:
-        async with async_session() as session:
-            result = await session.execute(select(User))
-            users = result.scalars().all()
-        
-        for user in users:
-            try:
-                await bot.send_message(user.id, text)
-                success += 1
-                await asyncio.sleep(0.05)
-            except TelegramRetryAfter as e:
-                await asyncio.sleep(e.retry_after)
-                try:
-                    await bot.send_message(user.id, text)
-                    success += 1
-                except: error += 1
-            except Exception as e:
-                if "blocked" in str(e).lower():
-                    blocked += 1
-                else:
-                    error += 1
-        
-        await msg.edit_text(
-            f"✅ **Розсилка завершена!**\n\n"
-            f"📨 Надіслано: {success}\n"
-            f"🚫 Заблоковано: {blocked}\n"
-            f"❌ Помилок: {error}"
-        )
-    except Exception as e:
-        logger.error("Broadcast error: %s", e)
-        await msg.edit_text(f"❌ Помилка: {e}")
-    finally:
-        await state.clear()
-        await callback.answer()
+    # Одна спроба: повтор розіслав би повідомлення вдруге
+    await enqueue_job(callback.message, "broadcast", {"text": text}, "Розсилка", max_attempts=1)
+    await callback.answer()
+
+
+@job_handler("broadcast")
+async def run_broadcast_job(ctx: JobContext) -> str:
+    """Фонове завдання розсилки (виконується лише в процесі черги завдань)."""
+    stats = await broadcaster.run(ctx.bot, ctx.payload["text"], ctx.chat_id, ctx.message_id)
+    if stats is None:
+        raise JobError("Розсилка не виконана: попередня ще триває або сталася помилка.")
+    return stats.text(finished=True)
 
 @router.callback_query(UtilityStates.waiting_broadcast_message, F.data == "confirm:broadcast:no")
 async def cancel_broadcast(callback: CallbackQuery, state: FSMContext):
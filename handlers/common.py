@@ -40,6 +40,8 @@ async def cmd_start(message: Message, state: FSMContext):
                 # Оновлюємо дані існуючого користувача
                 result.username = username
                 result.first_name = first_name
+                # Користувач знову з нами — отримуватиме розсилки
+                result.blocked_at = None
                 logger.info("Оновлено дані користувача: %s (@%s)", user_id, username)
             else:
                 # Створюємо нового користувача
@@ -1,30 +1,27 @@
 # epicservice/handlers/menu_navigation.py
 
-import asyncio
 import logging
 import os
-from datetime import datetime
 
-import pandas as pd
 from aiogram import Bot, F, Router
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import FSInputFile, Message, CallbackQuery
 
 # --- Імпорти конфігурації та БД ---
-from config import ADMIN_IDS, ARCHIVES_PATH
+from config import ADMIN_IDS
 from database.engine import async_session
 from database.orm import (
     orm_clear_temp_list,
-    orm_get_all_collected_items_sync,
     orm_get_temp_list,
     orm_get_user_lists_archive,
 )
 from handlers.admin.archive_handlers import _pack_user_files_to_zip
+from handlers.admin.export_handlers import ask_export_format
 
 # --- Імпорти логіки ---
 from handlers.admin.import_handlers import proceed_with_import
-from handlers.admin.report_handlers import AdminReportStates, _create_stock_report_sync
+from handlers.admin.report_handlers import AdminReportStates
 from handlers.user.list_editing import ListEditingStates, show_list_in_edit_mode
 
 # --- Імпорти клавіатур ---
@@ -240,15 +237,16 @@ async def edit_list_trigger(message: Message, state: FSMContext, bot: Bot):
 @router.message(F.text == BTN_DOWNLOAD_ALL)
 async def download_all_archives(message: Message):
     msg = await message.answer("⏳ Пакую всі ваші файли в архів...")
-    zip_path = await _pack_user_files_to_zip(message.from_user.id)
+    user_zip = await _pack_user_files_to_zip(message.from_user.id)
 
-    if zip_path:
-        await message.answer_document(
-            FSInputFile(zip_path), caption="📦 Ваша повна історія списків"
+    if user_zip:
+        # ZIP кешований до зміни набору архівів — файл не видаляємо
+        sent = await message.answer_document(
+            user_zip.file_id or FSInputFile(user_zip.path, filename=user_zip.filename),
+            caption="📦 Ваша повна історія списків",
         )
+        user_zip.file_id = sent.document.file_id
         await msg.delete()
-        if os.path.exists(zip_path):
-            os.remove(zip_path)
     else:
         await msg.edit_text("❌ Архів порожній або сталася помилка.")
 
@@ -296,42 +294,11 @@ async def admin_import_trigger(message: Message, state: FSMContext, bot: Bot):
 
 @router.message(F.text == BTN_EXPORT_STOCK)
 async def admin_export_stock(message: Message):
-    await message.answer("📤 Експортую залишки...")
-    loop = asyncio.get_running_loop()
-    report_path = await loop.run_in_executor(None, _create_stock_report_sync)
-
-    if report_path:
-        await message.answer_document(
-            FSInputFile(report_path), caption="📊 Звіт по залишках"
-        )
-        if os.path.exists(report_path):
-            os.remove(report_path)
-    else:
-        await message.answer("❌ Помилка створення звіту.")
+    await ask_export_format(message, "stock")
 
 @router.message(F.text == BTN_EXPORT_COLLECTED)
 async def admin_export_collected(message: Message):
-    await message.answer("📋 Формую звіт по зібраному...")
-    loop = asyncio.get_running_loop()
-    items = await loop.run_in_executor(None, orm_get_all_collected_items_sync)
-
-    if not items:
-        await message.answer("📭 Зібраних товарів ще немає.")
-        return
-
-    df = pd.DataFrame(items)
-    df.rename(
-        columns={"name": "Назва", "quantity": "Кількість", "department": "Відділ", "group": "Група"},
-        inplace=True,
-    )
-    filename = f"collected_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
-    path = os.path.join(ARCHIVES_PATH, filename)
-    os.makedirs(ARCHIVES_PATH, exist_ok=True)
-    await loop.run_in_executor(None, lambda: df.to_excel(path, index=False))
-
-    await message.answer_document(FSInputFile(path), caption="📋 Зібрані товари")
-    if os.path.exists(path):
-        os.remove(path)
+    await ask_export_format(message, "collected")
 
 @router.message(F.text == BTN_IMPORT_COLLECTED)
 async def admin_import_collected_trigger(message: Message, state: FSMContext):
@@ -2,21 +2,20 @@
 
 import logging
 from contextlib import suppress
+from typing import Optional
 
 from aiogram import Bot, F, Router
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, Message
-from sqlalchemy import select, func, and_
 
 from config import ADMIN_IDS
-from database.engine import async_session
-from database.models import TempList
 from database.orm import (
+    ProductCardView,
     orm_add_item_to_temp_list,
-    orm_get_product_by_id,
-    orm_get_temp_list_department,
+    orm_get_product_card,
+    orm_get_product_card_view,
 )
 from keyboards.inline import get_product_inline_kb
 from keyboards.reply import get_main_menu_kb
@@ -32,41 +31,27 @@ class ItemAdditionStates(StatesGroup):
 # 🛠 ДОПОМІЖНІ ФУНКЦІЇ
 # ==============================================================================
 
-async def _get_product_data(user_id: int, product_id: int):
-    """
-    Збирає всі дані про товар в ОДНІЙ сесії.
-    """
-    async with async_session() as session:
-        product = await orm_get_product_by_id(session, product_id)
-        if not product:
-            return None
-
-        # Резерви (глобальні)
-        res_reserved = await session.execute(
-            select(func.sum(TempList.quantity)).where(TempList.product_id == product_id)
-        )
-        total_reserved = res_reserved.scalar_one_or_none()
-        temp_reserved = int(total_reserved) if total_reserved else 0
-
-        # У кошику користувача
-        res_cart = await session.execute(
-            select(TempList).where(
-                and_(TempList.user_id == user_id, TempList.product_id == product_id)
-            )
-        )
-        cart_item = res_cart.scalar_one_or_none()
-        in_cart = cart_item.quantity if cart_item else 0
+def _wrong_department(card: ProductCardView) -> bool:
+    """Товар з іншого відділу, ніж уже зібраний список користувача."""
+    return card.cart_department is not None and card.відділ != card.cart_department
+
+
+def _render_card(card: ProductCardView, selected_qty: int) -> str:
+    return format_product_card(
+        card, card.available, card.temp_reserved, card.in_cart,
+        selected_quantity=selected_qty,
+    )
+
 
-        # Доступність
-        try:
-            stock_qty = float(str(product.кількість).replace(",", "."))
-        except ValueError:
-            stock_qty = 0
-            
-        permanently_reserved = product.відкладено or 0
-        available = max(0, int(stock_qty - permanently_reserved - temp_reserved))
+def _card_after_add(card: ProductCardView, added: int, in_cart: int) -> ProductCardView:
+    """Картка після додавання без повторного читання: резерв росте на added."""
+    return card._replace(
+        temp_reserved=card.temp_reserved + added,
+        in_cart=in_cart,
+        cart_department=card.відділ,
+        available=max(0, card.available - added),
+    )
 
-        return product, available, temp_reserved, in_cart
 
 async def update_card_display(
     bot: Bot, 
@@ -74,18 +59,19 @@ async def update_card_display(
     message_id: int, 
     user_id: int, 
     product_id: int, 
-    current_ui_qty: int
+    current_ui_qty: int,
+    card: Optional[ProductCardView] = None,
 ):
-    """Оновлює картку та клавіатуру."""
-    data = await _get_product_data(user_id, product_id)
-    if not data:
+    """
+    Оновлює картку та клавіатуру.
+    Якщо card передано (з кешу карток), БД не запитується.
+    """
+    if card is None:
+        card = await orm_get_product_card(user_id, product_id)
+    if not card:
         return
 
-    product, available, temp_reserved, in_cart = data
-    
-    new_text = format_product_card(
-        product, available, temp_reserved, in_cart, selected_quantity=current_ui_qty
-    )
+    new_text = _render_card(card, current_ui_qty)
     new_kb = get_product_inline_kb(product_id, current_ui_qty)
 
     with suppress(TelegramBadRequest):
@@ -104,19 +90,15 @@ async def start_quantity_selection(message: Message, state: FSMContext, product_
     """Початок вибору."""
     user_id = message.from_user.id
     
-    data = await _get_product_data(user_id, product_id)
-    if not data:
+    card = await orm_get_product_card(user_id, product_id)
+    if not card:
         await message.answer("❌ Товар не знайдено.")
         return
 
-    product, available, temp_reserved, in_cart = data
-    
     # СТАРТ З 0 (як просили)
     start_qty = 0
     
-    text = format_product_card(
-        product, available, temp_reserved, in_cart, selected_quantity=start_qty
-    )
+    text = _render_card(card, start_qty)
     kb = get_product_inline_kb(product_id, current_qty=start_qty)
 
     await message.answer(text, reply_markup=kb)
@@ -131,18 +113,18 @@ async def on_increment(callback: CallbackQuery):
     product_id = int(product_id)
     current_qty = int(current_qty)
     
-    data = await _get_product_data(callback.from_user.id, product_id)
-    if not data: return
-    _, available, _, _ = data
+    # Товарна частина — з кешу карток, кількість — з callback data
+    card = await orm_get_product_card_view(product_id)
+    if not card: return
 
-    if current_qty >= available:
-        await callback.answer(f"⚠️ Доступно лише {available} шт.", show_alert=True)
+    if current_qty >= card.available:
+        await callback.answer(f"⚠️ Доступно лише {card.available} шт.", show_alert=True)
         return
 
     new_qty = current_qty + 1
     await update_card_display(
         callback.bot, callback.message.chat.id, callback.message.message_id,
-        callback.from_user.id, product_id, new_qty
+        callback.from_user.id, product_id, new_qty, card
     )
     await callback.answer() 
 
@@ -158,9 +140,10 @@ async def on_decrement(callback: CallbackQuery):
         return
 
     new_qty = current_qty - 1
+    card = await orm_get_product_card_view(product_id)
     await update_card_display(
         callback.bot, callback.message.chat.id, callback.message.message_id,
-        callback.from_user.id, product_id, new_qty
+        callback.from_user.id, product_id, new_qty, card
     )
     await callback.answer()
 
@@ -178,24 +161,25 @@ async def on_add(callback: CallbackQuery):
         return
 
     # Перевірка відділу
-    async with async_session() as session:
-        product = await orm_get_product_by_id(session, product_id)
-        allowed_dept = await orm_get_temp_list_department(user_id)
-        
-        if allowed_dept is not None and product.відділ != allowed_dept:
-            await callback.answer(
-                f"🚫 Інший відділ! Потрібен {allowed_dept}.", show_alert=True
-            )
-            return
-
-    success = await orm_add_item_to_temp_list(user_id, product_id, qty)
+    card = await orm_get_product_card(user_id, product_id)
+    if not card:
+        await callback.answer("❌ Товар не знайдено.", show_alert=True)
+        return
+
+    if _wrong_department(card):
+        await callback.answer(
+            f"🚫 Інший відділ! Потрібен {card.cart_department}.", show_alert=True
+        )
+        return
+
+    in_cart = await orm_add_item_to_temp_list(user_id, product_id, qty)
     
-    if success:
+    if in_cart is not None:
         await callback.answer(f"✅ Додано {qty} шт.", show_alert=False)
         # Скидаємо селектор на 0 після успішного додавання
         await update_card_display(
             callback.bot, callback.message.chat.id, callback.message.message_id,
-            user_id, product_id, 0
+            user_id, product_id, 0, _card_after_add(card, qty, in_cart)
         )
     else:
         await callback.answer("❌ Помилка додавання", show_alert=True)
@@ -206,26 +190,27 @@ async def on_add_all(callback: CallbackQuery):
     product_id = int(product_id)
     user_id = callback.from_user.id
 
-    data = await _get_product_data(user_id, product_id)
-    if not data: return
-    product, available, _, _ = data
+    card = await orm_get_product_card(user_id, product_id)
+    if not card: return
 
-    if available <= 0:
+    if card.available <= 0:
         await callback.answer("❌ Немає в наявності", show_alert=True)
         return
 
-    allowed_dept = await orm_get_temp_list_department(user_id)
-    if allowed_dept is not None and product.відділ != allowed_dept:
+    if _wrong_department(card):
         await callback.answer(f"🚫 Інший відділ", show_alert=True)
         return
 
-    await orm_add_item_to_temp_list(user_id, product_id, available)
-    await callback.answer(f"✅ Додано все ({available} шт)", show_alert=False)
+    in_cart = await orm_add_item_to_temp_list(user_id, product_id, card.available)
+    if in_cart is None:
+        await callback.answer("❌ Помилка додавання", show_alert=True)
+        return
+    await callback.answer(f"✅ Додано все ({card.available} шт)", show_alert=False)
     
     # Скидаємо на 0
     await update_card_display(
         callback.bot, callback.message.chat.id, callback.message.message_id,
-        user_id, product_id, 0
+        user_id, product_id, 0, _card_after_add(card, card.available, in_cart)
     )
 
 # ==============================================================================
@@ -255,21 +240,21 @@ async def process_manual_qty(message: Message, state: FSMContext):
     product_id = data.get("product_id")
     user_id = message.from_user.id
 
-    data_prod = await _get_product_data(user_id, product_id)
-    if not data_prod: return
-    product, available, _, _ = data_prod
+    card = await orm_get_product_card(user_id, product_id)
+    if not card: return
     
-    allowed_dept = await orm_get_temp_list_department(user_id)
-    if allowed_dept is not None and product.відділ != allowed_dept:
+    if _wrong_department(card):
         await message.answer(f"🚫 Невірний відділ.")
         await state.clear()
         return
 
-    if qty > available:
-        await message.answer(f"⚠️ Недостатньо. Є лише {available} шт.")
+    if qty > card.available:
+        await message.answer(f"⚠️ Недостатньо. Є лише {card.available} шт.")
         return
 
-    await orm_add_item_to_temp_list(user_id, product_id, qty)
+    if await orm_add_item_to_temp_list(user_id, product_id, qty) is None:
+        await message.answer("❌ Помилка додавання")
+        return
     
     is_admin = user_id in ADMIN_IDS
     await message.answer(f"✅ Додано {qty} шт.", reply_markup=get_main_menu_kb(is_admin))
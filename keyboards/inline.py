@@ -80,4 +80,30 @@ def get_yes_no_kb(action: str) -> InlineKeyboardMarkup:
         InlineKeyboardButton(text="✅ Так, підтверджую", callback_data=f"confirm:{action}:yes"),
         InlineKeyboardButton(text="❌ Ні, скасувати", callback_data=f"confirm:{action}:no")
     )
-    return builder.as_markup()
\ No newline at end of file
+    return builder.as_markup()
+
+def get_export_format_kb(kind: str, formats: tuple) -> InlineKeyboardMarkup:
+    """
+    Вибір формату експорту.
+    kind: що експортуємо ('stock', 'collected', 'stats') -> callback: export:KIND:FORMAT
+    """
+    labels = {"xlsx": "📗 Excel (xlsx)", "csv": "📄 CSV (gzip)", "parquet": "🧱 Parquet"}
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        *(
+            InlineKeyboardButton(text=labels[fmt], callback_data=f"export:{kind}:{fmt}")
+            for fmt in formats
+        )
+    )
+    return builder.as_markup()
+
+def get_export_period_kb(kind: str, fmt: str, periods: dict) -> InlineKeyboardMarkup:
+    """
+    Вибір періоду експорту.
+    periods: {ключ: підпис} -> callback: export_period:KIND:FORMAT:КЛЮЧ
+    """
+    builder = InlineKeyboardBuilder()
+    for key, label in periods.items():
+        builder.button(text=label, callback_data=f"export_period:{kind}:{fmt}:{key}")
+    builder.adjust(2)
+    return builder.as_markup()
@@ -0,0 +1,289 @@
+# epicservice/services/broadcast.py
+
+"""
+Розсилка повідомлень усім користувачам у фоновому завданні.
+
+- Глобальний ліміт Telegram (~30 повідомлень/с) тримає токен-бакет
+  (BROADCAST_RATE повідомлень/с). Ліміт на один чат (1/с) розсилка не
+  перевищує: кожен користувач отримує одне повідомлення.
+- Одночасно надсилають не більше BROADCAST_CONCURRENCY воркерів.
+- TelegramRetryAfter: усі воркери чекають retry_after, швидкість бакета
+  падає вдвічі й поступово відновлюється після успішних відправок.
+- Прогрес оновлюється в повідомленні адміна кожні
+  BROADCAST_PROGRESS_INTERVAL секунд.
+- Хто заблокував бота, позначається в users.blocked_at і в наступних
+  розсилках пропускається (позначка знімається на /start).
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramRetryAfter,
+)
+from sqlalchemy import select, update
+
+from config import (
+    BROADCAST_CONCURRENCY,
+    BROADCAST_MAX_RETRIES,
+    BROADCAST_PROGRESS_INTERVAL,
+    BROADCAST_RATE,
+)
+from database.engine import async_session
+from database.models import User
+
+logger = logging.getLogger(__name__)
+
+# Після скількох успішних відправок швидкість підіймається на 10%
+RATE_RECOVERY_STEP = 50
+# Нижче цієї швидкості (повідомлень/с) бакет не опускається
+MIN_RATE = 1.0
+
+
+# ==============================================================================
+# 🪣 ТОКЕН-БАКЕТ
+# ==============================================================================
+
+
+class TokenBucket:
+    """Токен-бакет з паузою на RetryAfter і адаптивною швидкістю."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._successes = 0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Чекає на токен (і на кінець паузи після RetryAfter)."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def backoff(self, retry_after: float) -> None:
+        """RetryAfter: пауза для всіх воркерів і вдвічі нижча швидкість."""
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + retry_after)
+        self._refill(now)
+        self._tokens = 0
+        self.rate = max(MIN_RATE, self.rate / 2)
+        self._successes = 0
+        logger.warning(
+            "Розсилка: RetryAfter %s с, швидкість знижено до %.1f/с", retry_after, self.rate
+        )
+
+    def success(self) -> None:
+        """Успішна відправка: поступово повертає швидкість до max_rate."""
+        self._successes += 1
+        if self._successes >= RATE_RECOVERY_STEP and self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate * 1.1)
+            self._successes = 0
+
+
+# ==============================================================================
+# 📢 РОЗСИЛКА
+# ==============================================================================
+
+
+@dataclass
+class BroadcastStats:
+    total: int = 0
+    sent: int = 0
+    blocked: int = 0
+    failed: int = 0
+    retries: int = 0
+    started: float = field(default_factory=time.monotonic)
+
+    @property
+    def done(self) -> int:
+        return self.sent + self.blocked + self.failed
+
+    def text(self, finished: bool = False) -> str:
+        elapsed = time.monotonic() - self.started
+        header = "✅ **Розсилка завершена!**" if finished else "⏳ **Розсилка триває...**"
+        return (
+            f"{header}\n\n"
+            f"📊 Оброблено: {self.done} / {self.total}\n"
+            f"📨 Надіслано: {self.sent}\n"
+            f"🚫 Заблоковано: {self.blocked}\n"
+            f"❌ Помилок: {self.failed}\n"
+            f"⏱ {elapsed:.0f} с"
+        )
+
+
+class Broadcaster:
+    """
+    Одна активна розсилка на процес. Запускається як фонове завдання
+    "broadcast", тож виконується лише там, де працює черга завдань (один
+    процес навіть у режимі webhook), і глобальний ліміт не перевищується.
+    """
+
+    def __init__(
+        self,
+        rate: float = BROADCAST_RATE,
+        concurrency: int = BROADCAST_CONCURRENCY,
+        progress_interval: float = BROADCAST_PROGRESS_INTERVAL,
+        max_retries: int = BROADCAST_MAX_RETRIES,
+    ):
+        self.rate = rate
+        self.concurrency = max(1, concurrency)
+        self.progress_interval = progress_interval
+        self.max_retries = max_retries
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def run(
+        self, bot: Bot, text: str, chat_id: int, message_id: int
+    ) -> Optional[BroadcastStats]:
+        """
+        Виконує розсилку і чекає її завершення. Прогрес пишеться в
+        повідомлення (chat_id, message_id). None — якщо інша розсилка ще
+        триває або розсилка впала з помилкою.
+        """
+        if self.running:
+            return None
+        self._task = asyncio.create_task(self._run(bot, text, chat_id, message_id))
+        return await self._task
+
+    async def _run(
+        self, bot: Bot, text: str, chat_id: int, message_id: int
+    ) -> Optional[BroadcastStats]:
+        stats = BroadcastStats()
+        try:
+            async with async_session() as session:
+                user_ids = list(
+                    await session.scalars(select(User.id).where(User.blocked_at.is_(None)))
+                )
+            stats.total = len(user_ids)
+            logger.info("Розсилка на %s користувачів", stats.total)
+
+            queue: asyncio.Queue = asyncio.Queue()
+            for user_id in user_ids:
+                queue.put_nowait(user_id)
+
+            bucket = TokenBucket(self.rate)
+            blocked: List[int] = []
+            workers = [
+                asyncio.create_task(self._worker(bot, text, queue, bucket, stats, blocked))
+                for _ in range(min(self.concurrency, len(user_ids)) or 1)
+            ]
+            progress = asyncio.create_task(self._progress(bot, chat_id, message_id, stats))
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                progress.cancel()
+
+            await self._mark_blocked(blocked)
+            await self._edit(bot, chat_id, message_id, stats.text(finished=True))
+            logger.info(
+                "Розсилка завершена: надіслано %s, заблоковано %s, помилок %s, повторів %s",
+                stats.sent,
+                stats.blocked,
+                stats.failed,
+                stats.retries,
+            )
+            return stats
+
+        except Exception as e:
+            logger.error("Помилка розсилки: %s", e, exc_info=True)
+            await self._edit(bot, chat_id, message_id, f"❌ Помилка розсилки: {e}")
+            return None
+
+    async def _worker(
+        self,
+        bot: Bot,
+        text: str,
+        queue: asyncio.Queue,
+        bucket: TokenBucket,
+        stats: BroadcastStats,
+        blocked: List[int],
+    ) -> None:
+        while not queue.empty():
+            user_id = queue.get_nowait()
+            for attempt in range(self.max_retries + 1):
+                await bucket.acquire()
+                try:
+                    await bot.send_message(user_id, text)
+                    stats.sent += 1
+                    bucket.success()
+                    break
+                except TelegramRetryAfter as e:
+                    bucket.backoff(e.retry_after)
+                    stats.retries += 1
+                    if attempt == self.max_retries:
+                        stats.failed += 1
+                except TelegramForbiddenError:
+                    # Бот заблокований або користувач видалений
+                    stats.blocked += 1
+                    blocked.append(user_id)
+                    break
+                except Exception as e:
+                    logger.warning("Розсилка: не надіслано %s: %s", user_id, e)
+                    stats.failed += 1
+                    break
+
+    async def _progress(
+        self, bot: Bot, chat_id: int, message_id: int, stats: BroadcastStats
+    ) -> None:
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            await self._edit(bot, chat_id, message_id, stats.text())
+
+    @staticmethod
+    async def _edit(bot: Bot, chat_id: int, message_id: int, text: str) -> None:
+        try:
+            await bot.edit_message_text(text, chat_id=chat_id, message_id=message_id)
+        except TelegramRetryAfter as e:
+            logger.debug("Прогрес розсилки пропущено (RetryAfter %s с)", e.retry_after)
+        except TelegramBadRequest as e:
+            # "message is not modified" тощо
+            logger.debug("Прогрес розсилки не оновлено: %s", e)
+
+    @staticmethod
+    async def _mark_blocked(user_ids: List[int]) -> None:
+        if not user_ids:
+            return
+        async with async_session() as session:
+            await session.execute(
+                update(User).where(User.id.in_(user_ids)).values(blocked_at=datetime.now())
+            )
+            await session.commit()
+        logger.info("Позначено як таких, що заблокували бота: %s", len(user_ids))
+
+    async def shutdown(self) -> None:
+        """Зупиняє активну розсилку (при завершенні бота)."""
+        if self.running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+broadcaster = Broadcaster()
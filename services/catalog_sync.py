@@ -0,0 +1,107 @@
+# epicservice/services/catalog_sync.py
+
+"""
+Синхронізація процесних кешів каталогу між воркерами (режим webhook).
+
+Кожен воркер тримає власні пошуковий індекс і кеші товарів, а зміни
+(імпорт, віднімання зібраного, збереження списків, деактивація) робить
+лише один процес. Тому кожен воркер раз на CATALOG_SYNC_INTERVAL секунд
+перевіряє products.updated_at:
+- товари, змінені з минулої перевірки, скидаються з кешів товарів і
+  точково оновлюються в пошуковому індексі;
+- якщо змінилась кількість товарів (видалення), індекс і кеші
+  перебудовуються повністю.
+Власні зміни процесу при цьому обробляються ще раз — це лише зайве
+точкове оновлення. Повторна зміна того самого товару в ту ж секунду
+(точність updated_at на SQLite) не помічається до наступної його зміни.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional, Set
+
+from sqlalchemy import func, select
+
+from config import CATALOG_SYNC_INTERVAL
+from database.engine import async_session, datetime_bound
+from database.models import Product
+from database.orm.product_cache import invalidate_all, invalidate_products
+from database.orm.search_index import product_search_index
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogWatcher:
+    """Підтягує зміни каталогу, зроблені іншими процесами."""
+
+    def __init__(self, interval: float = CATALOG_SYNC_INTERVAL):
+        self.interval = interval
+        self._since: Optional[datetime] = None
+        # id товарів з updated_at == _since, уже оброблені
+        self._seen: Set[int] = set()
+        self._count: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def check(self) -> None:
+        async with async_session() as session:
+            count = await session.scalar(select(func.count(Product.id)))
+            previous_count = self._count
+            self._count = count
+
+            if previous_count is None or count != previous_count:
+                self._since = await session.scalar(select(func.max(Product.updated_at)))
+                self._seen = set(
+                    await session.scalars(
+                        select(Product.id).where(Product.updated_at == self._since)
+                    )
+                ) if self._since is not None else set()
+                if previous_count is not None:
+                    logger.info("Каталог змінено іншим процесом, перебудова кешів")
+                    invalidate_all()
+                    await product_search_index.rebuild()
+                return
+
+            # updated_at на SQLite має точність до секунди, тому беремо ">=" і
+            # відкидаємо вже оброблені товари з тієї ж секунди
+            query = select(Product.id, Product.артикул, Product.updated_at)
+            if self._since is not None:
+                query = query.where(Product.updated_at >= datetime_bound(self._since))
+            rows = (await session.execute(query)).all()
+
+        changed = [
+            row for row in rows
+            if not (row.updated_at == self._since and row.id in self._seen)
+        ]
+        if not changed:
+            return
+
+        latest = max(row.updated_at for row in rows)
+        if latest != self._since:
+            self._since, self._seen = latest, set()
+        self._seen.update(row.id for row in rows if row.updated_at == latest)
+
+        invalidate_products(row.id for row in changed)
+        await product_search_index.refresh_articles(row.артикул for row in changed)
+        logger.debug("Підтягнуто змінених товарів: %s", len(changed))
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error("Помилка синхронізації каталогу: %s", e, exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+catalog_watcher = CatalogWatcher()
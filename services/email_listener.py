@@ -10,13 +10,11 @@ from email.header import decode_header
 from datetime import datetime
 
 from aiogram import Bot
-from sqlalchemy import select, update, func
 
 # Імпорти проєкту
 from config import ARCHIVES_PATH, ADMIN_IDS, DB_TYPE, BACKUP_DIR, DB_NAME
-from database.engine import async_session
-from database.models import Product, StockHistory
-from utils.import_processor import process_import_dataframe, read_excel_smart
+from database.orm import orm_import_stock
+from utils.import_processor import process_excel_stream
 from utils.markdown_corrector import format_filename_safe
 from utils.force_save_helper import force_save_all_active_lists
 from handlers.admin.import_handlers import create_backup_before_import
@@ -152,100 +150,34 @@ class EmailService:
             )
 
         # 2. FORCE SAVE (Правило користувача)
-        saved_count = await force_save_all_active_lists(self.bot)
-        if saved_count > 0:
+        force_save = await force_save_all_active_lists(self.bot)
+        if force_save.users > 0:
             if ADMIN_IDS:
-                await self.bot.send_message(ADMIN_IDS[0], f"⚠️ Примусово збережено списки **{saved_count}** користувачів.")
+                await self.bot.send_message(ADMIN_IDS[0], force_save.text())
 
         # 3. BACKUP
         await create_backup_before_import()
 
-        # 4. IMPORT (Копія логіки з import_handlers, але без FSM)
+        # 4. IMPORT (без FSM)
         try:
-            loop = asyncio.get_running_loop()
-            df, _ = await loop.run_in_executor(None, read_excel_smart, file_path)
-            processed_df, validation = await loop.run_in_executor(None, process_import_dataframe, df)
+            # Потокове читання + спільний пакетний рушій з import_handlers
+            chunks, validation = process_excel_stream(file_path)
+            stats = await orm_import_stock(chunks, change_source="email_import")
 
             if not validation.is_valid:
                 error_msg = f"❌ **Помилка валідації (Email Import):**\n" + "\n".join(validation.errors[:5])
                 if ADMIN_IDS: await self.bot.send_message(ADMIN_IDS[0], error_msg)
                 return
 
-            # Логіка запису в БД
-            stats = {"added": 0, "updated": 0, "reactivated": 0, "deactivated": 0, "zero": 0}
-            file_articles = set()
-
-            async with async_session() as session:
-                res_all = await session.execute(select(Product.артикул).where(Product.активний == True))
-                db_active = set(res_all.scalars().all())
-
-                for _, row in processed_df.iterrows():
-                    try:
-                        art = str(row["артикул"])
-                        file_articles.add(art)
-                        qty_str = str(row["кількість"]).replace('.', ',')
-                        price_float = float(row["ціна"]) if row["ціна"] else 0.0
-                        
-                        try:
-                            if float(str(row["кількість"]).replace(",", ".")) == 0: stats["zero"] += 1
-                        except: pass
-
-                        res = await session.execute(select(Product).where(Product.артикул == art))
-                        existing = res.scalar_one_or_none()
-
-                        if existing:
-                            if not existing.активний:
-                                existing.активний = True
-                                stats["reactivated"] += 1
-                            
-                            if existing.кількість != qty_str:
-                                hist = StockHistory(
-                                    product_id=existing.id, articul=art,
-                                    old_quantity=existing.кількість, new_quantity=qty_str,
-                                    change_source="email_import"
-                                )
-                                session.add(hist)
-                            
-                            existing.кількість = qty_str
-                            if row["ціна"]: existing.ціна = price_float
-                            if row["сума_залишку"]: existing.сума_залишку = float(row["сума_залишку"])
-                            if row["місяці_без_руху"]: existing.місяці_без_руху = int(row["місяці_без_руху"])
-                            if row["назва"]: existing.назва = row["назва"]
-                            if row["група"]: existing.група = row["група"]
-                            if row["відділ"]: existing.відділ = row["відділ"]
-                            
-                            stats["updated"] += 1
-                        else:
-                            new_p = Product(
-                                articul=art, назва=row["назва"] or "N/A", 
-                                відділ=row["відділ"] or 0, група=row["група"] or "",
-                                кількість=qty_str, ціна=price_float,
-                                сума_залишку=row["сума_залишку"] or 0.0,
-                                місяці_без_руху=row["місяці_без_руху"] or 0,
-                                відкладено=0, активний=True
-                            )
-                            session.add(new_p)
-                            stats["added"] += 1
-                    except: pass
-
-                # Деактивація
-                to_deact = db_active - file_articles
-                if to_deact:
-                    await session.execute(
-                        update(Product).where(Product.артикул.in_(to_deact)).values(активний=False)
-                    )
-                    stats["deactivated"] = len(to_deact)
-
-                await session.commit()
-
             # Звіт
             report = (
                 f"📧 **EMAIL ІМПОРТ ЗАВЕРШЕНО!**\n"
                 f"📄 Файл: `{format_filename_safe(original_filename)}`\n\n"
                 f"➕ Нових: {stats['added']}\n"
-                f"🔄 Оновлено: {stats['updated']}\n"
+                f"🔄 Оновлено: {stats['updated'] - stats['reactivated']}\n"
+                f"♻️ Відновлено: {stats['reactivated']}\n"
                 f"🔴 Деактивовано: {stats['deactivated']}\n"
-                f"♻️ Відновлено: {stats['reactivated']}"
+                f"⚠️ Нульових: {stats['zero']}"
             )
             
             if ADMIN_IDS: await self.bot.send_message(ADMIN_IDS[0], report)
@@ -0,0 +1,256 @@
+# epicservice/services/job_queue.py
+
+"""
+Виконавець фонових завдань з таблиці jobs.
+
+Хендлер ставить завдання в чергу (enqueue_job) і одразу звільняє чат;
+планувальник кожні JOB_POLL_INTERVAL секунд викликає job_queue.poll, який
+забирає до JOB_CONCURRENCY завдань і виконує їх зареєстрованими
+обробниками (@job_handler("kind")).
+
+- Прогрес обробник повідомляє синхронно через ctx.report (можна з потоку
+  executor); раз на JOB_PROGRESS_INTERVAL він редагується в повідомленні
+  завдання і пишеться в БД (це й ознака, що завдання живе).
+- Виняток — повтор із затримкою, доки є спроби; JobError — одразу
+  остаточна помилка з текстом для користувача.
+- Файли з payload["temp_files"] видаляються, коли завдання завершилось
+  (успішно або остаточною помилкою), а не між спробами.
+- Завдання, перерване зупинкою бота, повертається в чергу лише якщо спроби
+  ще лишились; інакше воно failed (так віднімання зібраного з
+  max_attempts=1 ніколи не виконується двічі).
+"""
+
+import asyncio
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from aiogram import Bot
+from aiogram.client.default import Default
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message
+
+from config import JOB_CONCURRENCY, JOB_PROGRESS_INTERVAL, JOB_STALE_AFTER
+from database.models import Job
+from database.orm.jobs import (
+    orm_claim_job,
+    orm_enqueue_job,
+    orm_fail_job,
+    orm_finish_job,
+    orm_requeue_stale_jobs,
+    orm_set_job_message,
+    orm_update_job_progress,
+)
+
+logger = logging.getLogger(__name__)
+
+# Ширина смуги прогресу (символів)
+PROGRESS_BAR_WIDTH = 10
+
+
+class JobError(Exception):
+    """Остаточна помилка завдання (без повторів); текст бачить користувач."""
+
+
+@dataclass
+class JobContext:
+    """Те, що отримує обробник завдання."""
+
+    bot: Bot
+    job_id: int
+    chat_id: int
+    message_id: Optional[int]
+    payload: Dict[str, Any]
+    attempt: int
+    progress: int = 0
+    status: str = ""
+    result_path: Optional[str] = None
+    _reported: tuple = field(default=(None, None), repr=False)
+
+    def report(self, progress: int, status: Optional[str] = None) -> None:
+        """Оновлює прогрес (0..100) і, за потреби, підпис етапу."""
+        self.progress = max(0, min(100, int(progress)))
+        if status is not None:
+            self.status = status
+
+    async def send_document(self, document, caption: Optional[str] = None) -> Message:
+        """Надсилає файл-результат у чат завдання."""
+        sent = await self.bot.send_document(self.chat_id, document, caption=caption)
+        path = getattr(document, "path", None)
+        if path:
+            self.result_path = str(path)
+        return sent
+
+    def progress_text(self) -> str:
+        filled = self.progress * PROGRESS_BAR_WIDTH // 100
+        bar = "▓" * filled + "░" * (PROGRESS_BAR_WIDTH - filled)
+        return f"⏳ Завдання #{self.job_id}: {self.status or 'виконується'}\n{bar} {self.progress}%"
+
+
+JobHandler = Callable[[JobContext], Awaitable[Optional[str]]]
+JOB_HANDLERS: Dict[str, JobHandler] = {}
+
+
+def job_handler(kind: str):
+    """Реєструє обробник завдань типу kind (повертає текст результату)."""
+
+    def decorator(func: JobHandler) -> JobHandler:
+        JOB_HANDLERS[kind] = func
+        return func
+
+    return decorator
+
+
+async def enqueue_job(
+    message: Message, kind: str, payload: Dict[str, Any], title: str, **options: Any
+) -> int:
+    """
+    Ставить завдання в чергу і показує в чаті повідомлення, в якому далі
+    оновлюватиметься прогрес. Повертає id завдання.
+    """
+    msg = await message.answer(f"📋 {title}: ставлю в чергу...")
+    job_id = await orm_enqueue_job(kind, payload, msg.chat.id, msg.message_id, **options)
+    try:
+        await msg.edit_text(f"📋 Завдання #{job_id} в черзі: {title}")
+    except TelegramBadRequest:
+        pass
+    return job_id
+
+
+# ==============================================================================
+# ⚙️ ВИКОНАВЕЦЬ
+# ==============================================================================
+
+
+def _remove_temp_files(payload: Dict[str, Any]) -> None:
+    for path in payload.get("temp_files", ()):
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+class JobQueue:
+    def __init__(self, concurrency: int = JOB_CONCURRENCY):
+        self.concurrency = max(1, concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+        self._started = False
+
+    async def poll(self, bot: Bot) -> None:
+        """Завдання планувальника: забирає готові завдання з черги."""
+        if not self._started:
+            # Виконавець один на всі процеси — "running" після старту завислі
+            failed = await orm_requeue_stale_jobs(0)
+            self._started = True
+        else:
+            failed = await orm_requeue_stale_jobs(JOB_STALE_AFTER)
+        for job in failed:
+            await self._abandon(bot, job)
+
+        while len(self._tasks) < self.concurrency:
+            job = await orm_claim_job()
+            if job is None:
+                break
+            task = asyncio.create_task(self._run(bot, job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, bot: Bot, job: Job) -> None:
+        payload = json.loads(job.payload)
+        ctx = JobContext(bot, job.id, job.chat_id, job.message_id, payload, job.attempts)
+        logger.info("Завдання #%s (%s), спроба %s", job.id, job.kind, job.attempts)
+
+        ticker = asyncio.create_task(self._tick(ctx))
+        # False, якщо завдання буде повторено або перервано зупинкою бота
+        finished = False
+        try:
+            handler = JOB_HANDLERS.get(job.kind)
+            if handler is None:
+                raise JobError(f"Невідомий тип завдання: {job.kind}")
+
+            result = await handler(ctx)
+            ticker.cancel()
+            await orm_finish_job(job.id, result, ctx.result_path)
+            finished = True
+            await self._show(ctx, result or f"✅ Завдання #{job.id} виконано")
+            logger.info("Завдання #%s виконано", job.id)
+
+        except JobError as e:
+            ticker.cancel()
+            await orm_fail_job(job.id, str(e), retry=False)
+            finished = True
+            await self._show(ctx, f"❌ {e}", parse_mode=None)
+            logger.warning("Завдання #%s: %s", job.id, e)
+
+        except Exception as e:
+            ticker.cancel()
+            logger.error("Помилка завдання #%s: %s", job.id, e, exc_info=True)
+            finished = not await orm_fail_job(job.id, str(e))
+            if finished:
+                await self._show(
+                    ctx, f"❌ Завдання #{job.id} не виконано:\n{str(e)[:300]}", parse_mode=None
+                )
+            else:
+                await self._show(ctx, f"⚠️ Завдання #{job.id}: помилка, буде повторено")
+
+        finally:
+            ticker.cancel()
+            if finished:
+                _remove_temp_files(payload)
+
+    async def _abandon(self, bot: Bot, job: Job) -> None:
+        """Прибирає файли перерваного завдання, якому повтор заборонено."""
+        payload = json.loads(job.payload)
+        _remove_temp_files(payload)
+        ctx = JobContext(bot, job.id, job.chat_id, job.message_id, payload, job.attempts)
+        await self._show(
+            ctx, f"❌ Завдання #{job.id}: {job.error}. Повторно не виконується.", parse_mode=None
+        )
+
+    async def _tick(self, ctx: JobContext) -> None:
+        """Періодично показує прогрес і пише його в БД."""
+        while True:
+            await asyncio.sleep(JOB_PROGRESS_INTERVAL)
+            try:
+                await orm_update_job_progress(ctx.job_id, ctx.progress)
+                reported = (ctx.progress, ctx.status)
+                if reported != ctx._reported:
+                    ctx._reported = reported
+                    await self._show(ctx, ctx.progress_text())
+            except Exception as e:
+                logger.debug("Прогрес завдання #%s не оновлено: %s", ctx.job_id, e)
+
+    @staticmethod
+    async def _show(ctx: JobContext, text: str, parse_mode: Any = Default("parse_mode")) -> None:
+        """
+        Редагує повідомлення завдання (або надсилає нове, якщо його немає).
+        Тексти помилок показуються з parse_mode=None: у них довільні символи
+        (наприклад, "_"), на яких Markdown-розбір Telegram падає.
+        """
+        try:
+            if ctx.message_id:
+                await ctx.bot.edit_message_text(
+                    text, chat_id=ctx.chat_id, message_id=ctx.message_id, parse_mode=parse_mode
+                )
+                return
+        except TelegramBadRequest as e:
+            if "not modified" in str(e):
+                return
+            logger.debug("Повідомлення завдання #%s не відредаговано: %s", ctx.job_id, e)
+
+        try:
+            sent = await ctx.bot.send_message(ctx.chat_id, text, parse_mode=parse_mode)
+            ctx.message_id = sent.message_id
+            await orm_set_job_message(ctx.job_id, sent.message_id)
+        except Exception as e:
+            logger.warning("Не вдалося показати стан завдання #%s: %s", ctx.job_id, e)
+
+    async def shutdown(self) -> None:
+        """Перериває завдання (після перезапуску вони повернуться в чергу)."""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+job_queue = JobQueue()
@@ -0,0 +1,216 @@
+# epicservice/services/webhook.py
+
+"""
+Режим webhook з кількома процесами-воркерами.
+
+Фронт-процес (aiohttp) приймає оновлення від Telegram і одразу відповідає
+200, а саме оновлення передає в чергу одного з BOT_WORKERS процесів:
+воркер обирається за user_id (shard_for), тож усі оновлення користувача
+обробляє той самий процес і в тому порядку, в якому їх надіслав Telegram.
+Усередині воркера оновлення різних користувачів обробляються паралельно,
+а одного користувача — строго по черзі (consume_updates).
+
+Webhook реєструється лише після того, як усі воркери готові (інакше
+оновлення накопичуються, поки воркери імпортують модулі). Воркер, що
+впав, фронт перезапускає з тією ж чергою.
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing as mp
+from typing import Any, Callable, Dict, List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiohttp import web
+
+from config import (
+    WEBHOOK_BASE_URL,
+    WEBHOOK_HOST,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+)
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+# Як часто (с) фронт перевіряє, чи живі воркери
+WORKER_CHECK_INTERVAL = 5
+# Скільки (с) чекати на готовність воркерів при старті
+WORKER_START_TIMEOUT = 120
+
+
+# ==============================================================================
+# 🔀 РОЗПОДІЛ ОНОВЛЕНЬ
+# ==============================================================================
+
+
+def update_owner(update: Dict[str, Any]) -> int:
+    """
+    Ідентифікатор, за яким шардиться оновлення: from.id з будь-якого типу
+    оновлення (message, callback_query, ...), інакше chat.id, інакше 0.
+    """
+    for key, payload in update.items():
+        if key == "update_id" or not isinstance(payload, dict):
+            continue
+        sender = payload.get("from") or payload.get("user")
+        if isinstance(sender, dict) and "id" in sender:
+            return sender["id"]
+        chat = payload.get("chat")
+        if isinstance(chat, dict) and "id" in chat:
+            return chat["id"]
+    return 0
+
+
+def shard_for(update: Dict[str, Any], workers: int) -> int:
+    return abs(update_owner(update)) % workers
+
+
+# ==============================================================================
+# ⚙️ ВОРКЕР
+# ==============================================================================
+
+
+async def consume_updates(dp: Dispatcher, bot: Bot, queue: mp.Queue) -> None:
+    """
+    Обробляє оновлення з черги воркера до сигналу завершення (None).
+    Оновлення одного користувача — по черзі, різних — паралельно.
+    """
+    loop = asyncio.get_running_loop()
+    tails: Dict[int, asyncio.Task] = {}
+
+    async def process(update: Dict[str, Any], previous: Optional[asyncio.Task]) -> None:
+        if previous is not None:
+            # Чекаємо попереднє оновлення користувача (навіть якщо воно з помилкою)
+            await asyncio.wait([previous])
+        try:
+            await dp.feed_raw_update(bot, update)
+        except Exception as e:
+            logger.error(
+                "Помилка обробки оновлення %s: %s", update.get("update_id"), e, exc_info=True
+            )
+
+    def forget(owner: int, task: asyncio.Task) -> None:
+        if tails.get(owner) is task:
+            del tails[owner]
+
+    while True:
+        raw = await loop.run_in_executor(None, queue.get)
+        if raw is None:
+            break
+        update = json.loads(raw)
+        owner = update_owner(update)
+        task = asyncio.create_task(process(update, tails.get(owner)))
+        tails[owner] = task
+        task.add_done_callback(lambda t, owner=owner: forget(owner, t))
+
+    if tails:
+        await asyncio.wait(list(tails.values()))
+
+
+# ==============================================================================
+# 🌐 ФРОНТ
+# ==============================================================================
+
+
+class WebhookFront:
+    """Приймає webhook-запити та розкладає оновлення по черг воркерів."""
+
+    def __init__(
+        self, worker_target: Callable[[int, mp.Queue, mp.Queue], None], workers: int
+    ):
+        self.worker_target = worker_target
+        self.workers = max(1, workers)
+        # spawn: дочірні процеси не успадковують event loop і з'єднання з БД
+        self._ctx = mp.get_context("spawn")
+        self._queues: List[mp.Queue] = [self._ctx.Queue() for _ in range(self.workers)]
+        self._processes: List[Optional[mp.Process]] = [None] * self.workers
+        # Воркер кладе сюди свій номер, коли готовий приймати оновлення
+        self._ready: mp.Queue = self._ctx.Queue()
+        self.received = 0
+
+    def _start_worker(self, shard: int) -> None:
+        process = self._ctx.Process(
+            target=self.worker_target,
+            args=(shard, self._queues[shard], self._ready),
+            name=f"bot-worker-{shard}",
+            daemon=False,
+        )
+        process.start()
+        self._processes[shard] = process
+        logger.info("Запущено воркер %s (pid %s)", shard, process.pid)
+
+    async def _watch_workers(self) -> None:
+        while True:
+            await asyncio.sleep(WORKER_CHECK_INTERVAL)
+            for shard, process in enumerate(self._processes):
+                if process is not None and not process.is_alive():
+                    logger.error(
+                        "Воркер %s завершився (код %s), перезапуск", shard, process.exitcode
+                    )
+                    self._start_worker(shard)
+
+    async def _wait_ready(self) -> None:
+        loop = asyncio.get_running_loop()
+        for _ in range(self.workers):
+            shard = await loop.run_in_executor(
+                None, lambda: self._ready.get(timeout=WORKER_START_TIMEOUT)
+            )
+            logger.info("Воркер %s готовий", shard)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if WEBHOOK_SECRET and request.headers.get(SECRET_HEADER) != WEBHOOK_SECRET:
+            return web.Response(status=401)
+
+        raw = await request.text()
+        try:
+            update = json.loads(raw)
+        except ValueError:
+            return web.Response(status=400)
+
+        self._queues[shard_for(update, self.workers)].put(raw)
+        self.received += 1
+        return web.Response()
+
+    async def run(self, bot: Bot) -> None:
+        """Запускає воркери та HTTP-сервер, реєструє webhook і чекає зупинки."""
+        for shard in range(self.workers):
+            self._start_worker(shard)
+
+        runner: Optional[web.AppRunner] = None
+        watcher: Optional[asyncio.Task] = None
+        try:
+            await self._wait_ready()
+
+            app = web.Application()
+            app.router.add_post(WEBHOOK_PATH, self.handle)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+
+            url = WEBHOOK_BASE_URL.rstrip("/") + WEBHOOK_PATH
+            await bot.set_webhook(url, secret_token=WEBHOOK_SECRET or None)
+            logger.info(
+                "🚀 Webhook %s, воркерів: %s (%s:%s)", url, self.workers, WEBHOOK_HOST, WEBHOOK_PORT
+            )
+
+            watcher = asyncio.create_task(self._watch_workers())
+            await asyncio.Event().wait()
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            if runner is not None:
+                await runner.cleanup()
+            await self.stop()
+
+    async def stop(self) -> None:
+        """Сигнал завершення воркерам і очікування, доки вони доопрацюють."""
+        for queue in self._queues:
+            queue.put(None)
+        loop = asyncio.get_running_loop()
+        for process in self._processes:
+            if process is not None:
+                await loop.run_in_executor(None, process.join)
+        logger.info("Воркери зупинені, оброблено оновлень: %s", self.received)
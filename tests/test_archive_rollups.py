@@ -0,0 +1,116 @@
+# epicservice/tests/test_archive_rollups.py
+
+"""
+Видалення архівів перебудовує щоденні агрегати (collected_daily,
+user_daily_activity): після видалення вони збігаються з повною
+перебудовою з saved_lists/saved_list_items.
+
+Запуск з кореня проєкту:
+    python -m pytest -q tests
+"""
+
+import asyncio
+import os
+import tempfile
+from datetime import datetime
+
+os.environ.setdefault("BOT_TOKEN", "123:test")
+os.environ["DB_TYPE"] = "sqlite"
+os.environ["DB_NAME"] = os.path.join(tempfile.gettempdir(), "epic_test_archive_rollups.db")
+
+from sqlalchemy import insert, select  # noqa: E402
+
+from database.engine import async_session, sync_engine  # noqa: E402
+from database.models import (  # noqa: E402
+    Base,
+    CollectedDaily,
+    Product,
+    SavedList,
+    SavedListItem,
+    User,
+    UserDailyActivity,
+)
+from database.orm import (  # noqa: E402
+    orm_delete_archive_by_id,
+    orm_delete_user_archives,
+    orm_rebuild_rollups,
+)
+
+DAY_1 = datetime(2026, 10, 1, 9, 30)
+DAY_2 = datetime(2026, 10, 2, 18, 5)
+
+# (id, user_id, created_at, [(артикул, кількість), ...])
+LISTS = [
+    (1, 1, DAY_1, [("1001", 2), ("1002", 1)]),
+    (2, 2, DAY_1, [("1001", 5)]),
+    (3, 1, DAY_1.replace(hour=15), [("1001", 1)]),
+    (4, 1, DAY_2, [("1002", 3), ("9999", 1)]),
+    (5, 2, DAY_2, [("1002", 4)]),
+]
+
+
+def _fill_db() -> None:
+    Base.metadata.drop_all(sync_engine)
+    Base.metadata.create_all(sync_engine)
+    with sync_engine.begin() as conn:
+        conn.execute(
+            insert(Product),
+            [
+                {"артикул": "1001", "назва": "Фарба", "відділ": 10, "група": "g", "кількість": "5"},
+                {"артикул": "1002", "назва": "Клей", "відділ": 20, "група": "g", "кількість": "5"},
+            ],
+        )
+        conn.execute(
+            insert(User),
+            [{"id": user_id, "username": f"user{user_id}", "first_name": "U"} for user_id in (1, 2)],
+        )
+        conn.execute(
+            insert(SavedList),
+            [
+                {"id": list_id, "user_id": user_id, "file_name": f"{list_id}.xlsx",
+                 "file_path": "", "created_at": created_at}
+                for list_id, user_id, created_at, _ in LISTS
+            ],
+        )
+        conn.execute(
+            insert(SavedListItem),
+            [
+                {"list_id": list_id, "article_name": f"{article} - Товар", "quantity": quantity}
+                for list_id, _, _, items in LISTS
+                for article, quantity in items
+            ],
+        )
+
+
+async def _rollups() -> tuple:
+    async with async_session() as session:
+        collected = (await session.execute(select(CollectedDaily.__table__))).all()
+        activity = (await session.execute(select(UserDailyActivity.__table__))).all()
+    return sorted(collected), sorted(activity)
+
+
+async def _assert_matches_rebuild() -> tuple:
+    after_delete = await _rollups()
+    await orm_rebuild_rollups()
+    assert after_delete == await _rollups()
+    return after_delete
+
+
+def test_delete_archive_updates_rollups():
+    _fill_db()
+
+    async def scenario():
+        await orm_rebuild_rollups()
+        before = await _rollups()
+
+        assert await orm_delete_archive_by_id(2)
+        collected, activity = await _assert_matches_rebuild()
+        assert (collected, activity) != before
+        assert all(row.user_id != 2 or row.day != DAY_1.date() for row in activity)
+
+        assert await orm_delete_user_archives(1)
+        collected, activity = await _assert_matches_rebuild()
+        assert [row.user_id for row in activity] == [2]
+        assert {row.article for row in collected} == {"1002"}
+
+    asyncio.run(scenario())
@@ -0,0 +1,155 @@
+# epicservice/utils/archive_zip.py
+
+"""
+ZIP з усіма збереженими списками користувача.
+
+- Пакування виконується в пулі рендерингу, а не в event loop.
+- Файли, які вже стиснені (xlsx — це ZIP усередині), додаються як
+  ZIP_STORED; решта — ZIP_DEFLATED.
+- ZIP пишеться у тимчасовий файл у ARCHIVE_ZIP_CACHE_PATH і атомарно
+  перейменовується, тож недописаний архів ніколи не буде надіслано.
+- Для кожного користувача зберігається останній ZIP, ключ — набір id
+  архівів. Поки набір не змінився, повторне завантаження віддає готовий
+  файл (і file_id Telegram після першого надсилання).
+"""
+
+import asyncio
+import glob
+import hashlib
+import logging
+import os
+import tempfile
+import zipfile
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from config import ARCHIVE_ZIP_CACHE_PATH
+from database.models import SavedList
+from utils.render_pool import render_pool
+
+logger = logging.getLogger(__name__)
+
+# Розширення файлів, які вже стиснені — повторне стиснення лише гає час
+STORED_EXTENSIONS = (".xlsx", ".zip", ".gz", ".parquet")
+
+
+@dataclass
+class UserZip:
+    """Готовий ZIP архівів користувача для певного набору списків."""
+
+    key: str
+    path: str
+    files: int
+    created_at: datetime
+    # file_id Telegram після першого надсилання (повторно файл не вивантажується)
+    file_id: Optional[str] = None
+
+    @property
+    def filename(self) -> str:
+        return f"archives_{self.created_at:%Y%m%d_%H%M%S}.zip"
+
+
+_user_zips: Dict[int, UserZip] = {}
+_user_locks: Dict[int, asyncio.Lock] = {}
+
+
+def _zip_key(archives: Sequence[SavedList]) -> str:
+    ids = ",".join(str(archive.id) for archive in sorted(archives, key=lambda a: a.id))
+    return hashlib.sha1(ids.encode()).hexdigest()[:16]
+
+
+def _zip_path(user_id: int, key: str) -> str:
+    return os.path.join(ARCHIVE_ZIP_CACHE_PATH, f"archives_{user_id}_{key}.zip")
+
+
+def _write_zip_sync(zip_path: str, files: List[Tuple[str, str]]) -> int:
+    """
+    Пакує files [(шлях, назва в архіві)] у zip_path (функція для пулу
+    рендерингу). Повертає кількість доданих файлів.
+    """
+    directory = os.path.dirname(zip_path)
+    fd, tmp_path = tempfile.mkstemp(suffix=".zip.tmp", dir=directory)
+    added = 0
+    try:
+        with os.fdopen(fd, "wb") as raw, zipfile.ZipFile(raw, "w") as zipf:
+            for path, arcname in files:
+                if not os.path.exists(path):
+                    continue
+                stored = path.lower().endswith(STORED_EXTENSIONS)
+                zipf.write(
+                    path,
+                    arcname=arcname,
+                    compress_type=zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED,
+                )
+                added += 1
+        os.replace(tmp_path, zip_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return added
+
+
+def _remove_user_zips(user_id: int, keep: Optional[str] = None) -> None:
+    for path in glob.glob(os.path.join(ARCHIVE_ZIP_CACHE_PATH, f"archives_{user_id}_*.zip")):
+        if path != keep:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning("Не вдалося видалити ZIP %s: %s", path, e)
+
+
+async def get_user_zip(user_id: int, archives: Sequence[SavedList]) -> Optional[UserZip]:
+    """
+    ZIP зі списками archives користувача: готовий, якщо набір списків
+    не змінився, інакше пакується в пулі рендерингу. None — якщо немає
+    жодного файлу.
+    """
+    key = _zip_key(archives)
+    lock = _user_locks.setdefault(user_id, asyncio.Lock())
+
+    async with lock:
+        cached = _user_zips.get(user_id)
+        if cached and cached.key == key and os.path.exists(cached.path):
+            return cached
+
+        zip_path = _zip_path(user_id, key)
+        if os.path.exists(zip_path):
+            # Лишився з попереднього запуску бота
+            user_zip = UserZip(
+                key,
+                zip_path,
+                len(archives),
+                datetime.fromtimestamp(os.path.getmtime(zip_path)),
+            )
+        else:
+            os.makedirs(ARCHIVE_ZIP_CACHE_PATH, exist_ok=True)
+            files, names = [], set()
+            for archive in archives:
+                if not archive.file_path:
+                    continue
+                arcname = archive.file_name or os.path.basename(archive.file_path)
+                if arcname in names:
+                    arcname = f"{archive.id}_{arcname}"
+                names.add(arcname)
+                files.append((archive.file_path, arcname))
+
+            added = await render_pool.run("archive_zip", _write_zip_sync, zip_path, files)
+            if not added:
+                os.remove(zip_path)
+                return None
+            user_zip = UserZip(key, zip_path, added, datetime.now())
+            logger.info(
+                "Створено ZIP архівів для user_id %s: %s файлів", user_id, added
+            )
+
+        _remove_user_zips(user_id, keep=zip_path)
+        _user_zips[user_id] = user_zip
+        return user_zip
+
+
+def drop_user_zip(user_id: int) -> None:
+    """Прибирає ZIP користувача (після видалення його архівів)."""
+    _user_zips.pop(user_id, None)
+    _remove_user_zips(user_id)
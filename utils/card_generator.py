@@ -1,20 +1,20 @@
 # epicservice/utils/card_generator.py
 
 import logging
-from typing import Optional
+from typing import Optional, Union
 
 from aiogram import Bot
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import Message
 
 from database.models import Product
-from database.orm import orm_get_total_temp_reservation_for_product
+from database.orm import ProductCardView, orm_get_product_card
 
 logger = logging.getLogger(__name__)
 
 
 def format_product_card(
-    product: Product,
+    product: Union[Product, ProductCardView],
     available_qty: int,
     temp_reserved: int = 0,
     in_cart_qty: int = 0,
@@ -22,6 +22,7 @@ def format_product_card(
 ) -> str:
     """
     Форматує картку товару.
+    Приймає Product або ProductCardView (однакові імена полів).
     """
     try:
         try:
@@ -99,28 +100,26 @@ async def send_or_edit_product_card(
     bot: Bot,
     chat_id: int,
     user_id: int,
-    product: Product,
+    product: Union[Product, ProductCardView],
     message_id: Optional[int] = None,
     in_cart_qty: int = 0,
     selected_qty: Optional[int] = None,
 ) -> Optional[Message]:
     """
     Універсальна функція для відправки або редагування картки товару.
+    Резерви та кошик беруться одним запитом orm_get_product_card.
     """
     try:
-        # Отримуємо інформацію про резерви
-        temp_reserved = await orm_get_total_temp_reservation_for_product(product.id)
-
-        try:
-            stock_qty = float(str(product.кількість).replace(",", "."))
-        except ValueError:
-            stock_qty = 0
-
-        permanently_reserved = product.відкладено or 0
-        available = max(0, int(stock_qty - permanently_reserved - temp_reserved))
+        card = await orm_get_product_card(user_id, product.id)
+        if card is None:
+            return None
 
         card_text = format_product_card(
-            product, available, temp_reserved, in_cart_qty, selected_qty
+            card,
+            card.available,
+            card.temp_reserved,
+            in_cart_qty or card.in_cart,
+            selected_qty,
         )
 
         if message_id:
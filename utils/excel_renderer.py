@@ -1,11 +1,25 @@
 # epicservice/utils/excel_renderer.py
 
+import logging
 import os
 from datetime import datetime
+from typing import Iterable, Optional, Sequence
 
 import pandas as pd
-
 from config import ARCHIVES_PATH
+from utils.render_pool import render_pool
+from utils.xlsx_writer import write_xlsx
+
+logger = logging.getLogger(__name__)
+
+# Максимальна ширина колонки (як в автоширині save_dataframe_to_excel)
+MAX_COLUMN_WIDTH = 50
+
+
+def write_dataframe_excel(df: pd.DataFrame, file_path: str) -> str:
+    """Записує DataFrame у Excel як є (функція для пулу рендерингу)."""
+    df.to_excel(file_path, index=False, engine="openpyxl")
+    return file_path
 
 
 def save_dataframe_to_excel(df: pd.DataFrame, filename_prefix: str) -> str | None:
@@ -31,10 +45,37 @@ def save_dataframe_to_excel(df: pd.DataFrame, filename_prefix: str) -> str | Non
             for idx, col in enumerate(df.columns):
                 max_len = max(df[col].astype(str).map(len).max(), len(str(col))) + 2
                 # Обмежуємо максимальну ширину
-                max_len = min(max_len, 50)
+                max_len = min(max_len, MAX_COLUMN_WIDTH)
                 worksheet.column_dimensions[chr(65 + idx)].width = max_len
 
         return file_path
     except Exception as e:
-        print(f"Excel generation error: {e}")
+        logger.error("Помилка генерації Excel: %s", e, exc_info=True)
         return None
+
+
+async def render_dataframe_to_excel(
+    df: pd.DataFrame, filename_prefix: str
+) -> Optional[str]:
+    """save_dataframe_to_excel у пулі рендерингу (не блокує event loop)."""
+    return await render_pool.run("dataframe", save_dataframe_to_excel, df, filename_prefix)
+
+
+def write_rows_excel(
+    file_path: str,
+    headers: Sequence[str],
+    rows: Iterable[Sequence],
+    widths: Optional[Sequence[int]] = None,
+    sheet_name: str = "Data",
+) -> int:
+    """
+    Потоковий запис рядків у .xlsx (utils/xlsx_writer, без моделі клітинок
+    openpyxl): рядки не накопичуються в пам'яті, тож пам'ять не залежить
+    від їх кількості. Шапка жирна й закріплена, ширина колонок — з widths
+    (або за довжиною заголовка) + 2, не більше MAX_COLUMN_WIDTH.
+    Повертає кількість записаних рядків даних.
+    """
+    if widths is None:
+        widths = [len(str(header)) for header in headers]
+    column_widths = [min(width + 2, MAX_COLUMN_WIDTH) for width in widths]
+    return write_xlsx(file_path, headers, rows, column_widths, sheet_name)
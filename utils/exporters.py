@@ -0,0 +1,114 @@
+# epicservice/utils/exporters.py
+
+"""
+Запис табличних експортів у різних форматах з одного потоку рядків:
+- xlsx — utils/xlsx_writer (через write_rows_excel, з ширинами колонок);
+- csv — UTF-8, стиснений gzip (.csv.gz), рядок за рядком з курсора БД;
+- parquet — пачками через pyarrow, якщо він встановлений.
+
+Усі функції синхронні й виконуються в пулі рендерингу.
+"""
+
+import csv
+import gzip
+import os
+from datetime import datetime
+from itertools import islice
+from typing import Iterable, List, Optional, Sequence
+
+from config import ARCHIVES_PATH
+from utils.excel_renderer import write_rows_excel
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet — опційний формат
+    pa = pq = None
+
+EXPORT_FORMATS = ("xlsx", "csv") + (("parquet",) if pa is not None else ())
+
+EXTENSIONS = {"xlsx": ".xlsx", "csv": ".csv.gz", "parquet": ".parquet"}
+
+# Рядків у пачці Parquet (row group)
+PARQUET_BATCH_ROWS = 10_000
+
+
+def export_path(prefix: str, fmt: str, directory: str = ARCHIVES_PATH) -> str:
+    """Шлях до нового файлу експорту (за замовчуванням в ARCHIVES_PATH)."""
+    os.makedirs(directory, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(directory, f"{prefix}_{timestamp}{EXTENSIONS[fmt]}")
+
+
+def write_rows(
+    fmt: str,
+    file_path: str,
+    headers: Sequence[str],
+    rows: Iterable[Sequence],
+    widths: Optional[Sequence[int]] = None,
+    sheet_name: str = "Data",
+) -> int:
+    """Пише рядки у файл обраного формату. Повертає кількість рядків даних."""
+    if fmt == "xlsx":
+        return write_rows_excel(file_path, headers, rows, widths, sheet_name)
+    if fmt == "csv":
+        return _write_csv_gz(file_path, headers, rows)
+    if fmt == "parquet":
+        return _write_parquet(file_path, headers, rows)
+    raise ValueError(f"Невідомий формат експорту: {fmt}")
+
+
+def _write_csv_gz(file_path: str, headers: Sequence[str], rows: Iterable[Sequence]) -> int:
+    count = 0
+    with gzip.open(file_path, "wt", encoding="utf-8", newline="", compresslevel=6) as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def _write_parquet(file_path: str, headers: Sequence[str], rows: Iterable[Sequence]) -> int:
+    """
+    Пише Parquet пачками по PARQUET_BATCH_ROWS. Схема береться з першої
+    пачки (порожні колонки — рядкові), наступні пачки приводяться до неї.
+    """
+    if pa is None:
+        raise RuntimeError("Для експорту в Parquet потрібен pyarrow")
+
+    rows = iter(rows)
+    writer = None
+    count = 0
+    try:
+        while True:
+            batch = list(islice(rows, PARQUET_BATCH_ROWS))
+            if not batch and writer is not None:
+                break
+
+            table = pa.Table.from_arrays(
+                [pa.array(list(column)) for column in _columns(batch, len(headers))],
+                names=list(headers),
+            )
+            if writer is None:
+                schema = pa.schema(
+                    pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f
+                    for f in table.schema
+                )
+                writer = pq.ParquetWriter(file_path, schema)
+            writer.write_table(table.cast(writer.schema))
+            count += len(batch)
+
+            if len(batch) < PARQUET_BATCH_ROWS:
+                break
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+def _columns(batch: List[Sequence], width: int) -> List[tuple]:
+    """Транспонує пачку рядків у колонки (порожня пачка — порожні колонки)."""
+    if not batch:
+        return [()] * width
+    return list(zip(*batch))
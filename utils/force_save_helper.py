@@ -1,103 +1,176 @@
 # epicservice/utils/force_save_helper.py
 
+"""
+Примусове збереження всіх активних кошиків перед імпортом залишків.
+
+Етапи:
+1. БД — усі кошики зберігаються однією транзакцією (save_all_active_lists):
+   один UPDATE на товар, пакетні INSERT історії та SavedList.
+2. Рендеринг — файли кожного користувача пишуться в пулі рендерингу,
+   не більше RENDER_WORKERS одночасно (щоб не переповнити його чергу).
+3. Надсилання — файли і повідомлення йдуть щойно відрендерені, не більше
+   FORCE_SAVE_CONCURRENCY користувачів одночасно, з тим самим токен-бакетом
+   (BROADCAST_RATE), що й розсилка.
+
+Рендеринг і надсилання йдуть конвеєром, тож час обох етапів рахується від
+кінця етапу БД (рендеринг — до останнього готового файлу).
+
+Звіт (ForceSaveReport) містить загальний час і час кожного етапу.
+"""
+
+import asyncio
 import logging
 import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
 
 from aiogram import Bot
-from aiogram.fsm.context import FSMContext
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
 from aiogram.types import FSInputFile
-from sqlalchemy.exc import SQLAlchemyError
 
-from config import ADMIN_IDS
-from database.engine import async_session
-from handlers.common import clean_previous_keyboard
-from keyboards.inline import get_admin_main_kb, get_user_main_kb
-from lexicon.lexicon import LEXICON
-from utils.list_processor import process_and_save_list
+from config import ADMIN_IDS, BROADCAST_MAX_RETRIES, BROADCAST_RATE, FORCE_SAVE_CONCURRENCY
+from keyboards.reply import get_main_menu_kb
+from services.broadcast import TokenBucket
+from utils.list_processor import render_list_files, save_all_active_lists
+from utils.render_pool import render_pool
 
 logger = logging.getLogger(__name__)
 
+FORCE_SAVE_TEXT = (
+    "⚠️ Ваш список примусово збережено перед оновленням залишків.\n\n"
+    "📦 Файли надіслано вище\n"
+    "🗑 Поточний список очищено"
+)
+MAIN_LIST_CAPTION = "✅ Ваше замовлення\n\nТовари доступні для збору."
+DEFICIT_CAPTION = "⚠️ Дефіцит\n\nЦих товарів недостатньо або немає на складі."
 
-async def force_save_user_list(user_id: int, bot: Bot, state: FSMContext) -> bool:
-    """
-    Примусово зберігає тимчасовий список користувача,
-    тепер з коректним керуванням UI цього користувача.
-    """
-    main_list_path = None
-    surplus_list_path = None
+# (етап, готово, всього) — для прогресу у фоновому завданні
+ProgressCallback = Callable[[str, int, int], None]
 
-    try:
-        # --- ОНОВЛЕНО: Використовуємо переданий state конкретного користувача ---
-        user_state = state
 
-        async with async_session() as session:
-            async with session.begin():
-                main_list_path, surplus_list_path = await process_and_save_list(
-                    session, user_id
-                )
+@dataclass
+class ForceSaveReport:
+    users: int = 0
+    notified: int = 0
+    blocked: int = 0
+    failed: int = 0
+    total: float = 0.0
+    timings: Dict[str, float] = field(default_factory=dict)
 
-        # Прибираємо клавіатуру з попереднього головного меню користувача
-        await clean_previous_keyboard(user_state, bot, user_id)
-
-        if not main_list_path and not surplus_list_path:
-            return True
-
-        if main_list_path:
-            await bot.send_document(
-                user_id, FSInputFile(main_list_path), caption=LEXICON.MAIN_LIST_SAVED
-            )
-        if surplus_list_path:
-            await bot.send_document(
-                user_id,
-                FSInputFile(surplus_list_path),
-                caption=LEXICON.SURPLUS_LIST_CAPTION,
-            )
-
-        kb = get_admin_main_kb() if user_id in ADMIN_IDS else get_user_main_kb()
-        text = (
-            LEXICON.CMD_START_ADMIN if user_id in ADMIN_IDS else LEXICON.CMD_START_USER
+    def text(self) -> str:
+        return (
+            f"💾 **Примусово збережено списки {self.users} користувачів** "
+            f"за {self.total:.1f} с\n"
+            f"• БД: {self.timings.get('db', 0):.1f} с\n"
+            f"• Рендеринг файлів: {self.timings.get('render', 0):.1f} с\n"
+            f"• Надсилання: {self.timings.get('send', 0):.1f} с\n"
+            f"📨 Сповіщено: {self.notified}, 🚫 заблокували бота: {self.blocked}, "
+            f"❌ помилок: {self.failed}"
         )
 
-        # Надсилаємо нове головне меню і зберігаємо його ID у стані користувача
-        sent_message = await bot.send_message(user_id, text, reply_markup=kb)
-        await user_state.update_data(main_message_id=sent_message.message_id)
-
-        return True
 
-    except (SQLAlchemyError, ValueError) as e:
-        logger.error(
-            "Помилка транзакції при примусовому збереженні для %s: %s",
-            user_id,
-            e,
-            exc_info=True,
-        )
+async def _send(bot: Bot, bucket: TokenBucket, method, *args, **kwargs):
+    """Один виклик Bot API через токен-бакет, з повтором після RetryAfter."""
+    for attempt in range(BROADCAST_MAX_RETRIES + 1):
+        await bucket.acquire()
         try:
-            await bot.send_message(user_id, LEXICON.TRANSACTION_ERROR)
-        except Exception as bot_error:
-            logger.warning(
-                "Не вдалося надіслати повідомлення про помилку користувачу %s: %s",
-                user_id,
-                bot_error,
-            )
-        return False
-    except Exception as e:
-        logger.error(
-            "Неочікувана помилка при примусовому збереженні для %s: %s",
-            user_id,
-            e,
-            exc_info=True,
-        )
+            result = await method(*args, **kwargs)
+            bucket.success()
+            return result
+        except TelegramRetryAfter as e:
+            bucket.backoff(e.retry_after)
+            if attempt == BROADCAST_MAX_RETRIES:
+                raise
+
+
+async def force_save_all_active_lists(
+    bot: Bot, on_progress: Optional[ProgressCallback] = None
+) -> ForceSaveReport:
+    """
+    Зберігає кошики всіх користувачів, надсилає їм файли замовлення/дефіциту
+    та нове головне меню. Повертає звіт з часом етапів.
+    """
+    report = ForceSaveReport()
+    started = time.perf_counter()
+
+    lists = await save_all_active_lists()
+    report.timings["db"] = time.perf_counter() - started
+    report.users = len(lists)
+    if not lists:
+        report.total = report.timings["db"]
+        return report
+    logger.info("Примусово збережено кошики %s користувачів", report.users)
+
+    stage_started = time.perf_counter()
+    render_slots = asyncio.Semaphore(render_pool.workers)
+    send_slots = asyncio.Semaphore(max(1, FORCE_SAVE_CONCURRENCY))
+    bucket = TokenBucket(BROADCAST_RATE)
+    progress = {"render": 0, "send": 0}
+
+    def step(stage: str) -> None:
+        progress[stage] += 1
+        if on_progress is not None:
+            on_progress(stage, progress[stage], report.users)
+
+    async def deliver(user_id: int, main, deficit) -> None:
+        paths = (None, None)
         try:
-            await bot.send_message(user_id, LEXICON.UNEXPECTED_ERROR)
-        except Exception as bot_error:
-            logger.warning(
-                "Не вдалося надіслати повідомлення про помилку користувачу %s: %s",
-                user_id,
-                bot_error,
-            )
-        return False
-    finally:
-        if main_list_path and os.path.exists(main_list_path):
-            os.remove(main_list_path)
-        if surplus_list_path and os.path.exists(surplus_list_path):
-            os.remove(surplus_list_path)
+            async with render_slots:
+                try:
+                    paths = await render_list_files(main, deficit)
+                finally:
+                    step("render")
+                    report.timings["render"] = time.perf_counter() - stage_started
+
+            async with send_slots:
+                main_path, deficit_path = paths
+                if main_path:
+                    await _send(
+                        bot, bucket, bot.send_document,
+                        user_id, FSInputFile(main_path), caption=MAIN_LIST_CAPTION,
+                    )
+                if deficit_path:
+                    await _send(
+                        bot, bucket, bot.send_document,
+                        user_id, FSInputFile(deficit_path), caption=DEFICIT_CAPTION,
+                    )
+                await _send(
+                    bot, bucket, bot.send_message,
+                    user_id, FORCE_SAVE_TEXT,
+                    reply_markup=get_main_menu_kb(user_id in ADMIN_IDS),
+                )
+                report.notified += 1
+
+        except TelegramForbiddenError:
+            report.blocked += 1
+        except Exception as e:
+            report.failed += 1
+            logger.warning("Примусове збереження: не сповіщено %s: %s", user_id, e)
+        finally:
+            step("send")
+            for path in paths:
+                if path and os.path.exists(path):
+                    os.remove(path)
+
+    await asyncio.gather(
+        *(deliver(user_id, main, deficit) for user_id, (main, deficit) in lists.items())
+    )
+
+    finished = time.perf_counter()
+    report.timings["send"] = finished - stage_started
+    report.total = finished - started
+    logger.info(
+        "Примусове збереження: %s користувачів за %.2f с "
+        "(БД %.2f с, рендеринг %.2f с, надсилання %.2f с), сповіщено %s, "
+        "заблокували %s, помилок %s",
+        report.users,
+        report.total,
+        report.timings["db"],
+        report.timings.get("render", 0),
+        report.timings["send"],
+        report.notified,
+        report.blocked,
+        report.failed,
+    )
+    return report
@@ -2,12 +2,15 @@
 
 import logging
 import re
+import itertools
 import json
 import os
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
+from pandas.api.types import is_bool_dtype, is_datetime64_any_dtype, is_numeric_dtype
 
 logger = logging.getLogger(__name__)
 MAPPING_FILE = "column_mapping.json"
@@ -45,41 +48,67 @@ class ImportPreview:
     stats: Dict[str, Any]
     header_row_index: int
 
+@dataclass
+class SheetInfo:
+    """Що потоковий читач дізнався про аркуш, ще не дочитавши його."""
+    header_row_index: int = 0
+    columns: Optional[List[str]] = None
+    # Рядків даних після заголовка (за розміром аркуша, разом з порожніми);
+    # None — розмір у файлі не вказано
+    total_rows: Optional[int] = None
+
 # ==============================================================================
 # 🧠 РОЗУМНЕ ЧИТАННЯ (SMART READ)
 # ==============================================================================
 
-def read_excel_smart(file_path: str) -> Tuple[pd.DataFrame, int]:
+# Скільки перших рядків переглядаємо в пошуках заголовка
+HEADER_SCAN_ROWS = 20
+# Розмір порції рядків у потоковому режимі
+STREAM_CHUNK_SIZE = 5000
+# Рядків даних, які читаються для прев'ю імпорту
+PREVIEW_ROWS = 100
+
+
+def _find_header_row(rows) -> Tuple[int, int]:
     """
-    Знаходить заголовок, пропускаючи сміття на початку файлу.
+    Шукає рядок з найбільшою кількістю знайомих назв колонок.
+    Повертає (індекс рядка, кількість збігів).
     """
-    try:
-        # Читаємо перші 20 рядків
-        preview_df = pd.read_excel(file_path, header=None, nrows=20)
-    except Exception as e:
-        logger.error(f"Read error: {e}")
-        return pd.read_excel(file_path), 0
-
     best_idx = 0
     max_matches = 0
-    
+
     # Збираємо всі відомі нам слова
     keywords = set()
     for aliases in DEFAULT_MAPPING.values():
         for a in aliases: keywords.add(a.lower())
-    
-    # Шукаємо рядок з найбільшою кількістю знайомих слів
-    for idx, row in preview_df.iterrows():
+
+    for idx, values in enumerate(rows):
         matches = 0
-        row_vals = [str(v).lower().strip() for v in row.values if pd.notna(v)]
-        
+        row_vals = [str(v).lower().strip() for v in values if pd.notna(v)]
+
         for v in row_vals:
             if v in keywords: matches += 1
-        
+
         if matches > max_matches:
             max_matches = matches
             best_idx = idx
 
+    return best_idx, max_matches
+
+
+def read_excel_smart(file_path: str) -> Tuple[pd.DataFrame, int]:
+    """
+    Знаходить заголовок, пропускаючи сміття на початку файлу.
+    """
+    try:
+        # Читаємо перші 20 рядків
+        preview_df = pd.read_excel(file_path, header=None, nrows=HEADER_SCAN_ROWS)
+    except Exception as e:
+        logger.error(f"Read error: {e}")
+        return pd.read_excel(file_path), 0
+
+    best_idx, max_matches = _find_header_row(preview_df.itertuples(index=False))
+
     logger.info(f"Smart Read: Header found at row {best_idx} (matches: {max_matches})")
 
     # Читаємо начисто
@@ -88,6 +117,168 @@ def read_excel_smart(file_path: str) -> Tuple[pd.DataFrame, int]:
     df.columns = df.columns.astype(str).str.strip()
     return df, best_idx
 
+# ==============================================================================
+# 🌊 ПОТОКОВЕ ЧИТАННЯ (READ-ONLY OPENPYXL)
+# ==============================================================================
+
+def _cell_value(value):
+    """Цілі float-клітинки -> int (як pandas), щоб артикул 12345678.0 не псувався."""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _header_names(header_row) -> List[str]:
+    """Назви колонок як у pandas: порожні -> 'Unnamed: N', дублікати -> 'X.1'."""
+    values = list(header_row)
+    while values and values[-1] is None:
+        values.pop()
+
+    names, seen = [], {}
+    for i, value in enumerate(values):
+        name = f"Unnamed: {i}" if value is None else str(_cell_value(value)).strip()
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _build_chunk(rows: List[list], index: List[int], columns: List[str]) -> pd.DataFrame:
+    """
+    Порція рядків -> DataFrame. Колонки без пропусків отримують власний тип,
+    решта лишається object, щоб числові артикули з пропусками не ставали float.
+    """
+    chunk = pd.DataFrame(rows, columns=columns, index=index, dtype=object)
+    for col in chunk.columns:
+        if chunk[col].notna().all():
+            chunk[col] = chunk[col].infer_objects()
+    return chunk
+
+
+def iter_excel_smart(
+    file_path: str,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    scan_rows: int = HEADER_SCAN_ROWS,
+    info: Optional[SheetInfo] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Потоково читає .xlsx (openpyxl read_only) порціями по chunk_size рядків.
+    Заголовок шукається серед перших scan_rows рядків, як у read_excel_smart.
+    Індекс порцій наскрізний і збігається з індексом read_excel_smart,
+    тож номери рядків у помилках валідації не змінюються.
+    Формати, які openpyxl не читає (.xls, .ods), читаються цілком через pandas.
+
+    info, якщо передано, заповнюється до першої порції: рядок заголовка,
+    колонки і кількість рядків даних.
+    """
+    info = info if info is not None else SheetInfo()
+    if not file_path.lower().endswith((".xlsx", ".xlsm")):
+        df, info.header_row_index = read_excel_smart(file_path)
+        info.columns = list(df.columns)
+        info.total_rows = len(df)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start : start + chunk_size]
+        return
+
+    import openpyxl
+
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = wb.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+
+        head = [row for _, row in zip(range(scan_rows), rows)]
+        best_idx, max_matches = _find_header_row(head)
+        logger.info(f"Stream Read: Header found at row {best_idx} (matches: {max_matches})")
+
+        if not head:
+            info.columns = []
+            info.total_rows = 0
+            return
+        columns = _header_names(head[best_idx])
+        width = len(columns)
+        info.header_row_index = best_idx
+        info.columns = columns
+        # max_row — з розміру аркуша в файлі, без читання рядків
+        info.total_rows = (
+            max(0, sheet.max_row - best_idx - 1) if sheet.max_row is not None else None
+        )
+
+        buffer, index = [], []
+        all_rows = itertools.chain(head[best_idx + 1 :], rows)
+        for data_idx, row in enumerate(all_rows):
+            values = [_cell_value(v) for v in row[:width]]
+            if all(v is None for v in values):
+                # Порожні рядки пропускаємо, але номер рядка зберігаємо
+                continue
+            values.extend([None] * (width - len(values)))
+            buffer.append(values)
+            index.append(data_idx)
+
+            if len(buffer) >= chunk_size:
+                yield _build_chunk(buffer, index, columns)
+                buffer, index = [], []
+
+        if buffer:
+            yield _build_chunk(buffer, index, columns)
+    finally:
+        wb.close()
+
+
+def read_excel_preview(
+    file_path: str, rows: int = PREVIEW_ROWS
+) -> Tuple[pd.DataFrame, SheetInfo]:
+    """
+    Перші rows рядків даних для прев'ю імпорту (файл цілком не читається,
+    крім .xls/.ods) і відомості про аркуш.
+    """
+    info = SheetInfo()
+    chunks = iter_excel_smart(file_path, rows, info=info)
+    try:
+        first = next(chunks, None)
+    finally:
+        chunks.close()
+    if first is None:
+        first = pd.DataFrame(columns=info.columns or [])
+    return first, info
+
+
+def process_excel_stream(
+    file_path: str, chunk_size: int = STREAM_CHUNK_SIZE
+) -> Tuple[Iterator[pd.DataFrame], ImportValidation]:
+    """
+    Потокова версія read_excel_smart + process_import_dataframe.
+
+    Повертає (ітератор оброблених порцій, валідація). Валідація
+    накопичується по мірі читання і стає остаточною лише після того,
+    як ітератор вичерпано.
+    """
+    validation = ImportValidation(
+        is_valid=False, errors=[], warnings=[], total_rows=0, valid_rows=0
+    )
+
+    def chunks() -> Iterator[pd.DataFrame]:
+        for chunk in iter_excel_smart(file_path, chunk_size):
+            processed, chunk_validation = process_import_dataframe(chunk)
+            validation.total_rows += chunk_validation.total_rows
+            validation.valid_rows += chunk_validation.valid_rows
+            validation.errors.extend(chunk_validation.errors)
+            for warning in chunk_validation.warnings:
+                if warning not in validation.warnings:
+                    validation.warnings.append(warning)
+            validation.is_valid = validation.valid_rows > 0
+
+            if chunk_validation.valid_rows:
+                yield processed
+            elif chunk_validation.errors == ["Не знайдено колонку 'Кількість'"]:
+                # Колонки однакові в усіх порціях — далі читати немає сенсу
+                return
+
+    return chunks(), validation
+
 # ==============================================================================
 # 💾 МЕНЕДЖЕР МАПІНГУ (JSON)
 # ==============================================================================
@@ -199,6 +390,85 @@ def validate_article(val) -> Tuple[bool, Optional[str]]:
     if len(s) != 8: return False, "Не 8 цифр"
     return True, None
 
+# ==============================================================================
+# 🧮 ВЕКТОРНІ ПЕРЕТВОРЕННЯ КОЛОНОК
+# ==============================================================================
+
+# Та сама регулярка, що й у extract_article_and_name (варіант "просто пробіл" вона покриває)
+ARTICLE_NAME_PATTERN = r"^(\d{8})[\s\-\–\—]+(.+)$"
+
+
+def _none_series(index: pd.Index) -> pd.Series:
+    """Object колонка з None (а не NaN), як у DataFrame зі словників."""
+    return pd.Series([None] * len(index), index=index, dtype=object)
+
+
+def _to_str(col: pd.Series) -> pd.Series:
+    """Векторний аналог str(value) для колонки."""
+    if is_datetime64_any_dtype(col):
+        # astype(str) обрізає нульовий час, str(Timestamp) — ні
+        return col.map(str)
+    result = col.astype(str)
+    # pandas >= 3 залишає пропуски пропусками, а str(NaN/None) дає "nan"/"None"
+    missing = col.isna()
+    if missing.any():
+        result = result.astype(object)
+        result[missing] = col[missing].map(str)
+    return result
+
+
+def _clean_number_str(col: pd.Series) -> pd.Series:
+    """Прибирає кому-роздільник та пробіли (звичайні й нерозривні)."""
+    return (
+        _to_str(col)
+        .str.replace(",", ".", regex=False)
+        .str.replace(" ", "", regex=False)
+        .str.replace("\xa0", "", regex=False)
+    )
+
+
+def _parse_float(raw: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """
+    Векторний аналог float(str) для колонки рядків.
+    Повертає (значення, маска_помилок). Значення рядків з помилкою — NaN.
+    """
+    values = pd.to_numeric(raw, errors="coerce").astype(float)
+    failed = pd.Series(False, index=raw.index)
+
+    # to_numeric і float() розходяться лише на крайніх випадках ("", "1_000"),
+    # тому рядки, що дали NaN, перевіряємо поштучно — їх зазвичай одиниці.
+    for idx in values.index[values.isna()]:
+        try:
+            values.at[idx] = float(raw.at[idx])
+        except (TypeError, ValueError):
+            failed.at[idx] = True
+    return values, failed
+
+
+def _numeric_column(col: pd.Series, clean: bool) -> Tuple[pd.Series, pd.Series]:
+    """Числова колонка файлу -> (float значення, маска помилок)."""
+    if is_numeric_dtype(col) and not is_bool_dtype(col):
+        return col.astype(float), pd.Series(False, index=col.index)
+    raw = _clean_number_str(col) if clean else _to_str(col)
+    return _parse_float(raw)
+
+
+def _int_column(col: pd.Series) -> pd.Series:
+    """Аналог int(float(str(v))) з None при помилці (відділ, місяці)."""
+    values, failed = _numeric_column(col, clean=False)
+    ok = ~failed & np.isfinite(values) & (values.abs() < 2**63)
+    result = _none_series(col.index)
+    result[ok] = np.trunc(values[ok]).astype(np.int64).astype(object)
+    return result
+
+
+def _optional_float(values: pd.Series, failed: pd.Series) -> pd.Series:
+    """float колонка -> object колонка з None на місці помилок."""
+    result = values.astype(object)
+    result[failed] = None
+    return result
+
+
 # ==============================================================================
 # 📊 ОБРОБКА DATAFRAME
 # ==============================================================================
@@ -206,6 +476,7 @@ def validate_article(val) -> Tuple[bool, Optional[str]]:
 def process_import_dataframe(df: pd.DataFrame, custom_map=None) -> Tuple[pd.DataFrame, ImportValidation]:
     """
     Перетворює вхідний DataFrame у стандартизований формат.
+    Працює поколонково (pandas/NumPy) без циклу по рядках.
     """
     col_map, _ = detect_columns(df)
     if custom_map:
@@ -213,93 +484,93 @@ def process_import_dataframe(df: pd.DataFrame, custom_map=None) -> Tuple[pd.Data
 
     errors = []
     warnings = []
-    rows = []
-    
+
+    # Колонки з ручного мапінгу, яких немає у файлі, ігноруємо
+    for key, col in list(col_map.items()):
+        if col and col not in df.columns:
+            warnings.append(f"Колонку '{col}' ({key}) не знайдено у файлі")
+            col_map[key] = None
+
     # Перевірка мінімуму: повинна бути хоча б Кількість
     if not col_map.get("quantity"):
         return df, ImportValidation(
             False, ["Не знайдено колонку 'Кількість'"], [], len(df), 0
         )
 
-    for idx, row in df.iterrows():
-        rid = idx + 2
-        try:
-            art, name = "", ""
-            
-            # --- 1. АРТИКУЛ ТА НАЗВА ---
-            # Варіант А: Є окремі колонки
-            if col_map.get("article") and col_map.get("name"):
-                art = str(row[col_map["article"]]).strip()
-                name = str(row[col_map["name"]]).strip()
-            
-            # Варіант Б: Є тільки Назва (артикул всередині)
-            elif col_map.get("name") and not col_map.get("article"):
-                art, name = extract_article_and_name(row[col_map["name"]])
-                
-            # Варіант В: Є тільки Артикул
-            elif col_map.get("article"):
-                art = str(row[col_map["article"]]).strip()
-
-            # Валідація артикулу
-            valid, _ = validate_article(art)
-            if not valid:
-                # Пропускаємо рядки без валідного артикулу (підсумки, сміття)
-                continue 
-
-            # --- 2. КІЛЬКІСТЬ (Обов'язкове) ---
-            qty_raw = str(row[col_map["quantity"]]).replace(",", ".").replace(" ", "").replace("\xa0", "")
-            try:
-                qty = float(qty_raw)
-            except:
-                errors.append(f"Ряд {rid} (Арт {art}): помилка кількості '{qty_raw}'")
-                continue
+    # --- 1. АРТИКУЛ ТА НАЗВА ---
+    art_col, name_col = col_map.get("article"), col_map.get("name")
+    if art_col and name_col:
+        # Варіант А: Є окремі колонки
+        art = _to_str(df[art_col]).str.strip()
+        name = _to_str(df[name_col]).str.strip()
+    elif name_col:
+        # Варіант Б: Є тільки Назва (артикул всередині)
+        parts = _to_str(df[name_col]).str.strip().str.extract(ARTICLE_NAME_PATTERN)
+        art = parts[0].fillna("")
+        name = parts[1].str.strip()
+    elif art_col:
+        # Варіант В: Є тільки Артикул
+        art = _to_str(df[art_col]).str.strip()
+        name = pd.Series("", index=df.index)
+    else:
+        art = pd.Series("", index=df.index)
+        name = art
+
+    # Рядки без валідного артикулу (підсумки, сміття) пропускаємо
+    valid = (art.str.len() == 8) & art.str.isdigit()
+    data = df.loc[valid]
+    art, name = art[valid], name[valid]
+
+    # --- 2. КІЛЬКІСТЬ (Обов'язкове) ---
+    qty_src = data[col_map["quantity"]]
+    qty, qty_failed = _numeric_column(qty_src, clean=True)
+    if qty_failed.any():
+        qty_raw = _clean_number_str(qty_src[qty_failed])
+        for idx, raw in qty_raw.items():
+            errors.append(f"Ряд {idx + 2} (Арт {art[idx]}): помилка кількості '{raw}'")
+
+    keep = ~qty_failed
+    data, art, name, qty = data[keep], art[keep], name[keep], qty[keep]
+
+    # --- 3. ІНШІ ПОЛЯ (Необов'язкові -> None) ---
+    dept = _int_column(data[col_map["department"]]) if col_map.get("department") else _none_series(data.index)
+    grp = _to_str(data[col_map["group"]]).str.strip() if col_map.get("group") else _none_series(data.index)
+    mnth = _int_column(data[col_map["months_no_movement"]]) if col_map.get("months_no_movement") else _none_series(data.index)
+
+    sum_val, price = _none_series(data.index), _none_series(data.index)
+    if col_map.get("sum"):
+        sums, sum_failed = _numeric_column(data[col_map["sum"]], clean=True)
+        sum_val = _optional_float(sums, sum_failed)
+        with_price = ~sum_failed & (qty > 0)
+        # Вбудований round(), а не np.round: інше округлення половинок
+        price[with_price] = [
+            round(v, 2) for v in (sums[with_price] / qty[with_price]).tolist()
+        ]
+
+    if data.empty:
+        processed_df = pd.DataFrame()
+    else:
+        # Колонки передаються списками, щоб типи виводились так само,
+        # як для DataFrame зі словників (None/NaN, int/float, рядки)
+        processed_df = pd.DataFrame(
+            {
+                "артикул": art.tolist(),
+                "назва": name.tolist(),
+                "відділ": dept.tolist(),
+                "група": grp.tolist(),
+                "кількість": qty.tolist(),
+                "ціна": price.tolist(),
+                "сума_залишку": sum_val.tolist(),
+                "місяці_без_руху": mnth.tolist(),
+            }
+        )
 
-            # --- 3. ІНШІ ПОЛЯ (Необов'язкові -> None) ---
-            dept = None
-            if col_map.get("department"):
-                try: dept = int(float(str(row[col_map["department"]])))
-                except: pass
-            
-            grp = None
-            if col_map.get("group"):
-                grp = str(row[col_map["group"]]).strip()
-
-            sum_val = None
-            price = None
-            if col_map.get("sum"):
-                try:
-                    sum_val = float(str(row[col_map["sum"]]).replace(",", ".").replace(" ", "").replace("\xa0", ""))
-                    if qty > 0:
-                        price = round(sum_val / qty, 2)
-                except: pass
-            
-            mnth = None
-            if col_map.get("months_no_movement"):
-                try: mnth = int(float(str(row[col_map["months_no_movement"]])))
-                except: pass
-
-            rows.append({
-                "артикул": art,
-                "назва": name,
-                "відділ": dept,
-                "група": grp,
-                "кількість": qty,
-                "ціна": price,
-                "сума_залишку": sum_val,
-                "місяці_без_руху": mnth
-            })
-
-        except Exception as e:
-            errors.append(f"Ряд {rid}: {e}")
-
-    processed_df = pd.DataFrame(rows)
-    
     return processed_df, ImportValidation(
-        is_valid=len(rows) > 0,
+        is_valid=len(processed_df) > 0,
         errors=errors,
         warnings=warnings,
         total_rows=len(df),
-        valid_rows=len(rows)
+        valid_rows=len(processed_df)
     )
 
 def generate_import_preview(df: pd.DataFrame) -> ImportPreview:
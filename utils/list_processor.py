@@ -3,16 +3,17 @@
 import logging
 import os
 from datetime import datetime
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import pandas as pd
-from sqlalchemy import select, delete
-from sqlalchemy.orm import joinedload
+from sqlalchemy import Integer, String, case, column, delete, insert, select, update, values
 
 from config import ARCHIVES_PATH
-from database.engine import async_session
+from database.engine import async_session, is_postgres
 from database.models import Product, SavedList, SavedListItem, TempList, StockHistory
-from database.orm import orm_clear_temp_list, orm_get_temp_list
+from database.orm import orm_clear_temp_list, orm_get_temp_list, orm_record_saved_lists
+from database.orm.product_cache import catalog_changed, invalidate_products
+from utils.render_pool import render_pool
 
 logger = logging.getLogger(__name__)
 
@@ -53,162 +54,337 @@ def format_list_for_display(temp_list: List[TempList]) -> str:
 # 💾 ЗБЕРЕЖЕННЯ СПИСКУ (СПИСАННЯ ТОВАРУ)
 # ==============================================================================
 
+# Пачка товарів на один UPDATE (3 параметри на рядок)
+SAVE_BATCH_SIZE = 500
+# Спроби, якщо залишок товару змінився між читанням і списанням
+SAVE_ATTEMPTS = 3
 
-async def process_and_save_list(user_id: int) -> Tuple[Optional[str], Optional[str]]:
+
+class _StockChanged(Exception):
+    """Залишок хоча б одного товару змінили паралельно — план списання застарів."""
+
+
+def _format_stock(value: float) -> str:
+    """Формат залишку в БД: ціле без дробу, інакше з комою."""
+    if value.is_integer():
+        return str(int(value))
+    return str(value).replace(".", ",")
+
+
+def _plan_deductions(
+    rows, stock: Optional[Dict[int, str]] = None
+) -> Tuple[List[dict], List[dict], List[dict]]:
     """
-    Обробляє список:
-    1. Віднімає кількість товару зі складу (Списання).
-    2. Записує зміну в історію.
-    3. Зберігає файли Excel.
-    4. Очищає кошик.
+    Розраховує списання по рядках (product_id, артикул, назва, кількість,
+    відкладено, requested). Повертає (списання, позиції до видачі, дефіцит).
+    Тимчасовий резерв цього користувача не враховується — саме його ми
+    зараз реалізуємо; "залізний" резерв (відкладено) лишається на складі.
+
+    stock — залишки (product_id -> значення в БД), спільні для кількох
+    списків одного пакета: наступний список бачить залишок після попереднього.
     """
-    main_list_path = None
-    surplus_list_path = None
+    if stock is None:
+        stock = {}
+    deductions, available_items_data, deficit_items_data = [], [], []
+
+    for row in rows:
+        current = stock.get(row.product_id, row.кількість)
+        try:
+            stock_qty = float(str(current).replace(",", "."))
+        except (ValueError, AttributeError):
+            stock_qty = 0.0
+
+        real_available_stock = max(0, stock_qty - (row.відкладено or 0))
+        requested_qty = row.requested
+
+        if real_available_stock >= requested_qty:
+            qty_to_deduct = requested_qty
+        else:
+            qty_to_deduct = int(real_available_stock)
+            deficit_items_data.append({
+                "артикул": row.артикул,
+                "назва": row.назва,
+                "потрібно": requested_qty,
+                "є_в_наявності": real_available_stock,
+                "дефіцит": requested_qty - real_available_stock,
+            })
+
+        if qty_to_deduct > 0:
+            new_quantity = _format_stock(stock_qty - qty_to_deduct)
+            stock[row.product_id] = new_quantity
+            available_items_data.append({
+                "артикул": row.артикул,
+                "назва": row.назва,
+                "кількість": qty_to_deduct,
+            })
+            deductions.append({
+                "product_id": row.product_id,
+                "articul": row.артикул,
+                "old_quantity": current,
+                "new_quantity": new_quantity,
+            })
+
+    return deductions, available_items_data, deficit_items_data
+
+
+def _deduct_stmt(batch: List[dict]):
+    """
+    Один UPDATE на пачку з перевіркою старого значення (compare-and-set):
+    PostgreSQL — UPDATE ... FROM (VALUES ...), SQLite — CASE по id.
+    RETURNING повертає id рядків, які реально оновлено.
+    """
+    if is_postgres():
+        v = values(
+            column("id", Integer),
+            column("old", String),
+            column("new", String),
+            name="v",
+        ).data([(d["product_id"], d["old_quantity"], d["new_quantity"]) for d in batch])
+        return (
+            update(Product)
+            .where(Product.id == v.c.id, Product.кількість == v.c.old)
+            .values(кількість=v.c.new)
+            .returning(Product.id)
+        )
+
+    old = {d["product_id"]: d["old_quantity"] for d in batch}
+    new = {d["product_id"]: d["new_quantity"] for d in batch}
+    return (
+        update(Product)
+        .where(Product.id.in_(old), Product.кількість == case(old, value=Product.id))
+        .values(кількість=case(new, value=Product.id))
+        .returning(Product.id)
+    )
+
+
+async def _insert_rows(session, table, rows: List[dict]) -> None:
+    """
+    INSERT багатьох рядків через executemany: SQLAlchemy сам ділить їх на
+    багаторядкові пачки (insertmanyvalues) без компіляції VALUES щоразу.
+    """
+    if rows:
+        await session.execute(insert(table), rows)
 
-    try:
-        async with async_session() as session:
-            # 1. Отримуємо список
-            result = await session.execute(
-                select(TempList)
-                .options(joinedload(TempList.product))
-                .where(TempList.user_id == user_id)
+
+async def _save_lists_once(session, timestamp: str, user_ids: Optional[List[int]] = None):
+    """
+    Одна коротка транзакція для кошиків user_ids (None — усіх непорожніх):
+    читання кошиків, списання пачками, історія, SavedList з позиціями,
+    очищення кошиків. Excel тут не пишеться.
+
+    Кошики обробляються в порядку першого доданого товару; якщо товар є в
+    кількох кошиках, кожен наступний отримує те, що лишилось після
+    попередніх. У БД пишеться один UPDATE на товар (з перевіркою, що його
+    залишок не змінився з моменту читання).
+    """
+    query = (
+        select(
+            TempList.id.label("temp_id"),
+            TempList.user_id,
+            TempList.product_id,
+            TempList.quantity.label("requested"),
+            Product.артикул,
+            Product.назва,
+            Product.кількість,
+            Product.відкладено,
+            Product.відділ,
+        )
+        .join(Product, Product.id == TempList.product_id)
+        .order_by(TempList.id)
+    )
+    if user_ids is not None:
+        query = query.where(TempList.user_id.in_(user_ids))
+    rows = (await session.execute(query)).all()
+    if not rows:
+        return None
+
+    carts: Dict[int, list] = {}
+    for row in rows:
+        carts.setdefault(row.user_id, []).append(row)
+
+    stock: Dict[int, str] = {}
+    plans = {user_id: _plan_deductions(cart, stock) for user_id, cart in carts.items()}
+
+    # Один UPDATE на товар: від прочитаного залишку до підсумкового
+    original = {row.product_id: row.кількість for row in rows}
+    changes = [
+        {"product_id": product_id, "old_quantity": original[product_id], "new_quantity": new}
+        for product_id, new in stock.items()
+    ]
+    for start in range(0, len(changes), SAVE_BATCH_SIZE):
+        batch = changes[start : start + SAVE_BATCH_SIZE]
+        updated = (await session.execute(_deduct_stmt(batch))).scalars().all()
+        if len(updated) != len(batch):
+            raise _StockChanged()
+
+    await _insert_rows(
+        session,
+        StockHistory,
+        [
+            {**d, "change_source": "order"}
+            for deductions, _, _ in plans.values()
+            for d in deductions
+        ],
+    )
+
+    files = {}
+    for user_id, (_, available_items_data, deficit_items_data) in plans.items():
+        f_main = f"order_{user_id}_{timestamp}.xlsx" if available_items_data else None
+        f_def = f"deficit_{user_id}_{timestamp}.xlsx" if deficit_items_data else None
+        files[user_id] = (
+            os.path.join(ARCHIVES_PATH, f_main) if f_main else None,
+            os.path.join(ARCHIVES_PATH, f_def) if f_def else None,
+            f_main or f_def,
+        )
+
+    # У кожного користувача рівно один новий список — id зіставляємо за user_id
+    saved_lists = {
+        user_id: (list_id, created_at)
+        for list_id, user_id, created_at in (
+            await session.execute(
+                insert(SavedList)
+                .values([
+                    {"user_id": user_id, "file_name": name, "file_path": p_main or p_def}
+                    for user_id, (p_main, p_def, name) in files.items()
+                ])
+                .returning(SavedList.id, SavedList.user_id, SavedList.created_at)
             )
-            temp_list = result.scalars().all()
-
-            if not temp_list:
-                logger.warning("Спроба зберегти порожній список для user_id %s", user_id)
-                return None, None
-
-            available_items_data = []
-            deficit_items_data = []
-
-            # 2. Обробка кожного товару
-            for item in temp_list:
-                product = item.product
-                requested_qty = item.quantity
-
-                # Парсимо поточний залишок
-                try:
-                    stock_qty = float(str(product.кількість).replace(",", "."))
-                except (ValueError, AttributeError):
-                    stock_qty = 0.0
-
-                # Враховуємо "залізний" резерв (якщо він використовується для інших цілей),
-                # але ігноруємо тимчасовий резерв цього користувача (бо ми його зараз реалізуємо).
-                permanent_reserved = product.відкладено or 0
-                
-                # Реально доступно на складі
-                real_available_stock = max(0, stock_qty - permanent_reserved)
-
-                qty_to_deduct = 0
-
-                if real_available_stock >= requested_qty:
-                    # Достатньо товару
-                    qty_to_deduct = requested_qty
-                    available_items_data.append({
-                        "артикул": product.артикул,
-                        "назва": product.назва,
-                        "кількість": requested_qty
-                    })
-                else:
-                    # Дефіцит
-                    if real_available_stock > 0:
-                        # Забираємо все, що є
-                        qty_to_deduct = int(real_available_stock)
-                        available_items_data.append({
-                            "артикул": product.артикул,
-                            "назва": product.назва,
-                            "кількість": qty_to_deduct
-                        })
-                    
-                    # Решту в дефіцит
-                    deficit_qty = requested_qty - real_available_stock
-                    deficit_items_data.append({
-                        "артикул": product.артикул,
-                        "назва": product.назва,
-                        "потрібно": requested_qty,
-                        "є_в_наявності": real_available_stock,
-                        "дефіцит": deficit_qty
-                    })
-
-                # 🔥 ГОЛОВНЕ: СПИСАННЯ ЗІ СКЛАДУ
-                if qty_to_deduct > 0:
-                    old_qty_str = product.кількість
-                    
-                    # Нова кількість
-                    new_stock = stock_qty - qty_to_deduct
-                    
-                    # Форматування (int якщо ціле, інакше float з комою)
-                    if new_stock.is_integer():
-                        new_stock_str = str(int(new_stock))
-                    else:
-                        new_stock_str = str(new_stock).replace('.', ',')
-
-                    # 1. Запис в історію
-                    history = StockHistory(
-                        product_id=product.id,
-                        articul=product.артикул,
-                        old_quantity=old_qty_str,
-                        new_quantity=new_stock_str,
-                        change_source="order" # Позначка, що це замовлення
-                    )
-                    session.add(history)
-
-                    # 2. Оновлення товару
-                    product.кількість = new_stock_str
-                    session.add(product)
-
-            # 3. Створення запису в історії файлів (SavedList)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            
-            f_main = f"order_{user_id}_{timestamp}.xlsx" if available_items_data else None
-            f_def = f"deficit_{user_id}_{timestamp}.xlsx" if deficit_items_data else None
-            
-            p_main = os.path.join(ARCHIVES_PATH, f_main) if f_main else None
-            p_def = os.path.join(ARCHIVES_PATH, f_def) if f_def else None
-
-            saved_list = SavedList(
-                user_id=user_id,
-                file_name=f_main or f_def,
-                file_path=p_main or p_def
+        ).all()
+    }
+
+    await _insert_rows(
+        session,
+        SavedListItem,
+        [
+            {
+                "list_id": saved_lists[user_id][0],
+                "article_name": f"{row['артикул']} - {row['назва']}",
+                "quantity": row["кількість"],
+            }
+            for user_id, (_, available_items_data, _) in plans.items()
+            for row in available_items_data
+        ],
+    )
+
+    # Щоденні агрегати — у тій самій транзакції
+    departments = {row.артикул: row.відділ for row in rows}
+    await orm_record_saved_lists(
+        session,
+        [
+            (
+                saved_lists[user_id][0],
+                user_id,
+                saved_lists[user_id][1],
+                [
+                    (departments[row["артикул"]], row["артикул"], row["кількість"])
+                    for row in available_items_data
+                ],
             )
-            session.add(saved_list)
-            await session.flush()
+            for user_id, (_, available_items_data, _) in plans.items()
+        ],
+    )
+
+    # Видаляємо саме прочитані позиції: додане під час збереження лишається
+    temp_ids = [row.temp_id for row in rows]
+    for start in range(0, len(temp_ids), SAVE_BATCH_SIZE):
+        await session.execute(
+            delete(TempList).where(TempList.id.in_(temp_ids[start : start + SAVE_BATCH_SIZE]))
+        )
+    await session.commit()
+
+    product_ids = list(original)
+    saved = {}
+    for user_id, (_, available_items_data, deficit_items_data) in plans.items():
+        p_main, p_def, _ = files[user_id]
+        saved[user_id] = ((available_items_data, p_main), (deficit_items_data, p_def))
+    return product_ids, saved
+
+
+def _write_list_files(main, deficit) -> Tuple[Optional[str], Optional[str]]:
+    """Пише Excel-файли замовлення та дефіциту (виконується в executor)."""
+    os.makedirs(ARCHIVES_PATH, exist_ok=True)
+    (available_items_data, p_main), (deficit_items_data, p_def) = main, deficit
+
+    main_list_path = surplus_list_path = None
+    if available_items_data:
+        df_main = pd.DataFrame(available_items_data)
+        # Фільтруємо колонки для клієнта
+        df_main[["артикул", "кількість"]].to_excel(p_main, index=False, engine="openpyxl")
+        main_list_path = p_main
+
+    if deficit_items_data:
+        df_def = pd.DataFrame(deficit_items_data)
+        df_def.to_excel(p_def, index=False, engine="openpyxl")
+        surplus_list_path = p_def
+
+    return main_list_path, surplus_list_path
+
+
+async def _save_lists(user_ids: Optional[List[int]], label: str):
+    """
+    _save_lists_once з повтором, якщо залишки змінились паралельно.
+    Після коміту скидає кеш товарів. None — якщо зберігати нічого.
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    for attempt in range(1, SAVE_ATTEMPTS + 1):
+        try:
+            async with async_session() as session:
+                saved = await _save_lists_once(session, timestamp, user_ids)
+            break
+        except _StockChanged:
+            logger.warning(
+                "Залишки змінились під час збереження (%s, спроба %s)", label, attempt
+            )
+    else:
+        raise RuntimeError(f"Не вдалося зберегти ({label}): залишки змінюються")
 
-            for row in available_items_data:
-                session.add(SavedListItem(
-                    list_id=saved_list.id,
-                    article_name=f"{row['артикул']} - {row['назва']}",
-                    quantity=row['кількість']
-                ))
+    if saved is None:
+        return None
 
-            # 4. Очищення кошика
-            await session.execute(delete(TempList).where(TempList.user_id == user_id))
+    product_ids, lists = saved
+    invalidate_products(product_ids)
+    catalog_changed()
+    return lists
 
-            # 5. Фіксація
-            await session.commit()
 
-            # --- ГЕНЕРАЦІЯ ФАЙЛІВ ---
-            os.makedirs(ARCHIVES_PATH, exist_ok=True)
+async def render_list_files(main, deficit) -> Tuple[Optional[str], Optional[str]]:
+    """Пише файли замовлення та дефіциту в пулі рендерингу."""
+    return await render_pool.run("list_files", _write_list_files, main, deficit)
 
-            if available_items_data:
-                df_main = pd.DataFrame(available_items_data)
-                # Фільтруємо колонки для клієнта
-                df_main[["артикул", "кількість"]].to_excel(p_main, index=False, engine="openpyxl")
-                main_list_path = p_main
 
-            if deficit_items_data:
-                df_def = pd.DataFrame(deficit_items_data)
-                df_def.to_excel(p_def, index=False, engine="openpyxl")
-                surplus_list_path = p_def
+async def process_and_save_list(user_id: int) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Обробляє список:
+    1. Віднімає кількість товару зі складу (Списання) — пачковими UPDATE.
+    2. Записує зміни в історію та SavedList одним багаторядковим INSERT.
+    3. Очищає кошик і фіксує транзакцію.
+    4. Після коміту зберігає файли Excel у пулі рендерингу.
+    """
+    try:
+        lists = await _save_lists([user_id], f"user_id {user_id}")
+        if lists is None:
+            logger.warning("Спроба зберегти порожній список для user_id %s", user_id)
+            return None, None
 
-            return main_list_path, surplus_list_path
+        main, deficit = lists[user_id]
+        return await render_list_files(main, deficit)
 
     except Exception as e:
         logger.error("Помилка обробки списку: %s", e, exc_info=True)
         return None, None
 
 
+async def save_all_active_lists(
+    user_ids: Optional[List[int]] = None,
+) -> Dict[int, Tuple[tuple, tuple]]:
+    """
+    Зберігає всі непорожні кошики (або кошики user_ids) однією транзакцією.
+    Файли не пишуться: повертає {user_id: (main, deficit)} для
+    render_list_files.
+    """
+    return await _save_lists(user_ids, "усі кошики") or {}
+
+
 # ==============================================================================
 # 📄 ГЕНЕРАЦІЯ КАРТКИ ТОВАРУ (Запасна)
 # ==============================================================================
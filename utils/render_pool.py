@@ -0,0 +1,125 @@
+# epicservice/utils/render_pool.py
+
+"""
+Пул рендерингу файлів (Excel тощо) поза event loop.
+
+Усі генератори файлів (збереження списку, звіт по залишках, експорт
+зібраного, статистика) подають завдання сюди, а не в спільний executor:
+- кількість воркерів і тип пулу задаються в config (RENDER_WORKERS, RENDER_POOL);
+- одночасно виконується не більше RENDER_WORKERS завдань, чекати може не
+  більше RENDER_QUEUE_SIZE — решта отримує RenderQueueFull;
+- для кожного типу завдання рахуються час у черзі та час рендерингу,
+  окремо від часу запитів до БД.
+
+Для RENDER_POOL=process функція та аргументи мають бути picklable
+(функції рівня модуля, без lambda).
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from config import RENDER_POOL, RENDER_QUEUE_SIZE, RENDER_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+class RenderQueueFull(RuntimeError):
+    """Черга рендерингу переповнена."""
+
+
+class _JobStats:
+    __slots__ = ("count", "failed", "wait_total", "run_total", "run_max", "run_last")
+
+    def __init__(self):
+        self.count = 0
+        self.failed = 0
+        self.wait_total = 0.0
+        self.run_total = 0.0
+        self.run_max = 0.0
+        self.run_last = 0.0
+
+    def as_dict(self, job: str) -> Dict[str, Any]:
+        return {
+            "job": job,
+            "count": self.count,
+            "failed": self.failed,
+            "avg_wait_s": round(self.wait_total / self.count, 3) if self.count else 0.0,
+            "avg_render_s": round(self.run_total / self.count, 3) if self.count else 0.0,
+            "max_render_s": round(self.run_max, 3),
+            "last_render_s": round(self.run_last, 3),
+        }
+
+
+class RenderPool:
+    """Обмежений пул воркерів для генерації файлів з метриками по завданнях."""
+
+    def __init__(self, kind: str = "thread", workers: int = 2, queue_size: int = 50):
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._waiting = 0
+        self._stats: Dict[str, _JobStats] = {}
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="render"
+                )
+            logger.info("Пул рендерингу: %s × %s", self.kind, self.workers)
+        return self._executor
+
+    async def run(self, job: str, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Виконує func(*args) у пулі та повертає результат.
+        job — назва типу завдання для метрик ("stock_report", "list_files"...).
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        if self._slots.locked() and self._waiting >= self.queue_size:
+            raise RenderQueueFull(f"Черга рендерингу переповнена ({self.queue_size})")
+
+        stats = self._stats.setdefault(job, _JobStats())
+        queued = time.perf_counter()
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        except Exception:
+            stats.failed += 1
+            raise
+        finally:
+            self._slots.release()
+            finished = time.perf_counter()
+            wait, run = started - queued, finished - started
+            stats.count += 1
+            stats.wait_total += wait
+            stats.run_total += run
+            stats.run_max = max(stats.run_max, run)
+            stats.run_last = run
+            logger.info("Рендер %s: черга %.3f с, виконання %.3f с", job, wait, run)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Метрики по типах завдань (для адмін-статистики)."""
+        return [stats.as_dict(job) for job, stats in sorted(self._stats.items())]
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+render_pool = RenderPool(RENDER_POOL, RENDER_WORKERS, RENDER_QUEUE_SIZE)
@@ -0,0 +1,181 @@
+# epicservice/utils/xlsx_writer.py
+
+"""
+Мінімальний потоковий запис .xlsx без openpyxl.
+
+XML аркуша формується рядками і пишеться прямо в zip-потік, тож пам'ять
+не залежить від кількості рядків, а на клітинку припадає одне форматування
+рядка замість об'єктної моделі openpyxl. Підтримується рівно те, що
+потрібно звітам: один аркуш, жирна шапка, ширини колонок, закріплена шапка,
+рядки (inline strings), числа, bool, дати.
+"""
+
+import numbers
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, Optional, Sequence
+from xml.sax.saxutils import escape
+
+from openpyxl.utils import get_column_letter
+
+# Рядків у буфері перед записом у zip-потік
+_FLUSH_ROWS = 1000
+
+# Символи, заборонені в XML 1.0 (openpyxl на них падає — ми їх прибираємо)
+_ILLEGAL_XML = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+
+# Індекси стилів у styles.xml
+_STYLE_BOLD = 1
+_STYLE_DATE = 2
+_STYLE_DATETIME = 3
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    "</Types>"
+)
+
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    "</Relationships>"
+)
+
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    "</Relationships>"
+)
+
+# 0 — звичайний, 1 — жирний, 2 — дата, 3 — дата з часом
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="dd.mm.yyyy hh:mm"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    "</cellXfs>"
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    "</styleSheet>"
+)
+
+
+def _workbook_xml(sheet_name: str) -> str:
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(sheet_name[:31], {chr(34): "&quot;"})}" sheetId="1" r:id="rId1"/></sheets>'
+        "</workbook>"
+    )
+
+
+def _cell(ref: str, value, style: int = 0) -> str:
+    """XML однієї клітинки; None — порожньо."""
+    s = f' s="{style}"' if style else ""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"{s}><v>{int(value)}</v></c>'
+    if not isinstance(value, (int, float)) and isinstance(value, (numbers.Real, Decimal)):
+        # numpy, Decimal
+        value = int(value) if isinstance(value, numbers.Integral) else float(value)
+    if isinstance(value, (int, float)):
+        if value != value or value in (float("inf"), float("-inf")):
+            return ""
+        return f'<c r="{ref}"{s}><v>{value!r}</v></c>'
+    if isinstance(value, datetime):
+        serial = (value.replace(tzinfo=None) - _EXCEL_EPOCH).total_seconds() / 86400
+        return f'<c r="{ref}" s="{style or _STYLE_DATETIME}"><v>{serial!r}</v></c>'
+    if isinstance(value, date):
+        serial = (date(value.year, value.month, value.day) - _EXCEL_EPOCH.date()).days
+        return f'<c r="{ref}" s="{style or _STYLE_DATE}"><v>{serial}</v></c>'
+
+    text = _ILLEGAL_XML.sub("", str(value))
+    space = ' xml:space="preserve"' if text[:1].isspace() or text[-1:].isspace() else ""
+    return f'<c r="{ref}" t="inlineStr"{s}><is><t{space}>{escape(text)}</t></is></c>'
+
+
+def write_xlsx(
+    file_path: str,
+    headers: Sequence[str],
+    rows: Iterable[Sequence],
+    widths: Optional[Sequence[float]] = None,
+    sheet_name: str = "Data",
+) -> int:
+    """
+    Пише один аркуш: жирна шапка (закріплена), далі rows.
+    widths — готові ширини колонок. Повертає кількість рядків даних.
+    """
+    letters = [get_column_letter(i) for i in range(1, len(headers) + 1)]
+    count = 0
+
+    with zipfile.ZipFile(file_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _ROOT_RELS)
+        zf.writestr("xl/workbook.xml", _workbook_xml(sheet_name))
+        zf.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        zf.writestr("xl/styles.xml", _STYLES)
+
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            head = [
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetViews><sheetView workbookViewId="0">'
+                '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+                "</sheetView></sheetViews>"
+            ]
+            if widths:
+                head.append("<cols>")
+                for idx, width in enumerate(widths, start=1):
+                    head.append(f'<col min="{idx}" max="{idx}" width="{width}" customWidth="1"/>')
+                head.append("</cols>")
+            head.append('<sheetData><row r="1">')
+            head.extend(
+                _cell(f"{letter}1", header, _STYLE_BOLD)
+                for letter, header in zip(letters, headers)
+            )
+            head.append("</row>")
+            sheet.write("".join(head).encode("utf-8"))
+
+            buffer = []
+            for row in rows:
+                count += 1
+                n = count + 1
+                buffer.append(
+                    f'<row r="{n}">'
+                    + "".join(
+                        _cell(f"{letter}{n}", value)
+                        for letter, value in zip(letters, row)
+                    )
+                    + "</row>"
+                )
+                if len(buffer) >= _FLUSH_ROWS:
+                    sheet.write("".join(buffer).encode("utf-8"))
+                    buffer.clear()
+
+            buffer.append("</sheetData></worksheet>")
+            sheet.write("".join(buffer).encode("utf-8"))
+
+    return count